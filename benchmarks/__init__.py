@@ -0,0 +1,9 @@
+"""
+Performance benchmarks and synthetic data generators.
+"""
+import os
+import sys
+
+SOURCE_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'src')
+if SOURCE_PATH not in sys.path:
+    sys.path.append(SOURCE_PATH)
@@ -0,0 +1,82 @@
+"""
+Render time of the bins reports for a generated script catalog, comparing
+the per fragment writes with the buffered renderer.
+
+Usage: python -m benchmarks.bench_bins_render [num_scripts]
+"""
+import io
+import sys
+import time
+from contextlib import redirect_stdout
+from cmdwerk.commands.bins_cmd import ScriptManager, ScriptRecord
+from cmdwerk.commands.libs.gen_utils import write_screen_cols
+from cmdwerk.commands.libs.screen_buffer import ScreenBuffer
+
+
+class CountingStream(io.StringIO):
+    """In memory stdout that counts the write calls."""
+
+    def __init__(self):
+        super().__init__()
+        self.num_writes = 0
+
+    def write(self, text):
+        """Counts and stores the text."""
+        self.num_writes += 1
+        return super().write(text)
+
+
+class UnbufferedScreen:
+    """Screen that writes every fragment to stdout, like the reports used to do."""
+
+    @staticmethod
+    def write(*args, **kwargs):
+        """Writes the fragment right away."""
+        write_screen_cols(*args, **kwargs)
+
+
+def make_manager(num_scripts, num_groups=10):
+    """Returns a script manager with a generated catalog, no scan needed."""
+    manager = ScriptManager(use_cache=False, search_path=[])
+    manager.script_groups = {}
+    for idx in range(num_scripts):
+        record = ScriptRecord(f'script-{idx:05d}', f'Short help of script {idx}', 'Long help\nsecond line')
+        manager.script_groups.setdefault(f'group-{idx % num_groups}', []).append(record)
+    return manager
+
+
+def time_render(manager, make_screen, colors, repeat=5):
+    """Returns the best render time of the short help report and the number of writes."""
+    best = None
+    for _ in range(repeat):
+        stream = CountingStream()
+        start = time.perf_counter()
+        with redirect_stdout(stream):
+            screen = make_screen(colors)
+            manager.render_short_help(screen)
+            if isinstance(screen, ScreenBuffer):
+                screen.flush()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best, stream.num_writes
+
+
+def main(argv):
+    """Runs the benchmark."""
+    # pylint: disable=import-outside-toplevel
+    from cmdwerk.commands.libs import gen_utils
+    num_scripts = int(argv[0]) if argv else 10000
+    manager = make_manager(num_scripts)
+    print(f'Rendering {num_scripts} scripts')
+    for colors in (True, False):
+        # The unbuffered writer detects the colors on stdout.
+        gen_utils.stdout_has_colors = lambda colors=colors: colors
+        old_time, old_writes = time_render(manager, lambda _: UnbufferedScreen(), colors)
+        new_time, new_writes = time_render(manager, lambda colors: ScreenBuffer(colors), colors)
+        label = 'color' if colors else 'plain'
+        print(f'  {label}  per fragment {old_time * 1000:7.1f} ms ({old_writes} writes)   '
+              f'buffered {new_time * 1000:7.1f} ms ({new_writes} writes)   speedup x{old_time / new_time:4.1f}')
+
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
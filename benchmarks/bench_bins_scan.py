@@ -0,0 +1,43 @@
+"""
+Compares serial and parallel scans of a generated script directory.
+
+Usage: python -m benchmarks.bench_bins_scan [num_scripts] [jobs ...]
+"""
+import sys
+import time
+import tempfile
+from benchmarks.generators import make_bin_tree
+from cmdwerk.commands.bins_cmd import ScriptManager
+
+
+def time_scan(script_dir, jobs, repeat=3):
+    """Returns the best wall time of a full (uncached) scan and the number of groups found."""
+    best = None
+    num_groups = 0
+    for _ in range(repeat):
+        manager = ScriptManager(use_cache=False, jobs=jobs, search_path=[script_dir])
+        start = time.perf_counter()
+        manager.load_scripts_groups()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+        num_groups = len(manager.script_groups)
+    return best, num_groups
+
+
+def main(argv):
+    """Runs the benchmark."""
+    num_scripts = int(argv[0]) if argv else 10000
+    jobs_list = [int(x) for x in argv[1:]] or [1, 4, 8, 16]
+    with tempfile.TemporaryDirectory() as script_dir:
+        make_bin_tree(script_dir, num_scripts)
+        print(f'Scanning {num_scripts} scripts')
+        serial_time = None
+        for jobs in jobs_list:
+            elapsed, num_groups = time_scan(script_dir, jobs)
+            serial_time = serial_time or elapsed
+            print(f'  jobs={jobs:<3} {elapsed * 1000:9.1f} ms  '
+                  f'speedup x{serial_time / elapsed:4.2f}  groups={num_groups}')
+
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
@@ -0,0 +1,62 @@
+"""
+Build time and memory of the first word completion table: the previous
+dictionary of every prefix against the sorted array with binary searches.
+
+Usage: python -m benchmarks.bench_first_tokens [num_tokens] [token_length]
+"""
+import sys
+import time
+import random
+import tracemalloc
+from collections import defaultdict
+from cmdwerk.commands.libs.history_trie import TokenTrie
+from cmdwerk.commands.libs.history_completion import HistoryCompletionEngine
+
+
+def build_prefix_table(ranked_cmds):
+    """Previous implementation: every proper prefix of every first token."""
+    first_cmds = set(ranked_cmds)
+    result = defaultdict(list)
+    for cmd in ranked_cmds:
+        for idx in range(len(cmd)):
+            token = cmd[:idx+1]
+            if token not in first_cmds:
+                result[token].append(cmd)
+    return result
+
+
+def measure(build_func):
+    """Returns the build time in ms and the memory held by the result in MB."""
+    tracemalloc.start()
+    start = time.perf_counter()
+    result = build_func()
+    elapsed = time.perf_counter() - start
+    current, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return result, elapsed * 1000, current / 2 ** 20
+
+
+def main(argv):
+    """Runs the benchmark."""
+    num_tokens = int(argv[0]) if argv else 2000
+    token_length = int(argv[1]) if len(argv) > 1 else 24
+    rnd = random.Random(42)
+    trie = TokenTrie()
+    for idx in range(num_tokens):
+        name = ''.join(rnd.choice('abcdefghijklmnopqrstuvwxyz_-') for _ in range(token_length))
+        trie.add([f'{name}{idx}', 'arg'], count=rnd.randint(1, 50))
+    ranked = trie.candidates(trie.root())
+    print(f'First tokens: {num_tokens} of ~{token_length} chars')
+    _, table_ms, table_mb = measure(lambda: build_prefix_table(ranked))
+    engine, array_ms, array_mb = measure(lambda: HistoryCompletionEngine(trie))
+    print(f'  prefix table  build {table_ms:8.1f} ms  memory {table_mb:7.2f} MB')
+    print(f'  sorted array  build {array_ms:8.1f} ms  memory {array_mb:7.2f} MB (includes ranking)')
+    prefixes = [x[:3] for x in ranked[:1000]]
+    start = time.perf_counter()
+    for prefix in prefixes:
+        engine.complete(prefix)
+    print(f'  lookup {(time.perf_counter() - start) / len(prefixes) * 1e6:.1f} us per prefix')
+
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
@@ -0,0 +1,87 @@
+"""
+Compares memory and per-keystroke latency of the token trie against
+the previous dictionary of '|_|' joined prefixes.
+
+Usage: python -m benchmarks.bench_history_trie [num_lines]
+"""
+import sys
+import time
+import shlex
+import tracemalloc
+from collections import defaultdict
+from benchmarks.generators import make_history_commands
+from cmdwerk.commands.prompt_cmd import build_history_data
+from cmdwerk.commands.libs.history_index import find_node
+
+KEY_SEPARATOR = '|_|'
+
+
+def build_joined_dict(cmd_list):
+    """Previous implementation: one joined key per prefix of every command."""
+    results = defaultdict(set)
+    for cmd in cmd_list:
+        try:
+            parts = shlex.split(cmd)
+        except ValueError:
+            continue
+        for idx in range(1, len(parts)):
+            results[KEY_SEPARATOR.join(parts[:idx])].add(parts[idx])
+    return results
+
+
+def measure_memory(build_func, commands):
+    """Returns the data built and the memory allocated by the builder in MB."""
+    tracemalloc.start()
+    data = build_func(commands)
+    current, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return data, current / 2 ** 20
+
+
+def keystroke_prefixes(commands, num_commands=2000):
+    """Returns the token lists seen while typing commands token by token."""
+    prefixes = []
+    for cmd in commands[:num_commands]:
+        parts = shlex.split(cmd)
+        for idx in range(1, len(parts) + 1):
+            prefixes.append(parts[:idx])
+    return prefixes
+
+
+def time_dict_lookups(data, prefixes):
+    """Per-keystroke lookups re-joining the whole line."""
+    start = time.perf_counter()
+    for parts in prefixes:
+        list(data.get(KEY_SEPARATOR.join(parts), ()))
+    return (time.perf_counter() - start) / len(prefixes)
+
+
+def time_trie_lookups(trie, prefixes):
+    """Per-keystroke lookups walking down from the node of the previous keystroke."""
+    start = time.perf_counter()
+    last_parts, last_node = [], trie.root()
+    for parts in prefixes:
+        if parts[:-1] == last_parts:
+            node = find_node(trie, parts[-1:], last_node)
+        else:
+            node = find_node(trie, parts)
+        if node is not None:
+            last_parts, last_node = parts, node
+            trie.candidates(node)
+    return (time.perf_counter() - start) / len(prefixes)
+
+
+def main(argv):
+    """Runs the benchmark."""
+    num_lines = int(argv[0]) if argv else 200000
+    commands = make_history_commands(num_lines)
+    prefixes = keystroke_prefixes(commands)
+    dict_data, dict_mb = measure_memory(build_joined_dict, commands)
+    trie_data, trie_mb = measure_memory(build_history_data, commands)
+    print(f'History lines: {num_lines}')
+    print(f'  joined dict : {dict_mb:8.2f} MB  {time_dict_lookups(dict_data, prefixes) * 1e6:6.2f} us/keystroke')
+    print(f'  token trie  : {trie_mb:8.2f} MB  {time_trie_lookups(trie_data, prefixes) * 1e6:6.2f} us/keystroke')
+
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
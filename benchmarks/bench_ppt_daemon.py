@@ -0,0 +1,86 @@
+"""
+Time to the first completion of 'cmdw ppt': loading the legacy pickle or mapping
+the index and building the completion engine in process, against asking the
+warm daemon.
+
+Usage: python -m benchmarks.bench_ppt_daemon [num_lines]
+"""
+import os
+import sys
+import time
+import pickle
+import tempfile
+import threading
+from benchmarks.generators import make_history_commands
+from cmdwerk.commands.libs.history_data import build_history_data
+from cmdwerk.commands.libs.history_index import write_history_index, MappedHistoryIndex
+from cmdwerk.commands.libs.history_trie import TokenTrie
+from cmdwerk.commands.libs.history_completion import HistoryCompletionEngine
+from cmdwerk.commands.libs.history_daemon import HistoryDaemon, HistoryDaemonClient
+
+QUERIES = ['g', 'git ', 'git checkout ', 'docker ', 'kubectl get ']
+
+
+def time_local(index_path):
+    """Maps the index, builds the engine and completes the queries."""
+    start = time.perf_counter()
+    engine = HistoryCompletionEngine(MappedHistoryIndex(index_path))
+    engine.complete(QUERIES[0])
+    first = time.perf_counter() - start
+    for text in QUERIES[1:]:
+        engine.complete(text)
+    return first, time.perf_counter() - start
+
+
+def time_pickle(pickle_path):
+    """Loads the legacy pickled dictionary like the first 'ppt' versions, then completes the queries."""
+    start = time.perf_counter()
+    with open(pickle_path, 'rb') as pickle_fh:
+        engine = HistoryCompletionEngine(TokenTrie.from_completion_dict(pickle.load(pickle_fh)))
+    engine.complete(QUERIES[0])
+    first = time.perf_counter() - start
+    for text in QUERIES[1:]:
+        engine.complete(text)
+    return first, time.perf_counter() - start
+
+
+def time_daemon(socket_path):
+    """Connects to the daemon and completes the queries."""
+    start = time.perf_counter()
+    client = HistoryDaemonClient.connect(socket_path)
+    client.complete(QUERIES[0])
+    first = time.perf_counter() - start
+    for text in QUERIES[1:]:
+        client.complete(text)
+    total = time.perf_counter() - start
+    client.close()
+    return first, total
+
+
+def main(argv):
+    """Runs the benchmark."""
+    num_lines = int(argv[0]) if argv else 200000
+    history_data = build_history_data(make_history_commands(num_lines))
+    with tempfile.TemporaryDirectory() as work_dir:
+        index_path = os.path.join(work_dir, 'history.idx')
+        socket_path = os.path.join(work_dir, 'ppt.sock')
+        pickle_path = os.path.join(work_dir, 'history.bin')
+        write_history_index(index_path, history_data)
+        with open(pickle_path, 'wb') as pickle_fh:
+            pickle.dump(dict(history_data.to_dict()), pickle_fh)
+        daemon = HistoryDaemon(socket_path, history_data, os.path.join(work_dir, 'history'),
+                               lambda data, full, workers: (data, {}), poll_seconds=60)
+        threading.Thread(target=daemon.serve_forever, daemon=True).start()
+        while not os.path.exists(socket_path):
+            time.sleep(0.01)
+        print(f'History commands: {num_lines}')
+        for label, func, arg in (('pickle', time_pickle, pickle_path), ('mapped', time_local, index_path),
+                                 ('daemon', time_daemon, socket_path)):
+            first, total = min(func(arg) for _ in range(5))
+            print(f'  {label:<11} first completion {first * 1000:7.2f} ms   '
+                  f'{len(QUERIES)} queries {total * 1000:7.2f} ms')
+        daemon.server.shutdown()
+
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
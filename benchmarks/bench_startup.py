@@ -0,0 +1,59 @@
+"""
+Start up budget of 'cmdw bins': measures the import time of the command line
+with 'python -X importtime' and checks the heavy modules are not imported.
+
+Usage: python -m benchmarks.bench_startup [budget_ms]
+"""
+import os
+import sys
+import tempfile
+import subprocess
+
+DEFAULT_BUDGET_MS = 150
+# Modules only needed by the interactive prompt or the history sync.
+FORBIDDEN_MODULES = ('prompt_toolkit', 'pyperclip', 'curses', 'pickle')
+STARTUP_CODE = "from cmdwerk.cli import main; main(['bins'], standalone_mode=False)"
+
+
+def measure_startup(home_dir):
+    """
+    Runs 'cmdw bins' on an empty search path.
+    Returns the cumulative import time per top level module in microseconds.
+    """
+    env = dict(os.environ, HOME=home_dir, CMDW_PATH=os.path.join(home_dir, 'bin'))
+    env['PYTHONPATH'] = os.pathsep.join(x for x in sys.path if x)
+    result = subprocess.run([sys.executable, '-X', 'importtime', '-c', STARTUP_CODE],
+                            env=env, capture_output=True, text=True, check=True)
+    modules = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith('import time:') or '|' not in line:
+            continue
+        _, cumulative, name = line.split('|')
+        if cumulative.strip().isdigit():
+            modules[name.strip()] = int(cumulative)
+    return modules
+
+
+def main(argv):
+    """Runs the benchmark, exits with an error when the budget is exceeded."""
+    budget_ms = float(argv[0]) if argv else DEFAULT_BUDGET_MS
+    with tempfile.TemporaryDirectory() as home_dir:
+        os.mkdir(os.path.join(home_dir, 'bin'))
+        modules = measure_startup(home_dir)
+    cli_ms = modules.get('cmdwerk.cli', 0) / 1000
+    heavy = sorted(x for x in modules if x.split('.')[0] in FORBIDDEN_MODULES)
+    print(f'cmdwerk.cli import: {cli_ms:.1f} ms (budget {budget_ms:.0f} ms)')
+    for name, micros in sorted(modules.items(), key=lambda x: -x[1])[:5]:
+        print(f'  {name:<40} {micros / 1000:7.1f} ms')
+    failed = False
+    if heavy:
+        print(f'Heavy modules imported: {", ".join(heavy)}')
+        failed = True
+    if cli_ms > budget_ms:
+        print('Start up budget exceeded')
+        failed = True
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
@@ -0,0 +1,38 @@
+"""
+Micro-benchmark of the shell tokenizer against 'shlex.split'.
+
+Usage: python -m benchmarks.bench_tokenizer [num_lines]
+"""
+import sys
+import time
+import shlex
+from benchmarks.generators import make_history_commands
+from cmdwerk.commands.libs.shell_tokenizer import split_words
+
+
+def time_tokenizer(split_func, commands):
+    """Returns the time per command in microseconds."""
+    start = time.perf_counter()
+    for cmd in commands:
+        try:
+            split_func(cmd)
+        except ValueError:
+            pass
+    return (time.perf_counter() - start) / len(commands) * 1e6
+
+
+def main(argv):
+    """Runs the benchmark."""
+    num_lines = int(argv[0]) if argv else 100000
+    commands = make_history_commands(num_lines)
+    quoted = [x for x in commands if "'" in x or '"' in x]
+    print(f'Commands: {len(commands)} ({len(quoted)} with quotes)')
+    for label, sample in (('all', commands), ('quoted', quoted)):
+        shlex_us = time_tokenizer(shlex.split, sample)
+        words_us = time_tokenizer(split_words, sample)
+        print(f'  {label:<7} shlex.split {shlex_us:6.2f} us   split_words {words_us:6.2f} us   '
+              f'speedup x{shlex_us / words_us:5.1f}')
+
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
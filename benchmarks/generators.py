@@ -0,0 +1,125 @@
+"""
+Synthetic data generators used by the benchmarks.
+"""
+import os
+import random
+
+SCRIPT_TEMPLATE = """#!/bin/bash
+
+# -- Cmd Werk Config --
+# CMDW_GROUP_NAME='{group}'
+# CMDW_HELP_BEGIN
+# {short_help}
+# Usage: {name} [options]
+# CMDW_HELP_END
+
+{body}
+"""
+
+PLAIN_SCRIPT_TEMPLATE = """#!/bin/bash
+{body}
+"""
+
+WORDS = ['list', 'show', 'sync', 'deploy', 'clean', 'build', 'open', 'edit', 'check', 'report',
+         'aws', 'git', 'ssh', 'docker', 'python', 'logs', 'hosts', 'keys', 'branch', 'cluster']
+
+
+def make_bin_tree(dir_path, num_scripts, num_groups=10, marker_ratio=0.8, body_lines=20, seed=42):
+    """
+    Creates 'num_scripts' scripts spread over 'num_groups' groups in 'dir_path'.
+    A 'marker_ratio' fraction of the scripts has the cmdwerk config block.
+    Returns the list of script names.
+    """
+    rnd = random.Random(seed)
+    os.makedirs(dir_path, exist_ok=True)
+    names = []
+    for idx in range(num_scripts):
+        name = f'{rnd.choice(WORDS)}_{rnd.choice(WORDS)}_{idx}'
+        body = '\n'.join(f'echo "{rnd.choice(WORDS)} {line}"' for line in range(body_lines))
+        if rnd.random() < marker_ratio:
+            short_help = ' '.join(rnd.choice(WORDS) for _ in range(5)).capitalize() + '.'
+            payload = SCRIPT_TEMPLATE.format(
+                group=f'group_{idx % num_groups}', short_help=short_help, name=name, body=body)
+        else:
+            payload = PLAIN_SCRIPT_TEMPLATE.format(body=body)
+        with open(os.path.join(dir_path, name), 'w', encoding='utf-8') as out_fh:
+            out_fh.write(payload)
+        names.append(name)
+    return names
+
+
+COMMAND_SHAPES = [
+    ('git', ['status', 'log', 'diff', 'push', 'pull', 'fetch'], ['origin', 'main', 'dev', '--rebase']),
+    ('git checkout', ['main', 'dev', '-b'], ['feature/{n}', 'fix/{n}', 'release/{n}']),
+    ('docker', ['ps', 'run', 'exec', 'logs', 'build'], ['-it', '-a', 'web_{n}', 'db_{n}']),
+    ('kubectl', ['get', 'describe', 'logs', 'delete'], ['pods', 'svc', 'deploy/app-{n}', '-n', 'prod']),
+    ('ssh', ['host{n}.example.com', 'user@box{n}', '-i'], ['~/.ssh/id_rsa', '-p', '22{n}']),
+    ('cd', ['~/src/project{n}', '..', '/var/log/app{n}'], []),
+    ('python', ['-m', 'manage.py', 'script_{n}.py'], ['pytest', 'runserver', '--verbose']),
+    ('ls', ['-la', '-lh', 'dir_{n}'], []),
+]
+
+
+def make_history_commands(num_lines, seed=42, distinct=5000):
+    """
+    Returns 'num_lines' synthetic shell commands with repetitions like a real history.
+    The variable parts take values from 'distinct' possible numbers.
+    """
+    rnd = random.Random(seed)
+    commands = []
+    for _ in range(num_lines):
+        head, seconds, thirds = rnd.choice(COMMAND_SHAPES)
+        num = int(rnd.paretovariate(1.2)) % distinct
+        parts = [head, rnd.choice(seconds).format(n=num)]
+        for _ in range(rnd.randint(0, 3) if thirds else 0):
+            parts.append(rnd.choice(thirds).format(n=num))
+        if rnd.random() < 0.05:
+            parts.append(f"'quoted message {num}'")
+        commands.append(' '.join(parts))
+    return commands
+
+
+def make_zsh_history(file_path, num_lines, seed=42, start_ts=1700000000):
+    """Writes a synthetic zsh extended history file and returns the commands."""
+    commands = make_history_commands(num_lines, seed)
+    with open(file_path, 'w', encoding='utf-8') as out_fh:
+        for idx, command in enumerate(commands):
+            out_fh.write(f': {start_ts + idx * 30}:0;{command}\n')
+    return commands
+
+
+def make_bash_history(file_path, num_lines, seed=42, start_ts=1700000000):
+    """Writes a synthetic bash history file with HISTTIMEFORMAT timestamps and returns the commands."""
+    commands = make_history_commands(num_lines, seed)
+    with open(file_path, 'w', encoding='utf-8') as out_fh:
+        for idx, command in enumerate(commands):
+            out_fh.write(f'#{start_ts + idx * 30}\n{command}\n')
+    return commands
+
+
+def make_fish_history(file_path, num_lines, seed=42, start_ts=1700000000):
+    """Writes a synthetic fish history file and returns the commands."""
+    commands = make_history_commands(num_lines, seed)
+    with open(file_path, 'w', encoding='utf-8') as out_fh:
+        for idx, command in enumerate(commands):
+            escaped = command.replace('\\', '\\\\').replace('\n', '\\n')
+            out_fh.write(f'- cmd: {escaped}\n  when: {start_ts + idx * 30}\n')
+    return commands
+
+
+def make_pyenv_versions(num_series=12, patches=20, seed=42):
+    """
+    Returns a synthetic 'pyenv install -l' listing: final releases, pre-releases,
+    free-threaded builds and other implementations, in listing order.
+    """
+    rnd = random.Random(seed)
+    lines = ['Available versions:']
+    for minor in range(num_series):
+        for patch in range(rnd.randint(patches // 2, patches)):
+            lines.append(f'  3.{minor}.{patch}')
+        lines.extend(f'  3.{minor}.0{level}' for level in ('a1', 'a2', 'b1', 'rc1'))
+        lines.append(f'  3.{minor}.0t')
+        lines.append(f'  3.{minor}-dev')
+    lines.extend(f'  pypy3.{x}-7.3.{y}' for x in range(7, 11) for y in range(patches))
+    lines.extend(f'  miniconda3-{x}.{y}.0' for x in range(4, 25) for y in range(3))
+    return lines
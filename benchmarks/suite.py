@@ -0,0 +1,448 @@
+"""
+Benchmark suite of the 'bins', 'ppt' and 'pyenv' hot paths over synthetic data.
+
+Each case is timed like pytest-benchmark does: a warm up call, then as many
+rounds as fit in the time budget (at least 'min_rounds'), reporting the min,
+median, mean and standard deviation of the rounds. No baseline is shipped, the
+timings depend on the machine: record one first with '--save <name>' (kept in
+'benchmarks/results', which git ignores), then a run compared with it using
+'--compare <name>' reports the cases slower than the tolerance as regressions.
+
+Usage: python -m benchmarks.suite [--scale small|medium|large] [--filter <text>]
+                                  [--save <name>] [--compare <name>] [--tolerance <fraction>]
+"""
+import io
+import os
+import sys
+import json
+import time
+import shutil
+import platform
+import argparse
+import datetime
+import tempfile
+import statistics
+import contextlib
+from typing import Callable, NamedTuple, Optional
+from benchmarks.generators import (make_bin_tree, make_history_commands, make_zsh_history, make_bash_history,
+                                   make_fish_history, make_pyenv_versions)
+from cmdwerk.commands import bins_cmd, prompt_cmd
+from cmdwerk.commands.bins_cmd import ScriptManager
+from cmdwerk.commands.prompt_cmd import PromptCommand
+from cmdwerk.commands.pyenv_cmd import PyEnvHelperCommands
+from cmdwerk.commands.libs.history_data import HistoryReader, BashHistoryReader, FishHistoryReader
+from cmdwerk.commands.libs.history_data import build_history_data
+from cmdwerk.commands.libs.history_shards import ShardedHistoryIndex
+from cmdwerk.commands.libs.history_completion import HistoryCompletionEngine
+from cmdwerk.commands.libs.python_versions import parse_version_list
+
+RESULTS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'results')
+RESULTS_FORMAT_VERSION = 1
+DEFAULT_TOLERANCE = 0.2
+COMPARE_STATS = ['min', 'median', 'mean']
+
+
+class Scale(NamedTuple):
+    """Size of the synthetic data."""
+    num_scripts: int
+    num_groups: int
+    history_lines: int
+    keystroke_commands: int
+
+
+SCALES = {
+    'small': Scale(500, 10, 20000, 100),
+    'medium': Scale(5000, 50, 200000, 500),
+    'large': Scale(20000, 100, 1000000, 2000),
+}
+
+
+class Case(NamedTuple):
+    """
+    Timed call of a benchmark. 'setup' runs untimed before every round and 'inner'
+    is the number of operations done by one call, e.g. the keystrokes replayed.
+    """
+    target: Callable
+    setup: Optional[Callable] = None
+    inner: int = 1
+
+
+BENCHMARKS = {}
+
+
+def benchmark(name):
+    """Registers a function that receives the 'BenchmarkData' and returns the 'Case' to time."""
+    def register(case_func):
+        BENCHMARKS[name] = case_func
+        return case_func
+    return register
+
+
+class BenchmarkData:
+    """
+    Synthetic data of one run, created on first use in a temporary directory.
+    The program data of 'bins' and 'ppt' is redirected to the same directory.
+    """
+
+    def __init__(self, work_dir, scale):
+        self.work_dir = work_dir
+        self.scale = scale
+        self.cfg_dir = os.path.join(work_dir, 'cfg')
+        self._cache = {}
+
+    def cached(self, key, build_func):
+        """Builds a piece of data once."""
+        if key not in self._cache:
+            self._cache[key] = build_func()
+        return self._cache[key]
+
+    def bin_dir(self, marker_ratio):
+        """Directory with the synthetic scripts, 'marker_ratio' of them with the cmdwerk block."""
+        def build():
+            dir_path = os.path.join(self.work_dir, f'bin_{int(marker_ratio * 100)}')
+            make_bin_tree(dir_path, self.scale.num_scripts, self.scale.num_groups, marker_ratio)
+            return dir_path
+        return self.cached(('bin', marker_ratio), build)
+
+    def commands(self):
+        """Synthetic history commands."""
+        return self.cached('commands', lambda: make_history_commands(self.scale.history_lines))
+
+    def history_file(self, history_format):
+        """Synthetic history file in the format."""
+        writers = {'zsh': make_zsh_history, 'bash': make_bash_history, 'fish': make_fish_history}
+
+        def build():
+            file_path = os.path.join(self.work_dir, f'{history_format}_history')
+            writers[history_format](file_path, self.scale.history_lines)
+            return file_path
+        return self.cached(('history', history_format), build)
+
+    def history_index(self):
+        """Shard directory of a history index built from the zsh history, apart from the one rewritten by the syncs."""
+        def build():
+            PromptCommand.update_history_data([self.history_file('zsh')], full=True)
+            return shutil.copytree(os.path.join(self.cfg_dir, prompt_cmd.HISTORY_SHARDS_DIR),
+                                   os.path.join(self.work_dir, 'completion.shards'))
+        return self.cached('index', build)
+
+
+@contextlib.contextmanager
+def redirect_program_data(cfg_dir):
+    """Points the program data of the commands to the directory."""
+    saved = bins_cmd.PROGRAM_CFG_DIR, prompt_cmd.PROGRAM_CFG_DIR
+    bins_cmd.PROGRAM_CFG_DIR = prompt_cmd.PROGRAM_CFG_DIR = cfg_dir
+    try:
+        yield
+    finally:
+        bins_cmd.PROGRAM_CFG_DIR, prompt_cmd.PROGRAM_CFG_DIR = saved
+
+
+@benchmark('bins.load_scripts_groups[markers]')
+def bench_load_scripts_groups(data):
+    """Uncached scan of scripts with the cmdwerk block."""
+    bin_dir = data.bin_dir(0.8)
+    return Case(lambda: ScriptManager(use_cache=False, search_path=[bin_dir]).load_scripts_groups())
+
+
+@benchmark('bins.load_scripts_groups[no-markers]')
+def bench_load_scripts_groups_plain(data):
+    """Uncached scan of scripts without the cmdwerk block."""
+    bin_dir = data.bin_dir(0.0)
+    return Case(lambda: ScriptManager(use_cache=False, search_path=[bin_dir]).load_scripts_groups())
+
+
+@benchmark('bins.load_scripts_groups[cached]')
+def bench_load_scripts_groups_cached(data):
+    """Scan answered by the script index."""
+    bin_dir = data.bin_dir(0.8)
+    ScriptManager(search_path=[bin_dir]).load_scripts_groups()
+    return Case(lambda: ScriptManager(search_path=[bin_dir]).load_scripts_groups())
+
+
+@benchmark('bins.load_scripts_groups[watched]')
+def bench_load_scripts_groups_watched(data):
+    """Scan answered by an index kept up to date by a watcher, without walking the directories."""
+    bin_dir = os.path.join(data.work_dir, 'watched_bin')
+    if not os.path.exists(bin_dir):
+        shutil.copytree(data.bin_dir(0.8), bin_dir)
+    watcher = ScriptManager(search_path=[bin_dir])
+    watcher.watching = True
+    watcher.load_scripts_groups()
+    # This process plays the watcher, its pid is alive while the benchmark runs.
+    watcher.mark_watched()
+    return Case(lambda: ScriptManager(search_path=[bin_dir]).load_scripts_groups())
+
+
+@benchmark('bins.list_short_help')
+def bench_list_short_help(data):
+    """'cmdw bins' with a warm script index, the output is discarded."""
+    bin_dir = data.bin_dir(0.8)
+    ScriptManager(search_path=[bin_dir]).load_scripts_groups()
+
+    def list_short_help():
+        with contextlib.redirect_stdout(io.StringIO()):
+            ScriptManager(search_path=[bin_dir]).list_short_help()
+    return Case(list_short_help)
+
+
+@benchmark('bins.search')
+def bench_search(data):
+    """'cmdw bins search' answered from the stored search index, the output is discarded."""
+    bin_dir = data.bin_dir(0.8)
+    ScriptManager(search_path=[bin_dir]).load_scripts_groups()
+
+    def search():
+        with contextlib.redirect_stdout(io.StringIO()):
+            ScriptManager(search_path=[bin_dir]).search_scripts('deploy cluster logs', 'ndjson')
+    return Case(search)
+
+
+@benchmark('ppt.build_history_data')
+def bench_build_history_data(data):
+    """Tokenization of the history commands into the token trie."""
+    commands = data.commands()
+    return Case(lambda: build_history_data(commands))
+
+
+def history_loader(file_path, reader_class):
+    """Returns a function reading all the records of a history file."""
+    def load_history():
+        with open(file_path, 'rb') as history_fh:
+            return list(reader_class(history_fh))
+    return load_history
+
+
+@benchmark('ppt.load_history[zsh]')
+def bench_load_zsh_history(data):
+    """Streaming read of a zsh extended history."""
+    return Case(history_loader(data.history_file('zsh'), HistoryReader))
+
+
+@benchmark('ppt.load_history[bash]')
+def bench_load_bash_history(data):
+    """Streaming read of a bash history with timestamps."""
+    return Case(history_loader(data.history_file('bash'), BashHistoryReader))
+
+
+@benchmark('ppt.load_history[fish]')
+def bench_load_fish_history(data):
+    """Streaming read of a fish history."""
+    return Case(history_loader(data.history_file('fish'), FishHistoryReader))
+
+
+@benchmark('ppt.sync_with_history[full]')
+def bench_sync_full(data):
+    """Full rebuild of the history index."""
+    history_path = data.history_file('zsh')
+    return Case(lambda: PromptCommand.sync_with_history(history_path, full=True, quiet=True))
+
+
+@benchmark('ppt.sync_with_history[incremental]')
+def bench_sync_incremental(data):
+    """Merge of 1% new lines into the synced index, the synced state is restored before each round."""
+    history_path = os.path.join(data.work_dir, 'growing_history')
+    make_zsh_history(history_path, data.scale.history_lines)
+    snapshot_dir = os.path.join(data.work_dir, 'synced')
+    PromptCommand.update_history_data([history_path], full=True)
+    shutil.copytree(os.path.join(data.cfg_dir, prompt_cmd.HISTORY_SHARDS_DIR),
+                    os.path.join(snapshot_dir, prompt_cmd.HISTORY_SHARDS_DIR), dirs_exist_ok=True)
+    shutil.copy(os.path.join(data.cfg_dir, prompt_cmd.HISTORY_STATE_FILE), snapshot_dir)
+    with open(history_path, 'a', encoding='utf-8') as out_fh:
+        for command in make_history_commands(max(1, data.scale.history_lines // 100), seed=7):
+            out_fh.write(f': 1800000000:0;{command}\n')
+
+    def restore_synced_state():
+        shard_dir = os.path.join(data.cfg_dir, prompt_cmd.HISTORY_SHARDS_DIR)
+        shutil.rmtree(shard_dir)
+        shutil.copytree(os.path.join(snapshot_dir, prompt_cmd.HISTORY_SHARDS_DIR), shard_dir)
+        shutil.copy(os.path.join(snapshot_dir, prompt_cmd.HISTORY_STATE_FILE), data.cfg_dir)
+    return Case(lambda: PromptCommand.sync_with_history(history_path, quiet=True), setup=restore_synced_state)
+
+
+@benchmark('ppt.get_completions')
+def bench_get_completions(data):
+    """Replays typing the commands one key at a time through the prompt completer."""
+    # pylint: disable=import-outside-toplevel
+    from prompt_toolkit.document import Document
+    from cmdwerk.commands.prompt_ui import CustomHistoryCompleter
+    engine = HistoryCompletionEngine(ShardedHistoryIndex(data.history_index()))
+    completer = CustomHistoryCompleter(engine, time_budget=60.0)
+    documents = [Document(command[:idx])
+                 for command in data.commands()[:data.scale.keystroke_commands]
+                 for idx in range(1, len(command) + 1)]
+
+    def type_commands():
+        for document in documents:
+            list(completer.get_completions(document, None))
+    return Case(type_commands, inner=len(documents))
+
+
+@benchmark('ppt.prompt_start')
+def bench_prompt_start(data):
+    """Opening of the history index and the first completions of a session: the first word, then its sub-tree."""
+    command = next(x for x in data.commands() if ' ' in x)
+    first_word = command.split()[0]
+
+    def start_prompt():
+        history_source = ShardedHistoryIndex(data.history_index())
+        engine = HistoryCompletionEngine(history_source)
+        engine.complete(first_word[:2])
+        engine.complete(first_word + ' ')
+        history_source.close()
+    return Case(start_prompt)
+
+
+@benchmark('pyenv.newest_by_series')
+def bench_pyenv_report(data):
+    """Parsing of the 'pyenv install -l' listing and the installed versions report."""
+    version_list = make_pyenv_versions()
+    installed = parse_version_list([x.strip() for x in version_list[1::7]], min_version=(0, 0))
+    return Case(lambda: PyEnvHelperCommands.build_installed_report(installed, version_list))
+
+
+def time_case(case, max_time=1.0, min_rounds=5, max_rounds=1000):
+    """Times the rounds of a case, returns the statistics in seconds per call."""
+    if case.setup:
+        case.setup()
+    case.target()
+    timings = []
+    budget_end = time.perf_counter() + max_time
+    while len(timings) < max_rounds and (len(timings) < min_rounds or time.perf_counter() < budget_end):
+        if case.setup:
+            case.setup()
+        start = time.perf_counter()
+        case.target()
+        timings.append(time.perf_counter() - start)
+    return {
+        'min': min(timings),
+        'max': max(timings),
+        'mean': statistics.mean(timings),
+        'median': statistics.median(timings),
+        'stddev': statistics.stdev(timings) if len(timings) > 1 else 0.0,
+        'rounds': len(timings),
+        'inner': case.inner,
+    }
+
+
+def run_suite(scale, name_filter=None, max_time=1.0, min_rounds=5, report=None):
+    """
+    Runs the registered benchmarks whose name contains 'name_filter'.
+    'report(name, stats)' is called as each benchmark finishes. Returns the results document.
+    """
+    results = {}
+    with tempfile.TemporaryDirectory() as work_dir:
+        data = BenchmarkData(work_dir, scale)
+        with redirect_program_data(data.cfg_dir):
+            for name, case_func in BENCHMARKS.items():
+                if name_filter and name_filter not in name:
+                    continue
+                results[name] = time_case(case_func(data), max_time, min_rounds)
+                if report:
+                    report(name, results[name])
+    return {
+        'version': RESULTS_FORMAT_VERSION,
+        'datetime': datetime.datetime.now(datetime.timezone.utc).isoformat(timespec='seconds'),
+        'machine': {'python': platform.python_version(), 'platform': platform.platform(),
+                    'cpu_count': os.cpu_count()},
+        'scale': scale._asdict(),
+        'benchmarks': results,
+    }
+
+
+def results_path(name):
+    """Path of a saved result, names without a directory are kept in 'benchmarks/results'."""
+    if os.path.dirname(name):
+        return name
+    return os.path.join(RESULTS_DIR, name if name.endswith('.json') else f'{name}.json')
+
+
+def save_results(document, name):
+    """Saves a results document, returns its path."""
+    file_path = results_path(name)
+    os.makedirs(os.path.dirname(file_path), exist_ok=True)
+    with open(file_path, 'w', encoding='utf-8') as out_fh:
+        json.dump(document, out_fh, indent=2)
+        out_fh.write('\n')
+    return file_path
+
+
+def load_results(name):
+    """Loads a saved results document."""
+    with open(results_path(name), 'r', encoding='utf-8') as in_fh:
+        return json.load(in_fh)
+
+
+def compare_results(current, baseline, tolerance=DEFAULT_TOLERANCE, stat='median'):
+    """
+    Compares the benchmarks of two results documents.
+    Returns (name, baseline seconds, current seconds, ratio, status) tuples where the status
+    is 'regression' or 'faster' when the ratio is beyond the tolerance, 'ok' otherwise
+    and 'new' for benchmarks missing from the baseline.
+    """
+    if current['scale'] != baseline['scale']:
+        raise ValueError('The baseline was recorded at a different scale')
+    rows = []
+    for name, stats in current['benchmarks'].items():
+        base_stats = baseline['benchmarks'].get(name)
+        if base_stats is None:
+            rows.append((name, None, stats[stat], None, 'new'))
+            continue
+        ratio = stats[stat] / base_stats[stat] if base_stats[stat] else float('inf')
+        if ratio > 1 + tolerance:
+            status = 'regression'
+        elif ratio < 1 - tolerance:
+            status = 'faster'
+        else:
+            status = 'ok'
+        rows.append((name, base_stats[stat], stats[stat], ratio, status))
+    return rows
+
+
+def format_seconds(seconds):
+    """Formats a duration with a readable unit."""
+    if seconds >= 1:
+        return f'{seconds:8.3f} s '
+    if seconds >= 1e-3:
+        return f'{seconds * 1e3:8.2f} ms'
+    return f'{seconds * 1e6:8.2f} us'
+
+
+def print_stats(name, stats):
+    """Prints one benchmark result line."""
+    per_op = f'  {format_seconds(stats["median"] / stats["inner"])}/op' if stats['inner'] > 1 else ''
+    print(f'  {name:<40} min {format_seconds(stats["min"])}  median {format_seconds(stats["median"])}  '
+          f'stddev {format_seconds(stats["stddev"])}  rounds {stats["rounds"]:<4}{per_op}')
+
+
+def main(argv):
+    """Runs the suite, saves and compares the results."""
+    parser = argparse.ArgumentParser(prog='python -m benchmarks.suite', description=__doc__.split('\n\n')[0])
+    parser.add_argument('--scale', choices=sorted(SCALES), default='small')
+    parser.add_argument('--filter', dest='name_filter', help='Runs the benchmarks whose name contains the text.')
+    parser.add_argument('--max-time', type=float, default=1.0, help='Seconds spent in the rounds of a benchmark.')
+    parser.add_argument('--save', metavar='NAME', help='Saves the results as a json baseline.')
+    parser.add_argument('--compare', metavar='NAME', help='Compares the results with a saved baseline.')
+    parser.add_argument('--tolerance', type=float, default=DEFAULT_TOLERANCE,
+                        help='Slowdown fraction reported as a regression.')
+    parser.add_argument('--stat', choices=COMPARE_STATS, default='median', help='Statistic compared.')
+    args = parser.parse_args(argv)
+    if args.compare and not os.path.isfile(results_path(args.compare)):
+        parser.error(f'no baseline {results_path(args.compare)}, record one first with --save {args.compare}')
+    print(f'Benchmarks at scale {args.scale}: {SCALES[args.scale]}')
+    document = run_suite(SCALES[args.scale], args.name_filter, args.max_time, report=print_stats)
+    if args.save:
+        print(f'Saved results to {save_results(document, args.save)}')
+    if not args.compare:
+        return 0
+    rows = compare_results(document, load_results(args.compare), args.tolerance, args.stat)
+    print(f'Compared with {results_path(args.compare)} ({args.stat}, tolerance {args.tolerance:.0%}):')
+    for name, base_value, value, ratio, status in rows:
+        base_text = format_seconds(base_value) if base_value is not None else ' ' * 11
+        ratio_text = f'x{ratio:5.2f}' if ratio is not None else ' ' * 6
+        print(f'  {name:<40} {base_text} -> {format_seconds(value)}  {ratio_text}  {status}')
+    return 1 if any(x[4] == 'regression' for x in rows) else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv[1:]))
@@ -3,13 +3,20 @@
 
  CmdWerk - A minimalist tool for developer productivity
 
+ The command modules are imported by the sub-command that needs them,
+ keeping the start up of 'cmdw bins' free of prompt_toolkit and friends.
+
 """
 # pylint: enable=anomalous-backslash-in-string
+# pylint: disable=import-outside-toplevel
 
+from typing import Tuple
 import click
-from .commands.pyenv_cmd import PyEnvHelperCommands
-from .commands.bins_cmd import ScriptsCommands
-from .commands.prompt_cmd import PromptCommand
+from .commands.libs.script_header import DEFAULT_HEAD_BYTES
+from .commands.libs.history_trie import DEFAULT_MAX_CANDIDATES
+from .commands.libs.search_index import DEFAULT_SEARCH_LIMIT
+from .commands.libs.output_format import OUTPUT_FORMATS
+from .commands.libs.phase_trace import trace_phase, trace_requested, start_tracing, finish_tracing
 from . import __version__ as app_version
 from . import __title__ as app_title
 from . import __description__ as app_description
@@ -17,6 +24,7 @@ from . import __description__ as app_description
 PROGRAM_MSG = f'{app_title}, version {app_version},  {app_description}.'
 EPILOG = f'{app_title} {app_version}'
 CONTEXT_SETTINGS = {"help_option_names": ['-h', '--help']}
+FORMAT_HELP = 'Output format, json/ndjson/tsv are machine readable without colors.'
 
 
 # class CustomHelpGroup(click.Group):
@@ -35,51 +43,148 @@ CONTEXT_SETTINGS = {"help_option_names": ['-h', '--help']}
 
 @click.version_option(app_version, "--version", "-v", message=PROGRAM_MSG)
 @click.group(epilog=EPILOG, context_settings=CONTEXT_SETTINGS)
-def main():
+@click.option('--trace', is_flag=True,
+              help='Print the time, CPU, files and bytes read of each phase on stderr (or CMDW_TRACE=1).')
+@click.option('--trace-file', default=None, metavar='<file>',
+              help='Write the phases as a Chrome trace-event json file (or CMDW_TRACE_FILE).')
+def main(trace: bool, trace_file: str):
     """The main command line interface group."""
+    env_trace, env_trace_file = trace_requested()
+    trace_file = trace_file or env_trace_file
+    if trace or trace_file or env_trace:
+        start_tracing()
+        click.get_current_context().call_on_close(lambda: finish_tracing(trace_file))
 
 
 # TODO: Try to expand sub-command help into main using: @main.group(cls=CustomHelpGroup)
 @main.command(epilog=EPILOG)
-def pyenv_list():
+@click.option('--format', 'output_format', default='text', type=click.Choice(OUTPUT_FORMATS),
+              show_default=True, help=FORMAT_HELP)
+@click.option('--refresh', is_flag=True, help='Run pyenv to list the versions instead of using the cache.')
+@click.option('--stale/--no-stale', default=True, show_default=True,
+              help='Show an expired cache right away and refresh it in the background.')
+def pyenv_list(output_format: str, refresh: bool, stale: bool):
     """Shows compact PyEnv report with the official python versions"""
-    PyEnvHelperCommands.list_python_versions()
+    with trace_phase('import.pyenv_cmd'):
+        from .commands.pyenv_cmd import PyEnvHelperCommands
+    PyEnvHelperCommands.list_python_versions(output_format, refresh=refresh, stale_ok=stale)
 
 
 @main.command(epilog=EPILOG)
-@click.argument('sub-cmd', type=click.Choice(['docs', 'status'], case_sensitive=False),
-                default='docs')
+@click.option('--format', 'output_format', default='text', type=click.Choice(OUTPUT_FORMATS),
+              show_default=True, help=FORMAT_HELP)
+@click.option('--refresh', is_flag=True, help='Run pyenv to list the versions instead of using the cache.')
+@click.option('--stale/--no-stale', default=True, show_default=True,
+              help='Show an expired cache right away and refresh it in the background.')
+def pyenv_installed(output_format: str, refresh: bool, stale: bool):
+    """Shows the installed PyEnv versions and the newest patch of each series"""
+    with trace_phase('import.pyenv_cmd'):
+        from .commands.pyenv_cmd import PyEnvHelperCommands
+    PyEnvHelperCommands.list_installed_versions(output_format, refresh=refresh, stale_ok=stale)
+
+
+@main.command(epilog=EPILOG)
+@click.argument('sub-cmd', type=click.Choice(['docs', 'status', 'search', 'watch', 'completions'],
+                                            case_sensitive=False), default='docs')
+@click.argument('terms', nargs=-1)
 @click.option('--group', default='', metavar='<group_name>', show_default=True,)
-def bins(sub_cmd: str, group: str):
+@click.option('--no-cache', is_flag=True, help='Parse every script ignoring the stored index.')
+@click.option('--rebuild-index', is_flag=True, help='Discard the stored index and build it again.')
+@click.option('--head-bytes', default=DEFAULT_HEAD_BYTES, type=click.IntRange(min=0),
+              metavar='<bytes>', show_default=True,
+              help='Bytes read from each script looking for the config block (0 reads whole files).')
+@click.option('--jobs', '-j', default=1, type=click.IntRange(min=1), metavar='<N>', show_default=True,
+              help='Number of threads used to parse the scripts.')
+@click.option('--format', 'output_format', default='text', type=click.Choice(OUTPUT_FORMATS),
+              show_default=True, help=FORMAT_HELP)
+@click.option('--limit', default=DEFAULT_SEARCH_LIMIT, type=click.IntRange(min=1), metavar='<N>', show_default=True,
+              help='Maximum number of search results.')
+@click.option('--poll-seconds', default=2.0, type=click.FloatRange(min=0.1), metavar='<seconds>',
+              show_default=True, help='Interval of the watch mode when the directories are polled.')
+@click.option('--polling', is_flag=True, help='Poll the directories in the watch mode instead of using inotify.')
+@click.option('--shell', default='zsh', type=click.Choice(['zsh', 'bash']), show_default=True,
+              help='Shell of the completion file.')
+@click.option('--output', '-o', default=None, metavar='<file>',
+              help="Completion file, '-' prints it. [default: ~/.cmdwerk/completions/<file>]")
+# pylint: disable=too-many-arguments, too-many-locals
+def bins(sub_cmd: str, terms: Tuple[str], group: str, no_cache: bool, rebuild_index: bool, head_bytes: int,
+         jobs: int, output_format: str, limit: int, poll_seconds: float, polling: bool, shell: str, output: str):
     """Commands related to documenting your scripts.
 
         \b
         docs  : Show report listing scripts and help. (default)
         status: List the registered and not-registered scripts.
+        search: Find scripts by name, group and help, e.g. 'bins search aws hosts'.
+        watch : Keep the script index up to date as scripts change.
+        completions: Write the zsh or bash completion file of cmdw and the scripts.
     """
+    if terms and sub_cmd != 'search':
+        raise click.UsageError(f'Unexpected arguments for {sub_cmd}: {" ".join(terms)}')
+    with trace_phase('import.bins_cmd'):
+        from .commands.bins_cmd import ScriptsCommands
+    # 'main' describes the commands in the completion files.
+    scan_opts = {'use_cache': not no_cache, 'rebuild_index': rebuild_index,
+                 'head_bytes': head_bytes, 'jobs': jobs, 'cli_group': main}
+    if sub_cmd == 'search':
+        if not terms:
+            raise click.UsageError('search needs at least one term.')
+        ScriptsCommands.cmd_bin_search(' '.join(terms), output_format, limit, **scan_opts)
+        return
+    if sub_cmd == 'watch':
+        ScriptsCommands.cmd_bin_watch(poll_seconds, not polling, **scan_opts)
+        return
+    if sub_cmd == 'completions':
+        ScriptsCommands.cmd_bin_completions(shell, output, **scan_opts)
+        return
+    if output_format != 'text':
+        ScriptsCommands.cmd_bin_export(output_format, group, **scan_opts)
+        return
     if sub_cmd == 'status':
-        ScriptsCommands.cmd_report_bin_registrations()
+        ScriptsCommands.cmd_report_bin_registrations(**scan_opts)
         return
     # default argument makes it to list script help
     if group == '':
-        ScriptsCommands.cmd_bin_list()
+        ScriptsCommands.cmd_bin_list(**scan_opts)
     else:
-        ScriptsCommands.cmd_bin_group(group)
+        ScriptsCommands.cmd_bin_group(group, **scan_opts)
 
 
 @main.command(epilog=EPILOG)
-@click.argument('sub-cmd', type=click.Choice(['sync', 'run'], case_sensitive=False),
+@click.argument('sub-cmd', type=click.Choice(['sync', 'run', 'serve', 'stop'], case_sensitive=False),
                 default='run')
-@click.option('--history', default='~/.zsh_history',
-              metavar='<history_file>', show_default=True,)
-def ppt(sub_cmd: str, history: str):
+@click.option('--history', default=('~/.zsh_history',), multiple=True, metavar='<history_file>', show_default=True,
+              help='History file or glob pattern, repeat the option to merge several histories.')
+@click.option('--history-format', default='auto', show_default=True,
+              type=click.Choice(['auto', 'zsh', 'bash', 'fish'], case_sensitive=False),
+              help='Format of the history files, auto detects it for each file.')
+@click.option('--full', is_flag=True, help='Rebuild the prompt data instead of merging new history lines.')
+@click.option('--quiet', '-q', is_flag=True, help='Do not print the sync summary.')
+@click.option('--max-candidates', default=DEFAULT_MAX_CANDIDATES, type=click.IntRange(min=1),
+              metavar='<K>', show_default=True, help='Best ranked candidates kept for each command prefix.')
+@click.option('--workers', default=1, type=click.IntRange(min=1), metavar='<N>', show_default=True,
+              help='Processes used to tokenize the history during sync.')
+@click.option('--fuzzy', is_flag=True, help='Complete the first word by subsequence when no command starts with it.')
+# pylint: disable=too-many-arguments
+def ppt(sub_cmd: str, history: Tuple[str], history_format: str, full: bool, quiet: bool, max_candidates: int,
+        workers: int, fuzzy: bool):
     """Interactive prompt completion related commands:
 
         \b
-        sync: Update prompt data using zsh history.
-        run : Enter interactive prompt. (default)
+        sync : Update prompt data using zsh, bash or fish history.
+        run  : Enter interactive prompt. (default)
+        serve: Run the daemon that keeps the prompt data in memory.
+        stop : Stop the daemon.
     """
+    with trace_phase('import.prompt_cmd'):
+        from .commands.prompt_cmd import PromptCommand
     if sub_cmd == 'sync':
-        PromptCommand.sync_with_history(history)
+        PromptCommand.sync_with_history(list(history), full=full, quiet=quiet, max_candidates=max_candidates,
+                                        workers=workers, history_format=history_format)
+    elif sub_cmd == 'serve':
+        PromptCommand.serve(list(history), max_candidates=max_candidates, workers=workers,
+                            history_format=history_format)
+    elif sub_cmd == 'stop':
+        PromptCommand.stop_daemon()
     else:
-        PromptCommand.run()
+        PromptCommand.run(max_candidates, fuzzy)
+
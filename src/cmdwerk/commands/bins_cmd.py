@@ -1,21 +1,52 @@
 """
 This module contains implementations script reporting related commands.
 
-Note: scrips need to be located inside the '~/bin' directory.
+Note: scrips are searched in the '~/bin' directory unless a search path is
+configured with 'CMDW_PATH' or the '~/.cmdwerk/bins_path' file.
 """
 
 import os
+import sys
+import time
+import signal
 from collections import defaultdict, OrderedDict
-from dataclasses import dataclass
-from .libs.gen_utils import write_screen_cols as write_screen
+from dataclasses import dataclass, asdict
+from .. import PROGRAM_CFG_DIR
+from .libs.script_cache import ScriptIndexCache
+from .libs.search_index import ScriptSearchIndex, DEFAULT_SEARCH_LIMIT
+from .libs.script_header import DEFAULT_HEAD_BYTES, parse_header_lines, read_script_head
+# The header tokens are also exported from this module (explicit re-export form).
+# pylint: disable=useless-import-alias
+from .libs.script_header import CMDW_GROUP_TOKEN as CMDW_GROUP_TOKEN
+from .libs.script_header import CMDW_HELP_BEGIN as CMDW_HELP_BEGIN
+from .libs.script_header import CMDW_HELP_END as CMDW_HELP_END
+# pylint: enable=useless-import-alias
+from .libs.script_path import resolve_search_path, find_scripts, index_scripts, root_relative_dir
+from .libs.script_watch import WatchLock, create_watcher, stat_signature, DEFAULT_POLL_SECONDS
+from .libs.shell_completion import COMPLETION_FILES, completion_spec, completion_script, write_completion_file
+from .libs.screen_buffer import ScreenBuffer
+from .libs.output_format import RecordWriter
 from .libs.gen_utils import msg_and_exit
+from .libs.phase_trace import trace_phase, trace_count
 from .libs.gen_utils import BLUE, YELLOW, CYAN, RED, ScreenPos
 from .libs.gen_utils import SCRIPT_PADDING, MAX_DESC, NUMBER_OF_COLS
 
-# Document marker Tokens
-CMDW_GROUP_TOKEN = 'CMDW_GROUP_NAME'
-CMDW_HELP_BEGIN = 'CMDW_HELP_BEGIN'
-CMDW_HELP_END = 'CMDW_HELP_END'
+# Persistent index with the parsed script information.
+SCRIPT_INDEX_FILE = 'bins_index.json'
+# Inverted index of the script help used by 'cmdw bins search'.
+SEARCH_INDEX_FILE = 'bins_search.json'
+# Directory of the static shell completion files written by 'cmdw bins completions'.
+COMPLETIONS_DIR = 'completions'
+# Lock file held by the 'cmdw bins watch' process.
+WATCH_LOCK_FILE = 'bins_watch.lock'
+
+# Number of batches per thread used by the concurrent scan.
+SCAN_BATCHES_PER_JOB = 4
+
+# Fields of the machine readable script catalog, in tsv column order.
+CATALOG_COLUMNS = ['type', 'group', 'name', 'short_help', 'long_help', 'path', 'shadowed_by']
+# Fields of the machine readable search results.
+SEARCH_COLUMNS = ['score', 'group', 'name', 'short_help', 'path']
 
 
 @dataclass
@@ -80,52 +111,60 @@ class ScriptManager:
     listing of scripts with various formats.
     """
 
-    def __init__(self):
-        """Initializes, set empty buffers, etc."""
+    # pylint: disable=too-many-arguments
+    def __init__(self, use_cache=True, rebuild_index=False, head_bytes=DEFAULT_HEAD_BYTES, jobs=1,
+                 search_path=None, cli_group=None):
+        """
+        Initializes, set empty buffers, etc.
+        'head_bytes' limits how much of each script is read, '0' reads whole files.
+        'jobs' is the number of threads used to parse the scripts.
+        'search_path' is a list of script directories, by default taken from 'CMDW_PATH'.
+        'cli_group' is the click group of 'cmdw' listed in the completion files, without it
+        they are not written.
+        """
         self.groups = defaultdict(list)
         self.buffer = []
         self.script_groups = None
         self.misconfigured_scripts = []
         self.script_files = None
-        self.script_dir = os.path.expanduser('~/bin')
+        self.shadowed_scripts = []
+        self.search_roots = resolve_search_path(PROGRAM_CFG_DIR, search_path)
+        self.script_dir = self.search_roots[0].path
         self.global_vars = OrderedDict()
-
-    def load_script_info(self, script_name):
+        self.head_bytes = head_bytes
+        self.jobs = jobs
+        self.cli_group = cli_group
+        self.index_cache = ScriptIndexCache(
+            os.path.join(PROGRAM_CFG_DIR, SCRIPT_INDEX_FILE),
+            enabled=use_cache, rebuild=rebuild_index, head_bytes=head_bytes)
+        self.search_index = ScriptSearchIndex(os.path.join(PROGRAM_CFG_DIR, SEARCH_INDEX_FILE))
+        self.watch_lock = WatchLock(os.path.join(PROGRAM_CFG_DIR, WATCH_LOCK_FILE))
+        self.registered_scripts = []
+        # Set in the 'cmdw bins watch' process, which always walks the search path.
+        self.watching = False
+
+    def load_script_info(self, script_name, script_full_path=None):
         """Extracts the description and group"""
-
-        def clean_line(line_str: str) -> str:
-            temp = line_str.strip('\n').replace('\'', '')
-            if temp and temp[0] == '#':
-                temp = temp[1:].strip()
-            return temp
-
-        # pylint: disable=too-many-locals
-        # -- State machine states --
-        st_outside_help = 'out_help'
-        st_inside_help = 'in_help'
-        state = st_outside_help
-        script_full_path = os.path.join(self.script_dir, script_name)
-        help_lines = []
-        group_name = 'No group'
-        
-        try:
-            with open(script_full_path, 'r', encoding="utf-8") as in_file:
-                for raw_line in in_file:
-                    line = clean_line(raw_line)
-                    if state == st_outside_help:
-                        if line.startswith(CMDW_GROUP_TOKEN):
-                            parts = line.split('=')
-                            if len(parts) == 2:
-                                group_name = parts[1]
-                        elif line.startswith(CMDW_HELP_BEGIN):
-                            state = st_inside_help
-                    else:  # Case for state == st_inside_help:
-                        if line.startswith(CMDW_HELP_END):
-                            break
-                        help_lines.append(line)
-        except UnicodeDecodeError:
-            # Skip binary files or files with encoding issues
-            return None, None
+        if script_full_path is None:
+            script_full_path = os.path.join(self.script_dir, script_name)
+        if self.head_bytes:
+            try:
+                lines = read_script_head(script_full_path, self.head_bytes)
+            except OSError:
+                return None, None
+            if lines is None:
+                # Skip binary files
+                return None, None
+            group_name, help_lines = parse_header_lines(lines)
+        else:
+            try:
+                with open(script_full_path, 'r', encoding="utf-8") as in_file:
+                    group_name, help_lines = parse_header_lines(in_file)
+                    # The parsing stops at the end of the help block, the raw offset is what was read.
+                    trace_count(files=1, bytes_read=in_file.buffer.raw.tell())
+            except UnicodeDecodeError:
+                # Skip binary files or files with encoding issues
+                return None, None
 
         short_hlp = help_lines[0] if help_lines else ''
         if short_hlp:
@@ -134,8 +173,35 @@ class ScriptManager:
             return group_name, entry
         return None, None
 
-    def load_scripts_groups(self):
-        """Loads scripts into groups."""
+    def load_scripts_groups(self, on_script=None):
+        """
+        Loads scripts into groups.
+        'on_script(script_file, group, record)' is called for every script as soon as its information is known.
+        The directories are not walked when a 'cmdw bins watch' process keeps the index up to date.
+        """
+        with trace_phase('bins.index_load'):
+            self.index_cache.load()
+        with trace_phase('bins.walk'):
+            watched = None if self.watching else self.find_watched_scripts()
+            self.script_files, self.shadowed_scripts = watched or find_scripts(
+                self.search_roots, with_stat=self.index_cache.enabled)
+            trace_count(files=len(self.script_files) + len(self.shadowed_scripts))
+        with trace_phase('bins.parse', jobs=self.jobs):
+            self.group_scripts(self.load_cached_scripts_info(self.script_files, on_script))
+            if watched or self.watching:
+                # A watched index keeps the shadowed scripts too, they win when the others are removed.
+                self.load_cached_scripts_info([x for x, _ in self.shadowed_scripts])
+        # The search index follows the script index, it is rebuilt only when the scan found changes.
+        with trace_phase('bins.index_save'):
+            saved = self.index_cache.save()
+        if saved or (self.index_cache.enabled and not os.path.exists(self.search_index.index_path)):
+            with trace_phase('bins.search_index'):
+                self.update_search_index()
+            with trace_phase('bins.completions'):
+                self.refresh_completion_files()
+
+    def group_scripts(self, script_infos):
+        """Sorts the scripts into groups from their (group, record) pairs, in the order of 'script_files'."""
 
         def add_script_to_group(the_group, script_entry):
             """Adds script to a group."""
@@ -147,19 +213,301 @@ class ScriptManager:
             self.script_groups[the_group] = temp
 
         self.script_groups = {}
-        self.script_files = [
-            f for f in os.listdir(self.script_dir)
-            if os.path.isfile(os.path.join(self.script_dir, f))]
-        self.script_files = filter(lambda x: not x.startswith('.'), self.script_files)
-        for script_file in self.script_files:
-            grp_name, entry = self.load_script_info(script_file)
+        self.misconfigured_scripts = []
+        self.registered_scripts = []
+        for script_file, (grp_name, entry) in zip(self.script_files, script_infos):
             if grp_name:
                 add_script_to_group(grp_name, entry)
+                self.registered_scripts.append((script_file, grp_name, entry))
             if not entry and not grp_name:
-                self.misconfigured_scripts.append(script_file)
+                self.misconfigured_scripts.append(script_file.name)
+
+    def search_roots_key(self):
+        """The search roots as stored in the index by the watch process."""
+        return [[x.path, x.recursive] for x in self.search_roots]
+
+    def find_watched_scripts(self):
+        """
+        Returns the scripts and shadowed pairs of the stored index when a live 'cmdw bins watch'
+        process keeps it up to date for the same search path, None otherwise.
+        The watch process is live while it holds the watch lock.
+        """
+        watcher = self.index_cache.watcher
+        if (not watcher or not self.index_cache.entries_loaded or watcher['roots'] != self.search_roots_key()
+                or not self.watch_lock.is_held()):
+            return None
+        return index_scripts(self.search_roots, self.index_cache.signatures())
+
+    def hold_watch_lock(self):
+        """Takes the watch lock, exits when another 'cmdw bins watch' process holds it."""
+        if not self.watch_lock.acquire():
+            msg_and_exit(f'The scripts are already watched by process {(self.index_cache.watcher or {}).get("pid")}')
+
+    def mark_watched(self, watched=True):
+        """
+        Records in the stored index that this process keeps it up to date, holding the watch lock,
+        or that it stopped and releases the lock.
+        """
+        if watched:
+            self.hold_watch_lock()
+        watcher = {'pid': os.getpid(), 'roots': self.search_roots_key()} if watched else None
+        if self.index_cache.watcher != watcher:
+            self.index_cache.watcher = watcher
+            self.index_cache.dirty = True
+        self.index_cache.save()
+        if not watched:
+            self.watch_lock.release()
+
+    def apply_script_changes(self, paths, rescan=False):
+        """
+        Parses again the changed script paths and updates the groups and the stored indexes.
+        'rescan' walks the whole search path instead. Returns the number of scripts updated.
+        """
+        if rescan:
+            self.load_scripts_groups()
+            self.mark_watched()
+            return len(self.script_files)
+        updated = 0
+        for path in paths:
+            if all(root_relative_dir(x, path) is None for x in self.search_roots):
+                continue
+            signature = stat_signature(path)
+            if signature is None:
+                self.index_cache.remove(path)
+            elif self.index_cache.lookup(path, signature)[0]:
+                continue
+            else:
+                grp_name, entry = self.load_script_info(os.path.basename(path), path)
+                self.index_cache.store(path, signature, grp_name, asdict(entry) if entry else None)
+            updated += 1
+        if updated:
+            self.script_files, self.shadowed_scripts = index_scripts(self.search_roots, self.index_cache.signatures())
+            self.group_scripts(self.load_cached_scripts_info(self.script_files))
+            self.index_cache.save()
+            self.update_search_index()
+            self.refresh_completion_files()
+        return updated
+
+    def watch_scripts(self, poll_seconds=DEFAULT_POLL_SECONDS, use_inotify=True):
+        """
+        Keeps the stored script and search indexes up to date until interrupted, so the
+        listings read the index without walking the directories.
+        """
+        if not self.index_cache.enabled:
+            msg_and_exit('The watch mode updates the script index, it cannot run with --no-cache')
+        self.index_cache.load()
+        self.hold_watch_lock()
+        self.watching = True
+        # The watch starts before the scan so no change is missed.
+        watcher = create_watcher(self.search_roots, poll_seconds, use_inotify)
+        signal.signal(signal.SIGTERM, lambda *_: sys.exit(0))
+        try:
+            self.load_scripts_groups()
+            self.mark_watched()
+            print(f'Watching {len(self.script_files)} scripts in '
+                  f'{", ".join(x.path for x in self.search_roots)} ({watcher.name})', flush=True)
+            while True:
+                paths, rescan = watcher.read_changes(poll_seconds)
+                if paths or rescan:
+                    updated = self.apply_script_changes(paths, rescan)
+                    print(f'{time.strftime("%H:%M:%S")} {"rescanned" if rescan else "updated"} '
+                          f'{updated} scripts', flush=True)
+        except KeyboardInterrupt:
+            pass
+        finally:
+            watcher.close()
+            self.mark_watched(False)
+
+    def update_search_index(self, save=True):
+        """Rebuilds the search index from the registered scripts of the last scan, 'save' stores it."""
+        self.search_index.build(
+            {'name': x.name, 'group': grp_name, 'short_help': entry.short_help,
+             'long_help': entry.long_help, 'path': x.path}
+            for x, grp_name, entry in self.registered_scripts)
+        if save:
+            self.search_index.save()
+
+    def completion_file(self, shell):
+        """Default path of the completion file of the shell."""
+        return os.path.join(PROGRAM_CFG_DIR, COMPLETIONS_DIR, COMPLETION_FILES[shell])
+
+    def completion_content(self, shell):
+        """Returns the completion script of the shell for the scripts of the last scan."""
+        return completion_script(shell, completion_spec(self.cli_group), self.script_groups,
+                                 {(x.name, entry.short_help) for x, _, entry in self.registered_scripts})
+
+    def refresh_completion_files(self):
+        """Writes again the completion files in the default location, only those already generated."""
+        if not self.index_cache.enabled or self.cli_group is None:
+            return
+        for shell in COMPLETION_FILES:
+            file_path = self.completion_file(shell)
+            if os.path.exists(file_path):
+                write_completion_file(file_path, self.completion_content(shell))
+
+    def write_completions(self, shell, output=None):
+        """
+        Writes the completion file of the shell, 'output' defaults to the completions directory
+        and '-' prints the script. The file is left untouched when the catalog did not change.
+        """
+        self.load_scripts_groups()
+        content = self.completion_content(shell)
+        if output == '-':
+            sys.stdout.write(content)
+            return
+        file_path = os.path.expanduser(output) if output else self.completion_file(shell)
+        written = write_completion_file(file_path, content)
+        print(f'{"Wrote" if written else "Unchanged"} {file_path} '
+              f'({len(self.script_groups)} groups, {len(self.registered_scripts)} scripts)')
+        if output:
+            return
+        if shell == 'zsh':
+            print(f'Add to ~/.zshrc before compinit: fpath=({os.path.dirname(file_path)} $fpath)')
+        else:
+            print(f'Add to ~/.bashrc: source {file_path}')
+
+    def load_cached_scripts_info(self, script_files, on_script=None):
+        """
+        Returns the (group, record) pairs of the script files in the same order.
+        Only the scripts missing from the index or changed are parsed.
+        """
+        results = [None] * len(script_files)
+        pending = []
+        for idx, script_file in enumerate(script_files):
+            found, grp_name, record = self.index_cache.lookup(script_file.path, script_file.signature)
+            if found:
+                results[idx] = (grp_name, ScriptRecord(**record) if record else None)
+                if on_script:
+                    on_script(script_file, *results[idx])
+            else:
+                pending.append(idx)
+        parsed = self.iter_parsed_scripts([script_files[idx] for idx in pending])
+        for idx, (grp_name, entry) in zip(pending, parsed):
+            self.index_cache.store(
+                script_files[idx].path, script_files[idx].signature,
+                grp_name, asdict(entry) if entry else None)
+            results[idx] = (grp_name, entry)
+            if on_script:
+                on_script(script_files[idx], grp_name, entry)
+        return results
+
+    def iter_parsed_scripts(self, script_files):
+        """
+        Yields the (group, record) pairs of the scripts in the input order as they are parsed.
+        Uses a thread pool when more than one job is allowed since the scan is bound by I/O latency.
+        """
+        def parse_batch(batch):
+            return [self.load_script_info(x.name, x.path) for x in batch]
+
+        if self.jobs <= 1 or len(script_files) < 2:
+            for script_file in script_files:
+                yield self.load_script_info(script_file.name, script_file.path)
+            return
+        # Contiguous batches keep the per-task overhead low and the results in order.
+        batch_size = max(1, len(script_files) // (self.jobs * SCAN_BATCHES_PER_JOB))
+        batches = [script_files[idx:idx + batch_size] for idx in range(0, len(script_files), batch_size)]
+        # pylint: disable=import-outside-toplevel
+        from concurrent.futures import ThreadPoolExecutor
+        with ThreadPoolExecutor(max_workers=self.jobs) as pool:
+            for batch_infos in pool.map(parse_batch, batches):
+                yield from batch_infos
+
+    def export_catalog(self, output_format, group_name=None, stream=None):
+        """
+        Writes the scripts, misconfigured and shadowed scripts in a machine readable format.
+        Streaming formats write each script while the scan runs. 'group_name' limits the scripts to a group.
+        """
+        writer = RecordWriter(output_format, CATALOG_COLUMNS, stream)
+
+        def script_record(script_file, grp_name, entry):
+            if entry:
+                return {'type': 'script', 'name': script_file.name, 'group': grp_name,
+                        'short_help': entry.short_help, 'long_help': entry.long_help,
+                        'path': script_file.path}
+            return {'type': 'misconfigured', 'name': script_file.name, 'path': script_file.path}
+
+        collected = []
+
+        def emit_script(script_file, grp_name, entry):
+            if group_name and grp_name != group_name:
+                return
+            if entry or not grp_name:
+                record = script_record(script_file, grp_name, entry)
+                if writer.streaming:
+                    writer.write(record)
+                else:
+                    collected.append(record)
+
+        self.load_scripts_groups(emit_script)
+        shadowed = [] if group_name else [
+            {'type': 'shadowed', 'name': x.name, 'path': x.path, 'shadowed_by': y.path}
+            for x, y in self.shadowed_scripts]
+        if writer.streaming:
+            for record in shadowed:
+                writer.write(record)
+            return
+        groups = defaultdict(list)
+        for record in sorted(collected, key=lambda x: x['name']):
+            if record['type'] == 'script':
+                groups[record['group']].append(record)
+        writer.write_document({
+            'groups': {x: groups[x] for x in sorted(groups)},
+            'misconfigured': sorted((x for x in collected if x['type'] == 'misconfigured'),
+                                    key=lambda x: x['name']),
+            'shadowed': shadowed})
+
+    def search_scripts(self, query, output_format='text', limit=DEFAULT_SEARCH_LIMIT):
+        """
+        Lists the scripts matching the query, best ranked first.
+        Only the search index is read, the scripts are scanned when there is no index yet
+        or the scan options ask to skip or rebuild the script index.
+        """
+        if not self.index_cache.enabled:
+            # Nothing is stored when the script index is disabled.
+            self.load_scripts_groups()
+            with trace_phase('bins.search_index'):
+                self.update_search_index(save=False)
+        else:
+            with trace_phase('bins.search_index_load'):
+                loaded = not self.index_cache.rebuild and self.search_index.load()
+            if not loaded:
+                self.load_scripts_groups()
+        with trace_phase('bins.search'):
+            results = self.search_index.search(query, limit)
+        if output_format != 'text':
+            writer = RecordWriter(output_format, SEARCH_COLUMNS)
+            records = [dict(x, score=round(score, 3)) for score, x in results]
+            for record in records:
+                writer.write(record)
+            if not writer.streaming:
+                writer.write_document({'query': query, 'results': records})
+            return
+        if not results:
+            msg_and_exit(f'No scripts match "{query}"')
+        with trace_phase('bins.render'):
+            screen = ScreenBuffer()
+            self.render_search_results(screen, results)
+            screen.flush()
+
+    @staticmethod
+    def render_search_results(screen, results):
+        """Renders the (score, document) search results into the screen buffer."""
+        write_screen = screen.write
+        for _, document in results:
+            write_screen(document['name'].rjust(SCRIPT_PADDING), BLUE)
+            write_screen('  ' + document['short_help'], CYAN)
+            write_screen(f'  ({document["group"]})\n', YELLOW)
 
     def list_short_help(self, filter_str=None):
         """List all groups and the scripts belonging to the group."""
+        self.load_scripts_groups()
+        with trace_phase('bins.render'):
+            screen = ScreenBuffer()
+            self.render_short_help(screen, filter_str)
+            screen.flush()
+
+    def render_short_help(self, screen, filter_str=None):
+        """Renders the groups and their scripts in columns into the screen buffer."""
 
         def emit_script_entry(entry_record):
             script_name = entry_record.name.rjust(SCRIPT_PADDING)
@@ -172,7 +520,7 @@ class ScriptManager:
             write_screen(script_name, BLUE)
             write_screen('  ' + short_hlp, CYAN)
 
-        self.load_scripts_groups()
+        write_screen = screen.write
         sorted_keys = sorted(self.script_groups.keys())
         columns = ColumnPrinter(NUMBER_OF_COLS)
         for key in sorted_keys:
@@ -195,6 +543,17 @@ class ScriptManager:
 
     def list_long_help(self, group_name):
         """List all groups with a long help text."""
+        self.load_scripts_groups()
+        group = self.script_groups.get(group_name, None)
+        if not group:
+            msg_and_exit(f'Group "{group_name}" not found')
+        with trace_phase('bins.render'):
+            screen = ScreenBuffer()
+            self.render_long_help(screen, group_name)
+            screen.flush()
+
+    def render_long_help(self, screen, group_name):
+        """Renders the scripts of a group with their long help text into the screen buffer."""
 
         def emit_script_entry(entry_record):
             script_name = entry_record.name.rjust(SCRIPT_PADDING) + '  '
@@ -208,11 +567,9 @@ class ScriptManager:
                 write_screen(line + '\n', CYAN)
             write_screen('\n')
 
-        self.load_scripts_groups()
+        write_screen = screen.write
         columns = ColumnPrinter(1)
-        group = self.script_groups.get(group_name, None)
-        if not group:
-            msg_and_exit(f'Group "{group_name}" not found')
+        group = self.script_groups[group_name]
         write_screen(f"{group_name}", RED, pos=ScreenPos.SEPARATOR)
         sorted_scripts = sorted(group, key=lambda ent: ent.name)
         columns.reset()
@@ -230,13 +587,21 @@ class ScriptManager:
         List the scripts reporting what group are they registered or if misconfigured.
         """
         self.load_scripts_groups()
+        with trace_phase('bins.render'):
+            screen = ScreenBuffer()
+            self.render_script_registrations(screen)
+            screen.flush()
+
+    def render_script_registrations(self, screen):
+        """Renders the registration report into the screen buffer."""
+        write_screen = screen.write
         write_screen(' Registered scripts: \n', YELLOW)
         for group, scripts in sorted(self.script_groups.items(), key=lambda x: x[0]):
             for script in scripts:
                 write_screen(f'   {script.name} (group:{group})\n', CYAN)
         write_screen('\n')
         write_screen(' Misconfigured scripts: \n', YELLOW)
-        max_size = max(len(x) for x in self.misconfigured_scripts) + 2
+        max_size = max((len(x) for x in self.misconfigured_scripts), default=0) + 2
         num_cols = 120 // max_size
         for idx, script in enumerate(self.misconfigured_scripts):
             fmt_script = script.ljust(max_size)
@@ -244,24 +609,57 @@ class ScriptManager:
             if (idx+1) % num_cols == 0:
                 write_screen('\n')
         write_screen('\n\n')
+        if self.shadowed_scripts:
+            write_screen(' Shadowed scripts: \n', YELLOW)
+            for shadowed, winner in self.shadowed_scripts:
+                write_screen(f'   {shadowed.path} (shadowed by:{winner.path})\n', RED)
+            write_screen('\n')
 
 
 class ScriptsCommands:
-    """Command service for script management."""
+    """
+    Command service for script management.
+
+    The keyword options are forwarded to the 'ScriptManager' constructor.
+    """
     @classmethod
-    def cmd_bin_group(cls, group_name):
+    def cmd_bin_group(cls, group_name, **scan_opts):
         """List the scripts belonging to the group."""
-        manager = ScriptManager()
+        manager = ScriptManager(**scan_opts)
         manager.list_long_help(group_name)
 
     @classmethod
-    def cmd_bin_list(cls):
+    def cmd_bin_list(cls, **scan_opts):
         """List all the scripts."""
-        manager = ScriptManager()
+        manager = ScriptManager(**scan_opts)
         manager.list_short_help()
 
     @classmethod
-    def cmd_report_bin_registrations(cls):
+    def cmd_report_bin_registrations(cls, **scan_opts):
         """Report scripts registration status."""
-        manager = ScriptManager()
+        manager = ScriptManager(**scan_opts)
         manager.report_script_registrations()
+
+    @classmethod
+    def cmd_bin_watch(cls, poll_seconds, use_inotify=True, **scan_opts):
+        """Keep the script index up to date."""
+        manager = ScriptManager(**scan_opts)
+        manager.watch_scripts(poll_seconds, use_inotify)
+
+    @classmethod
+    def cmd_bin_completions(cls, shell, output=None, **scan_opts):
+        """Write the shell completion file."""
+        manager = ScriptManager(**scan_opts)
+        manager.write_completions(shell, output)
+
+    @classmethod
+    def cmd_bin_search(cls, query, output_format='text', limit=DEFAULT_SEARCH_LIMIT, **scan_opts):
+        """Search the scripts by name, group and help."""
+        manager = ScriptManager(**scan_opts)
+        manager.search_scripts(query, output_format, limit)
+
+    @classmethod
+    def cmd_bin_export(cls, output_format, group_name=None, **scan_opts):
+        """Writes the script catalog in a machine readable format."""
+        manager = ScriptManager(**scan_opts)
+        manager.export_catalog(output_format, group_name or None)
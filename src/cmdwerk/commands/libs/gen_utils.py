@@ -4,8 +4,8 @@ Helper functions for the python scripts.
 
 import os
 import sys
-import subprocess
 from enum import Enum
+from functools import lru_cache
 
 
 # Color constants for screen print.
@@ -42,8 +42,20 @@ def has_colors(stream):
         return False
 
 
-# Sets the flag that decides if we are outputting colors.
-HAS_COLORS = has_colors(sys.stdout)
+@lru_cache(maxsize=None)
+def stdout_has_colors():
+    """
+    Decides if we are outputting colors. The terminal is probed on the first
+    colored write instead of at import time.
+    """
+    return has_colors(sys.stdout)
+
+
+def __getattr__(name):
+    """Keeps the 'HAS_COLORS' flag available, computed on first access."""
+    if name == 'HAS_COLORS':
+        return stdout_has_colors()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
 
 def write_error(error_msg):
@@ -85,7 +97,7 @@ def write_screen(text, color=WHITE, pos=ScreenPos.PLAIN, skip_line=False):
         msg = text
     if skip_line:
         msg = '\n' + msg
-    if HAS_COLORS:
+    if stdout_has_colors():
         # seq = f"\x1b[1;%{30 + color}m{msg}\x1b[0m"
         # seq = "\x1b[1;%dm" % (30 + color) + msg + "\x1b[0m"
         sys.stdout.write(encode_msg(msg, color))
@@ -93,26 +105,29 @@ def write_screen(text, color=WHITE, pos=ScreenPos.PLAIN, skip_line=False):
         sys.stdout.write(msg)
 
 
-def write_screen_cols(
-        text, color=WHITE, pos=ScreenPos.PLAIN, num_cols=NUMBER_OF_COLS):
-    """Print text with color."""
+def format_cols_text(text, pos=ScreenPos.PLAIN, num_cols=NUMBER_OF_COLS):
+    """Decorates the text for the multi-column reports."""
     if pos == ScreenPos.CENTERED:
         char_per_line = num_cols * (SCRIPT_PADDING + MAX_DESC + 3)
         msg_str = ' ' + text.strip('\n') + ' '
         side_spacer = ((char_per_line - 2 * len(msg_str)) // 4) * '. '
         temp = side_spacer + msg_str + side_spacer[::-1]
         offset = (char_per_line - len(temp)) // 2 - 1
-        msg = (' ' * offset) + temp + '\n'
-    elif pos == ScreenPos.SEPARATOR:
+        return (' ' * offset) + temp + '\n'
+    if pos == ScreenPos.SEPARATOR:
         side_spacer = 25 * '- '
-        msg = ' ' + side_spacer + ' ' + text + ' ' + side_spacer[::-1] + '\n'
-    else:
-        msg = text
-    if HAS_COLORS:
+        return ' ' + side_spacer + ' ' + text + ' ' + side_spacer[::-1] + '\n'
+    return text
+
+
+def write_screen_cols(
+        text, color=WHITE, pos=ScreenPos.PLAIN, num_cols=NUMBER_OF_COLS):
+    """Print text with color."""
+    if stdout_has_colors():
         # seq = f"\x1b[1;%{30 + color}m{msg}\x1b[0m"
         # sys.stdout.write(seq)
         # seq = "\x1b[1;%dm" % (30 + color) + msg + "\x1b[0m"
-        sys.stdout.write(encode_msg(msg, color))
+        sys.stdout.write(encode_msg(format_cols_text(text, pos, num_cols), color))
     else:
         sys.stdout.write(text)
 
@@ -120,7 +135,8 @@ def write_screen_cols(
 # noinspection PyBroadException
 def run_bash_command(cmd_list):
     """Runs a shell command and capture exit_code, stdout, stderr."""
-    # pylint: disable=subprocess-run-check
+    # pylint: disable=subprocess-run-check, import-outside-toplevel
+    import subprocess
     try:
         result = subprocess.run(cmd_list, capture_output=True, cwd=os.getcwd())
     except TypeError:
@@ -138,6 +154,30 @@ def read_txt_file(file_name):
     return [x.strip('\n') for x in lines]
 
 
+def atomic_write(file_path, data):
+    """
+    Writes 'data', a string or bytes or a list of bytes chunks, to a temporary file that
+    then replaces 'file_path', readers never see a partial file. The directory is made if
+    needed, the temporary file is removed when the write fails and the error raised again.
+    """
+    dir_path = os.path.dirname(file_path)
+    if dir_path:
+        os.makedirs(dir_path, exist_ok=True)
+    temp_path = f'{file_path}.{os.getpid()}.tmp'
+    try:
+        if isinstance(data, str):
+            with open(temp_path, 'w', encoding='utf-8') as out_fh:
+                out_fh.write(data)
+        else:
+            with open(temp_path, 'wb') as out_fh:
+                out_fh.writelines([data] if isinstance(data, bytes) else data)
+        os.replace(temp_path, file_path)
+    except BaseException:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        raise
+
+
 def safe_make_dir(dir_path: str):
     """Makes a directory if it does not exist."""
     expanded_dir_path = os.path.expanduser(dir_path)
@@ -0,0 +1,100 @@
+"""
+Completion lookups over a history completion source.
+
+The engine has no terminal dependencies so the same lookups serve the
+interactive prompt and the 'ppt' daemon.
+
+A partially typed first word is completed from a sorted array of the first
+tokens: the tokens starting with the word are a contiguous range found with
+two binary searches. Optionally, when no token starts with the word, the
+tokens containing its characters in order (a subsequence match) are used.
+
+The lookups take an optional 'should_stop' callback, checked while ranking: a
+lookup past its time budget or superseded by a newer keystroke ends early with
+the best candidates ranked so far.
+"""
+
+import re
+import sys
+import heapq
+import bisect
+import itertools
+from .history_index import find_node
+from .history_trie import DEFAULT_MAX_CANDIDATES, until_stopped
+from .shell_tokenizer import split_words
+
+
+class HistoryCompletionEngine:
+    """
+    Completes command lines from a 'TokenTrie', a 'MappedHistoryIndex' or a 'ShardedHistoryIndex'.
+    """
+
+    def __init__(self, history_source, fuzzy=False):
+        self.history_source = history_source
+        self.fuzzy = fuzzy
+        self.first_tokens = self._build_first_tokens()
+        # (parts, node) reached by the previous keystroke, the next lookup walks down from it.
+        # A single attribute so lookups running in completion threads never see a mixed pair.
+        self._last_lookup = ((), history_source.root())
+
+    def _find_node(self, parts):
+        """Finds the node for the tokens reusing the node of the previous lookup when possible."""
+        parts = tuple(parts)
+        last_parts, last_node = self._last_lookup
+        if parts[:len(last_parts)] == last_parts:
+            node = find_node(self.history_source, parts[len(last_parts):], last_node)
+        else:
+            node = find_node(self.history_source, parts)
+        if node is not None:
+            self._last_lookup = (parts, node)
+        return node
+
+    def _build_first_tokens(self):
+        """Returns the (token, rank) pairs of the first tokens sorted by token."""
+        ranked_cmds = self.history_source.candidates(self.history_source.root())
+        return sorted(zip(ranked_cmds, itertools.count()))
+
+    def prefix_range(self, prefix):
+        """Returns the (start, end) range of the first tokens starting with the prefix."""
+        start = bisect.bisect_left(self.first_tokens, (prefix,))
+        if not prefix:
+            # An empty quoted word ('' or ""), every token starts with it.
+            return 0, len(self.first_tokens)
+        if prefix[-1] == chr(sys.maxunicode):
+            return start, len(self.first_tokens)
+        # The first string after all the strings starting with the prefix.
+        prefix_end = prefix[:-1] + chr(ord(prefix[-1]) + 1)
+        return start, bisect.bisect_left(self.first_tokens, (prefix_end,), start)
+
+    def complete_first_token(self, prefix, limit=DEFAULT_MAX_CANDIDATES, fuzzy=None, should_stop=None):
+        """
+        Returns the best ranked first tokens starting with the prefix. With 'fuzzy' set the
+        tokens containing the prefix characters in order are used when none starts with it.
+        """
+        start, end = self.prefix_range(prefix)
+        matches = self.first_tokens[start:end]
+        if start == end and (self.fuzzy if fuzzy is None else fuzzy):
+            pattern = re.compile('.*?'.join(re.escape(x) for x in prefix))
+            matches = (x for x in self.first_tokens if pattern.search(x[0]))
+        if should_stop is not None:
+            matches = until_stopped(matches, should_stop)
+        return [x[0] for x in heapq.nsmallest(limit, matches, key=lambda x: x[1])]
+
+    def complete(self, text, limit=DEFAULT_MAX_CANDIDATES, fuzzy=None, should_stop=None):
+        """
+        Returns up to 'limit' completion candidates for the text typed so far, best ranked first.
+        'fuzzy' overrides the subsequence matching of the first word set for the engine.
+        When 'should_stop()' returns True the ranking ends with the best candidates found so far.
+        """
+        parts = split_words(text)
+        if not parts:
+            return []
+        node = self._find_node(parts)
+        candidates = self.history_source.candidates(node, limit=limit, should_stop=should_stop) \
+            if node is not None else []
+        # If there is only one token string and the current token does not have
+        # candidates then treat as simple word completion case.
+        if len(parts) == 1 and not candidates:
+            # Single token command case.
+            return self.complete_first_token(parts[0], limit, fuzzy, should_stop)
+        return candidates
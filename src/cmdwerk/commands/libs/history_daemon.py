@@ -0,0 +1,251 @@
+"""
+Long lived 'ppt' server that keeps the completion index warm in memory.
+
+The server listens on a Unix domain socket. Requests and responses are json
+objects, one per line, and a client can send many requests on the same
+connection:
+
+    {"op": "complete", "text": "git ch", "limit": 50, "fuzzy": false}
+                                                       -> {"ok": true, "candidates": [...]}
+    {"op": "sync", "history": ["/path"], "full": false, "workers": 1, "max_candidates": 50,
+     "history_format": "auto"}                        -> {"ok": true, "mode": ..., "lines": ...}
+    {"op": "ping"}                                     -> {"ok": true, "pid": ...}
+    {"op": "stop"}                                     -> {"ok": true}
+
+The history files are polled and the new lines are merged into the in memory
+index, which is also written to disk so the index and the sync state stay in
+step with 'cmdw ppt sync'. A sync that fails (a history file removed or
+rotated away) is logged on stderr and the last good index keeps serving.
+A sync request with other history files or other options than the ones the
+daemon was started with is rejected, the daemon is the only writer of the
+index while it runs.
+"""
+
+import os
+import sys
+import json
+import time
+import socket
+import threading
+import socketserver
+from .history_completion import HistoryCompletionEngine
+from .history_trie import DEFAULT_MAX_CANDIDATES
+
+DAEMON_SOCKET_FILE = 'ppt.sock'
+DEFAULT_POLL_SECONDS = 2.0
+CLIENT_TIMEOUT_SECONDS = 2.0
+# A sync of a large history takes longer than a completion, the client waits for it.
+SYNC_TIMEOUT_SECONDS = None
+
+
+class HistoryDaemonError(Exception):
+    """Raised when the daemon cannot be reached or answers with an error."""
+
+
+class _RequestHandler(socketserver.StreamRequestHandler):
+    """Answers the json requests of one client connection."""
+
+    def handle(self):
+        for line in self.rfile:
+            try:
+                request = json.loads(line)
+            except ValueError as exc:
+                request = {}
+                response = {'ok': False, 'error': f'Invalid json request: {exc}'}
+            else:
+                response = self.server.daemon.handle_request(request)
+            self.wfile.write(json.dumps(response).encode('utf-8') + b'\n')
+            self.wfile.flush()
+            if isinstance(request, dict) and request.get('op') == 'stop':
+                return
+
+
+class _UnixServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    """Threaded Unix socket server that polls the history between requests."""
+    daemon_threads = True
+
+    def __init__(self, socket_path, daemon):
+        self.daemon = daemon
+        super().__init__(socket_path, _RequestHandler)
+
+    def service_actions(self):
+        self.daemon.poll_history()
+
+
+class HistoryDaemon:
+    """
+    Holds the completion source in memory and serves completions.
+    'sync_func(history_data, full, workers)' applies the new history lines to the given in
+    memory data and returns (history_data, stats), it is called when a history file changes.
+    'workers' is None unless a sync request asks for a number of processes.
+    'sync_options' are the {name: value} options the index is built with, like 'max_candidates',
+    sync requests with other values are rejected.
+    """
+
+    # pylint: disable=too-many-arguments
+    def __init__(self, socket_path, history_data, history_paths, sync_func,
+                 poll_seconds=DEFAULT_POLL_SECONDS, sync_options=None):
+        self.socket_path = socket_path
+        self.history_paths = list(history_paths)
+        self.sync_func = sync_func
+        self.sync_options = dict(sync_options or {})
+        self.poll_seconds = poll_seconds
+        self.engine = HistoryCompletionEngine(history_data)
+        self.lock = threading.Lock()
+        self.server = None
+        self._history_signature = self.history_signature()
+        self._next_poll = time.monotonic() + poll_seconds
+
+    def history_signature(self):
+        """Returns the (inode, size) of the history files, None for the missing ones."""
+        signature = []
+        for history_path in self.history_paths:
+            try:
+                stat_result = os.stat(history_path)
+            except OSError:
+                signature.append(None)
+                continue
+            signature.append((stat_result.st_ino, stat_result.st_size))
+        return signature
+
+    def sync(self, full=False, workers=None):
+        """
+        Merges the new history lines into the in memory data. A failed sync is logged and
+        raised as 'HistoryDaemonError', the index of the last good sync keeps serving.
+        """
+        with self.lock:
+            # Taken first, a failed sync is tried again when the history changes again.
+            self._history_signature = self.history_signature()
+            try:
+                history_data, stats = self.sync_func(self.engine.history_source, full, workers)
+            except Exception as exc:  # pylint: disable=broad-except
+                sys.stderr.write(f'{time.strftime("%H:%M:%S")} history sync failed: {exc}\n')
+                raise HistoryDaemonError(f'History sync failed: {exc}') from exc
+            if history_data is not self.engine.history_source or stats.get('lines'):
+                self.engine = HistoryCompletionEngine(history_data)
+        return stats
+
+    def poll_history(self):
+        """Syncs when a history file changed since the last check."""
+        now = time.monotonic()
+        if now < self._next_poll:
+            return
+        self._next_poll = now + self.poll_seconds
+        if self.history_signature() != self._history_signature:
+            try:
+                self.sync()
+            except HistoryDaemonError:
+                # Logged by 'sync', the daemon keeps serving.
+                pass
+
+    def handle_request(self, request):
+        """Returns the response for a decoded request, {'ok': False, 'error': ...} when it fails."""
+        if not isinstance(request, dict):
+            return {'ok': False, 'error': 'A request is a json object'}
+        try:
+            return self._answer(request)
+        except Exception as exc:  # pylint: disable=broad-except
+            return {'ok': False, 'error': f'{type(exc).__name__}: {exc}'}
+
+    def _answer(self, request):
+        """Returns the response for a request object."""
+        operation = request['op']
+        if operation == 'complete':
+            with self.lock:
+                candidates = self.engine.complete(request['text'], request.get('limit', DEFAULT_MAX_CANDIDATES),
+                                                  request.get('fuzzy'))
+            return {'ok': True, 'candidates': candidates}
+        if operation == 'sync':
+            if request.get('history') and request['history'] != self.history_paths:
+                return {'ok': False, 'error': f'Daemon serves {", ".join(self.history_paths)}'}
+            mismatch = [f'--{name.replace("_", "-")} {value}' for name, value in self.sync_options.items()
+                        if request.get(name, value) != value]
+            if mismatch:
+                return {'ok': False, 'error': f'Daemon syncs with {", ".join(mismatch)}'}
+            return dict(self.sync(request.get('full', False), request.get('workers')), ok=True)
+        if operation == 'ping':
+            return {'ok': True, 'pid': os.getpid(), 'history': self.history_paths}
+        if operation == 'stop':
+            threading.Thread(target=self.server.shutdown, daemon=True).start()
+            return {'ok': True}
+        return {'ok': False, 'error': f'Unknown operation: {operation}'}
+
+    def serve_forever(self):
+        """Listens on the socket until a 'stop' request, removes the socket on exit."""
+        running = HistoryDaemonClient.connect(self.socket_path)
+        if running:
+            running.close()
+            raise HistoryDaemonError(f'A daemon is already listening on {self.socket_path}')
+        try:
+            os.unlink(self.socket_path)
+        except FileNotFoundError:
+            pass
+        old_umask = os.umask(0o177)
+        try:
+            self.server = _UnixServer(self.socket_path, self)
+        finally:
+            os.umask(old_umask)
+        try:
+            self.server.serve_forever(poll_interval=min(0.5, self.poll_seconds))
+        finally:
+            self.server.server_close()
+            try:
+                os.unlink(self.socket_path)
+            except FileNotFoundError:
+                pass
+
+
+class HistoryDaemonClient:
+    """Thin client of the daemon, provides the completion engine 'complete(text, limit)' call."""
+
+    def __init__(self, sock, fuzzy=False):
+        self.sock = sock
+        self.fuzzy = fuzzy
+        self._reader = sock.makefile('rb')
+        # The prompt may run completions in several threads, one request at a time on the socket.
+        self._lock = threading.Lock()
+
+    @classmethod
+    def connect(cls, socket_path, timeout=CLIENT_TIMEOUT_SECONDS):
+        """Connects to the daemon, returns None when no daemon is listening."""
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        sock.settimeout(timeout)
+        try:
+            sock.connect(socket_path)
+        except OSError:
+            sock.close()
+            return None
+        return cls(sock)
+
+    def close(self):
+        """Closes the connection."""
+        self._reader.close()
+        self.sock.close()
+
+    def request(self, operation, timeout=CLIENT_TIMEOUT_SECONDS, **params):
+        """Sends a request and returns the decoded response, waits 'timeout' seconds for it (None: no limit)."""
+        try:
+            with self._lock:
+                self.sock.settimeout(timeout)
+                self.sock.sendall(json.dumps(dict(params, op=operation)).encode('utf-8') + b'\n')
+                line = self._reader.readline()
+        except OSError as exc:
+            raise HistoryDaemonError(f'Daemon request failed: {exc}') from exc
+        if not line:
+            raise HistoryDaemonError('Daemon closed the connection')
+        response = json.loads(line)
+        if not response.get('ok'):
+            raise HistoryDaemonError(response.get('error', 'Daemon error'))
+        return response
+
+    def complete(self, text, limit=DEFAULT_MAX_CANDIDATES, should_stop=None):
+        """
+        Returns the completion candidates computed by the daemon.
+        'should_stop' is not used, the daemon answers from its warm index within one request.
+        """
+        del should_stop
+        try:
+            return self.request('complete', text=text, limit=limit, fuzzy=self.fuzzy)['candidates']
+        except HistoryDaemonError:
+            # A daemon that went away stops the completions instead of breaking the prompt.
+            return []
@@ -0,0 +1,327 @@
+"""
+History ingestion pipeline used to build the prompt completion data.
+
+The zsh, bash and fish history formats are read as streams of records. The
+records of all the history files are deduplicated with a hash table that keeps
+the number of uses and the last use of each command, so every distinct command
+is tokenized once. The distinct commands are tokenized in chunks into partial
+token tries (optionally in a pool of worker processes) and the partial tries
+are merged by a reducer into the final trie.
+"""
+
+import os
+import re
+import glob
+import itertools
+import unicodedata
+from multiprocessing import Pool
+from typing import List, Tuple, NamedTuple
+from .history_trie import TokenTrie
+from .shell_tokenizer import split_words
+
+# zsh extended history metadata: ': <start timestamp>:<elapsed seconds>;<command>'
+ZSH_EXTENDED_RE = re.compile(r': *(\d+):\d*;')
+# Number of history commands sent to a worker at a time.
+DEFAULT_CHUNK_LINES = 5000
+
+
+# bash history timestamps written with HISTTIMEFORMAT: '#<timestamp>' before the command.
+BASH_TIMESTAMP_RE = re.compile(rb'#(\d+)\s*$')
+FISH_CMD_PREFIX = b'- cmd: '
+FISH_WHEN_RE = re.compile(rb'\s+when: *(\d+)')
+# fish escapes the backslashes and new lines of the commands.
+FISH_ESCAPE_RE = re.compile(r'\\(.)')
+HISTORY_FORMATS = ['auto', 'zsh', 'bash', 'fish']
+
+
+class HistoryRecord(NamedTuple):
+    """
+    Command read from the history and the time it started (0 if unknown).
+    After the deduplication 'count' is the number of uses and 'timestamp' the last one.
+    """
+    command: str
+    timestamp: int = 0
+    count: int = 1
+
+
+class HistoryReader:
+    """
+    Streaming reader of a (binary) zsh history file starting at a byte offset.
+    After the iteration 'end_offset' is the offset after the last line read;
+    an incomplete last line is left for the next read.
+    """
+
+    def __init__(self, history_fh, start_offset: int = 0):
+        self.history_fh = history_fh
+        self.start_offset = start_offset
+        self.end_offset = start_offset
+        self.loading_errors = 0
+        self.num_lines = 0
+
+    @staticmethod
+    def extract_command(a_line: str) -> HistoryRecord:
+        """Splits the zsh extended history metadata from the command."""
+        match = ZSH_EXTENDED_RE.match(a_line)
+        if not match:
+            return HistoryRecord(a_line)
+        return HistoryRecord(a_line[match.end():], int(match.group(1)))
+
+    def __iter__(self):
+        """Yields the history records, joining backslash continuation lines."""
+        chunks = []
+        self.history_fh.seek(self.start_offset)
+        for line in self.history_fh:
+            if not line.endswith(b'\n'):
+                # Line still being written by the shell.
+                break
+            chunks.append(line)
+            if line.rstrip().endswith(b'\\'):
+                # Command continues in the next line.
+                continue
+            self.end_offset += sum(len(x) for x in chunks)
+            try:
+                full_line = chunks[0].decode()
+                full_line += ''.join(x.decode(errors="ignore") for x in chunks[1:])
+                full_line = full_line.strip()
+                if full_line:
+                    self.num_lines += 1
+                    yield self.extract_command(full_line)
+            except UnicodeDecodeError:
+                # Error parsing one line skipping
+                self.loading_errors += 1
+            chunks = []
+
+    def decode(self, raw_line):
+        """Decodes and strips a line, counts the decoding errors. Returns None on error."""
+        try:
+            return raw_line.decode().strip()
+        except UnicodeDecodeError:
+            # Error parsing one line skipping
+            self.loading_errors += 1
+            return None
+
+    def iter_chunks(self, chunk_lines: int = DEFAULT_CHUNK_LINES):
+        """Yields lists with up to 'chunk_lines' history records."""
+        return chunk_records(self, chunk_lines)
+
+
+class BashHistoryReader(HistoryReader):
+    """
+    Reader of bash history files, one command per line. The '#<timestamp>' comment
+    lines written when HISTTIMEFORMAT is set give the time of the next command.
+    """
+
+    def __iter__(self):
+        timestamp = 0
+        self.history_fh.seek(self.start_offset)
+        for line in self.history_fh:
+            if not line.endswith(b'\n'):
+                # Line still being written by the shell.
+                break
+            self.end_offset += len(line)
+            match = BASH_TIMESTAMP_RE.match(line)
+            if match:
+                timestamp = int(match.group(1))
+                continue
+            command = self.decode(line)
+            if command:
+                self.num_lines += 1
+                yield HistoryRecord(command, timestamp)
+            timestamp = 0
+
+
+class FishHistoryReader(HistoryReader):
+    """
+    Reader of the fish history, a list of '- cmd: <command>' entries followed by
+    indented attributes like '  when: <timestamp>'. An entry ends where the next one
+    starts, so the last complete entry is only read once the next one is written.
+    """
+
+    @staticmethod
+    def unescape(command):
+        """Reverts the fish escaping of backslashes and new lines."""
+        return FISH_ESCAPE_RE.sub(lambda x: '\n' if x.group(1) == 'n' else x.group(1), command)
+
+    def __iter__(self):
+        entry = None
+        entry_size = 0
+        partial_line = False
+        self.history_fh.seek(self.start_offset)
+        for line in self.history_fh:
+            if not line.endswith(b'\n'):
+                partial_line = True
+                break
+            if line.startswith(FISH_CMD_PREFIX):
+                if entry is not None:
+                    yield from self._finish_entry(entry, entry_size)
+                entry, entry_size = [line[len(FISH_CMD_PREFIX):], 0], 0
+            elif entry is None:
+                # Nothing to wait for before the first entry.
+                self.end_offset += len(line)
+                continue
+            else:
+                match = FISH_WHEN_RE.match(line)
+                if match:
+                    entry[1] = int(match.group(1))
+            entry_size += len(line)
+        # The file end closes the last entry, fish writes whole entries at once.
+        if entry is not None and not partial_line:
+            yield from self._finish_entry(entry, entry_size)
+
+    def _finish_entry(self, entry, entry_size):
+        """Yields the record of a complete entry and moves the end offset after it."""
+        self.end_offset += entry_size
+        command = self.decode(entry[0])
+        if command:
+            self.num_lines += 1
+            yield HistoryRecord(self.unescape(command), entry[1])
+
+
+HISTORY_READERS = {'zsh': HistoryReader, 'bash': BashHistoryReader, 'fish': FishHistoryReader}
+
+
+def detect_history_format(file_path, history_fh=None):
+    """Guesses the history format from the file name and, when not conclusive, the first line."""
+    file_name = os.path.basename(file_path)
+    if 'fish' in file_name:
+        return 'fish'
+    if 'bash' in file_name:
+        return 'bash'
+    if 'zsh' in file_name or history_fh is None:
+        return 'zsh'
+    position = history_fh.tell()
+    history_fh.seek(0)
+    first_line = history_fh.readline()
+    history_fh.seek(position)
+    if first_line.startswith(FISH_CMD_PREFIX):
+        return 'fish'
+    if BASH_TIMESTAMP_RE.match(first_line):
+        return 'bash'
+    return 'zsh'
+
+
+def history_reader(history_format, file_path, history_fh, start_offset=0):
+    """Returns the reader of the history format, 'auto' detects it."""
+    if history_format == 'auto':
+        history_format = detect_history_format(file_path, history_fh)
+    return HISTORY_READERS[history_format](history_fh, start_offset)
+
+
+def expand_history_paths(patterns):
+    """
+    Returns the absolute history paths of a path or glob pattern, or a list of them.
+    Patterns without wildcards are kept even when the file does not exist.
+    """
+    patterns = [patterns] if isinstance(patterns, str) else patterns
+    paths = []
+    for pattern in patterns:
+        pattern = os.path.expanduser(pattern)
+        matches = sorted(glob.glob(pattern)) if glob.has_magic(pattern) else [pattern]
+        for path in matches:
+            path = os.path.abspath(path)
+            if path not in paths:
+                paths.append(path)
+    return paths
+
+
+def dedup_history_records(records):
+    """
+    Streams the records through a hash table keyed by command.
+    Returns one record per distinct command with its number of uses and last use,
+    in order of first appearance.
+    """
+    uses = {}
+    for record in records:
+        seen = uses.get(record.command)
+        if seen is None:
+            uses[record.command] = [record.count, record.timestamp]
+        else:
+            seen[0] += record.count
+            if record.timestamp > seen[1]:
+                seen[1] = record.timestamp
+    return [HistoryRecord(command, timestamp, count) for command, (count, timestamp) in uses.items()]
+
+
+def chunk_records(records, chunk_lines: int = DEFAULT_CHUNK_LINES):
+    """Yields lists with up to 'chunk_lines' records."""
+    records = iter(records)
+    while True:
+        chunk = list(itertools.islice(records, chunk_lines))
+        if not chunk:
+            return
+        yield chunk
+
+
+def read_history_lines(history_fh, start_offset: int = 0) -> Tuple[List[HistoryRecord], int, int]:
+    """
+    Reads the open (binary) history file from the offset and extracts the command lines.
+    An incomplete last line is left for the next read.
+    :return: List of history records, number of loading errors and the offset after the last line read.
+    """
+    reader = HistoryReader(history_fh, start_offset)
+    lines = list(reader)
+    return lines, reader.loading_errors, reader.end_offset
+
+
+def load_history_files_data(file_name: str) -> Tuple[List[str], int]:
+    """
+    Reads the history file, extracts the command line and returns them as a string list.
+    :return: List of commands in history files.
+    """
+    with open(file_name, 'rb') as f:
+        records, loading_errors, _ = read_history_lines(f)
+    return [x.command for x in records], loading_errors
+
+
+def remove_control_chars(a_string: str) -> str:
+    """Removes the unicode control characters (category 'C*')."""
+    # Printable strings have no control characters, skips the per character check.
+    if a_string.isprintable():
+        return a_string
+    return "".join(ch for ch in a_string if unicodedata.category(ch)[0] != "C")
+
+
+def tokenize_command(cmd: str) -> List[str]:
+    """Splits a command in tokens ignoring what comes after a pipe."""
+    raw_parts = split_words(cmd)
+    # Ignore commands after a pipe
+    parts = [remove_control_chars(x) for x in (itertools.takewhile(lambda x: x != '|', raw_parts))]
+    return [x for x in parts if x]
+
+
+def build_history_data(cmd_list, results=None):
+    """
+    Builds the token trie with candidate completion at each stage from command list.
+    The list items are command strings or 'HistoryRecord' entries with the time and number of uses.
+    When 'results' is given the commands are merged into that trie.
+    """
+    results = TokenTrie() if results is None else results
+    for cmd in cmd_list:
+        cmd, timestamp, count = (cmd, 0, 1) if isinstance(cmd, str) else cmd
+        parts = tokenize_command(cmd)
+        # Single token commands have no candidates.
+        if len(parts) > 1:
+            results.add(parts, count=count, timestamp=timestamp)
+    return results
+
+
+def build_partial_history_data(records):
+    """Worker stage: builds the partial trie of a chunk of history records."""
+    return build_history_data(records)
+
+
+def build_history_data_streaming(record_chunks, results=None, workers=1):
+    """
+    Builds the token trie from an iterable of history record chunks.
+    With more than one worker the chunks are tokenized by a process pool and
+    the partial tries are merged as they arrive.
+    """
+    results = TokenTrie() if results is None else results
+    if workers <= 1:
+        for chunk in record_chunks:
+            build_history_data(chunk, results)
+        return results
+    with Pool(workers) as pool:
+        for partial in pool.imap(build_partial_history_data, record_chunks):
+            results.merge(partial)
+    return results
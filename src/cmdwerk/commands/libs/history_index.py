@@ -0,0 +1,191 @@
+"""
+Compact binary completion index that can be memory mapped and queried
+without deserializing it.
+
+File layout (little endian):
+
+    header   : magic, version, num_strings, num_nodes and the section offsets.
+    strings  : sorted table of unique tokens, an array of 'num_strings + 1'
+               uint32 offsets followed by the utf-8 encoded blob.
+    nodes    : array of (token_id, first_child, num_children, count, last_seen)
+               uint32 records. Node 0 is the root. The children of a node are
+               stored contiguously and sorted by token, so the candidate list of
+               a node is the node range [first_child, first_child + num_children).
+               The usage count and last seen timestamp rank the candidates.
+
+Since the string table is sorted, sorting children by token id is the same as
+sorting them by token and both lookups are binary searches.
+"""
+
+import mmap
+import struct
+from collections import deque
+from .gen_utils import atomic_write
+from .history_trie import rank_tokens
+
+INDEX_MAGIC = b'CMDWHIDX'
+INDEX_VERSION = 2
+HEADER = struct.Struct('<8sIIIIII')
+OFFSET = struct.Struct('<I')
+NODE = struct.Struct('<IIIII')
+ROOT_TOKEN_ID = 0xFFFFFFFF
+MAX_UINT32 = 0xFFFFFFFF
+
+
+class HistoryIndexError(Exception):
+    """Raised when a history index file is invalid."""
+
+
+def write_history_index(file_path, source):
+    """
+    Writes the completion tree of 'source' into a binary index file.
+    'source' provides 'root()', 'iter_children(node)' yielding (token, child_node) pairs
+    and 'node_stats(node)' with the (count, last_seen) usage of a node.
+    """
+    # pylint: disable=too-many-locals
+    # Breadth first traversal so the children of every node are contiguous.
+    tokens = set()
+    flat_nodes = [[ROOT_TOKEN_ID, 0, 0, 0, 0]]
+    node_tokens = [None]
+    queue = deque([(0, source.root())])
+    while queue:
+        node_idx, node = queue.popleft()
+        children = sorted(source.iter_children(node), key=lambda x: x[0])
+        flat_nodes[node_idx][1] = len(flat_nodes)
+        flat_nodes[node_idx][2] = len(children)
+        for token, child in children:
+            tokens.add(token)
+            queue.append((len(flat_nodes), child))
+            count, last_seen = source.node_stats(child)
+            flat_nodes.append([ROOT_TOKEN_ID, 0, 0, min(count, MAX_UINT32), min(last_seen, MAX_UINT32)])
+            node_tokens.append(token)
+
+    strings = sorted(tokens)
+    string_ids = {token: idx for idx, token in enumerate(strings)}
+    encoded = [x.encode('utf-8', errors='surrogatepass') for x in strings]
+    offsets = [0]
+    for item in encoded:
+        offsets.append(offsets[-1] + len(item))
+    for node_idx in range(1, len(flat_nodes)):
+        flat_nodes[node_idx][0] = string_ids[node_tokens[node_idx]]
+
+    offsets_pos = HEADER.size
+    blob_pos = offsets_pos + OFFSET.size * len(offsets)
+    nodes_pos = blob_pos + offsets[-1]
+    header = HEADER.pack(INDEX_MAGIC, INDEX_VERSION, len(strings), len(flat_nodes),
+                         offsets_pos, blob_pos, nodes_pos)
+    atomic_write(file_path, [header, struct.pack(f'<{len(offsets)}I', *offsets), b''.join(encoded),
+                             b''.join(NODE.pack(*x) for x in flat_nodes)])
+
+
+class MappedHistoryIndex:
+    """
+    Read only view of a binary completion index backed by 'mmap'.
+    Nodes are integer ids and the root is node '0'.
+    """
+
+    def __init__(self, file_path):
+        """Maps the index file and validates the header."""
+        with open(file_path, 'rb') as index_fh:
+            try:
+                self._map = mmap.mmap(index_fh.fileno(), 0, access=mmap.ACCESS_READ)
+            except ValueError as exc:
+                raise HistoryIndexError(f'Empty history index: {file_path}') from exc
+        if len(self._map) < HEADER.size:
+            raise HistoryIndexError(f'Truncated history index: {file_path}')
+        (magic, version, self.num_strings, self.num_nodes,
+         self._offsets_pos, self._blob_pos, self._nodes_pos) = HEADER.unpack_from(self._map, 0)
+        if magic != INDEX_MAGIC or version != INDEX_VERSION:
+            raise HistoryIndexError(f'Unsupported history index: {file_path}')
+
+    def close(self):
+        """Releases the memory map."""
+        self._map.close()
+
+    def _string_bytes(self, string_id):
+        """Returns the encoded token for a string id."""
+        start, = OFFSET.unpack_from(self._map, self._offsets_pos + OFFSET.size * string_id)
+        end, = OFFSET.unpack_from(self._map, self._offsets_pos + OFFSET.size * (string_id + 1))
+        return self._map[self._blob_pos + start:self._blob_pos + end]
+
+    def _string(self, string_id):
+        """Returns the token for a string id."""
+        return self._string_bytes(string_id).decode('utf-8', errors='surrogatepass')
+
+    def _string_id(self, token):
+        """Binary search of the token in the string table, returns None if missing."""
+        target = token.encode('utf-8', errors='surrogatepass')
+        low, high = 0, self.num_strings
+        while low < high:
+            middle = (low + high) // 2
+            if self._string_bytes(middle) < target:
+                low = middle + 1
+            else:
+                high = middle
+        if low < self.num_strings and self._string_bytes(low) == target:
+            return low
+        return None
+
+    def _node(self, node):
+        """Returns the (token_id, first_child, num_children, count, last_seen) record of a node."""
+        return NODE.unpack_from(self._map, self._nodes_pos + NODE.size * node)
+
+    def root(self):
+        """Returns the root node."""
+        return 0
+
+    def child(self, node, token):
+        """Returns the child node for the token or None."""
+        string_id = self._string_id(token)
+        if string_id is None:
+            return None
+        _, first_child, num_children, _, _ = self._node(node)
+        low, high = first_child, first_child + num_children
+        while low < high:
+            middle = (low + high) // 2
+            if self._node(middle)[0] < string_id:
+                low = middle + 1
+            else:
+                high = middle
+        if low < first_child + num_children and self._node(low)[0] == string_id:
+            return low
+        return None
+
+    def iter_children(self, node):
+        """Yields the (token, child_node) pairs of a node."""
+        _, first_child, num_children, _, _ = self._node(node)
+        for child in range(first_child, first_child + num_children):
+            yield self._string(self._node(child)[0]), child
+
+    def node_stats(self, node):
+        """Returns the (count, last_seen) usage of a node."""
+        return self._node(node)[3:]
+
+    def candidates(self, node, now=None, limit=None, should_stop=None):
+        """
+        Returns the completion candidates of a node, best ranked first, at most 'limit' of them.
+        'should_stop' interrupts the ranking like in 'rank_tokens'.
+        """
+        _, first_child, num_children, _, _ = self._node(node)
+
+        def token_stats():
+            # Decoded while ranked, an interrupted ranking does not decode the other children.
+            for child in range(first_child, first_child + num_children):
+                token_id, _, _, count, last_seen = self._node(child)
+                yield self._string(token_id), count, last_seen
+
+        return rank_tokens(token_stats(), now, limit, should_stop)
+
+    def first_tokens(self):
+        """Returns the first tokens of all the commands."""
+        return [token for token, _ in self.iter_children(self.root())]
+
+
+def find_node(source, parts, node=None):
+    """Walks the tokens down from 'node' (the root by default), returns None if the path is missing."""
+    node = source.root() if node is None else node
+    for token in parts:
+        node = source.child(node, token)
+        if node is None:
+            return None
+    return node
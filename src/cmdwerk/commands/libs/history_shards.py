@@ -0,0 +1,203 @@
+"""
+History completion index split in one shard per first token.
+
+The shard directory holds a manifest and the shards, all in the binary index
+format of 'history_index':
+
+    manifest.idx : the root and the first tokens (git, docker, kubectl, ...)
+                   with their usage, which is all the prompt needs to start
+                   and to complete the first word.
+    <digest>.idx : the sub-tree of one first token, its root is the node of
+                   the first token. The name is a digest of the token.
+
+'ShardedHistoryIndex' maps the manifest and maps a shard the first time the
+completions walk into it, the mapped shards are kept in a small LRU. A sync
+loads and rewrites the manifest and only the shards of the first tokens it
+touched, see 'load_history_shards'.
+"""
+
+import os
+import hashlib
+import threading
+from collections import OrderedDict
+from .history_index import MappedHistoryIndex, HistoryIndexError, write_history_index
+from .history_trie import TokenTrie, TrieNode
+from .phase_trace import trace_count
+
+MANIFEST_FILE = 'manifest.idx'
+SHARD_SUFFIX = '.idx'
+DEFAULT_MAX_LOADED_SHARDS = 8
+
+
+def shard_file_name(token):
+    """Returns the shard file name of a first token, a digest so any token makes a valid name."""
+    digest = hashlib.blake2b(token.encode('utf-8', errors='surrogatepass'), digest_size=12).hexdigest()
+    return digest + SHARD_SUFFIX
+
+
+class SubtreeSource:
+    """
+    Completion source view of the sub-tree under 'root_node' of another source, down to
+    'max_depth' levels (all of them by default). Nodes are (source_node, depth) pairs.
+    """
+
+    def __init__(self, source, root_node, max_depth=None):
+        self.source = source
+        self.root_node = root_node
+        self.max_depth = max_depth
+
+    def root(self):
+        """Returns the root node."""
+        return self.root_node, 0
+
+    def iter_children(self, node):
+        """Yields the (token, child_node) pairs of a node above the depth limit."""
+        source_node, depth = node
+        if self.max_depth is not None and depth >= self.max_depth:
+            return
+        for token, child in self.source.iter_children(source_node):
+            yield token, (child, depth + 1)
+
+    def node_stats(self, node):
+        """Returns the (count, last_seen) usage of a node."""
+        return self.source.node_stats(node[0])
+
+
+def write_history_shards(shard_dir, source, touched=None):
+    """
+    Writes the completion tree of 'source' as a manifest and shards.
+    Only the shards of the 'touched' first tokens are written, all of them when None.
+    The shards of the first tokens not in 'source' any more are removed.
+    Returns the number of shards written.
+    """
+    os.makedirs(shard_dir, exist_ok=True)
+    first_nodes = dict(source.iter_children(source.root()))
+    written = 0
+    # The shards go first, a prompt reading the previous manifest still finds its shards.
+    for token, node in first_nodes.items():
+        if touched is None or token in touched:
+            write_history_index(os.path.join(shard_dir, shard_file_name(token)), SubtreeSource(source, node))
+            written += 1
+    write_history_index(os.path.join(shard_dir, MANIFEST_FILE), SubtreeSource(source, source.root(), 1))
+    shard_names = {shard_file_name(x) for x in first_nodes}
+    for file_name in os.listdir(shard_dir):
+        if file_name.endswith(SHARD_SUFFIX) and file_name != MANIFEST_FILE and file_name not in shard_names:
+            os.remove(os.path.join(shard_dir, file_name))
+    return written
+
+
+def load_history_shards(index, first_tokens):
+    """
+    Returns a 'TokenTrie' with all the first tokens of a 'ShardedHistoryIndex' and the sub-trees
+    of the 'first_tokens' alone, the shards of the other first tokens are not read. Written back
+    with 'write_history_shards(..., touched=first_tokens)' it keeps the other shards as they are.
+    """
+    trie = TokenTrie()
+    for token, node in index.iter_children(index.root()):
+        child = trie.root_node.children[token] = TrieNode(*index.node_stats(node))
+        if token in first_tokens:
+            child.children = TokenTrie.from_source(SubtreeSource(index, node)).root_node.children
+    return trie
+
+
+class ShardedHistoryIndex:
+    """
+    Read only completion source over a shard directory, same interface as 'MappedHistoryIndex'.
+    Nodes are (first_token, shard_node) pairs, the root is (None, 0).
+    """
+
+    def __init__(self, shard_dir, max_loaded_shards=DEFAULT_MAX_LOADED_SHARDS):
+        """Maps the manifest, raises FileNotFoundError or HistoryIndexError like 'MappedHistoryIndex'."""
+        self.shard_dir = shard_dir
+        self.max_loaded_shards = max_loaded_shards
+        self.manifest = MappedHistoryIndex(os.path.join(shard_dir, MANIFEST_FILE))
+        trace_count(files=1)
+        self._shards = OrderedDict()
+        # The completions run in background threads.
+        self._lock = threading.Lock()
+
+    def close(self):
+        """Releases the manifest and the loaded shards."""
+        with self._lock:
+            self._shards.clear()
+        self.manifest.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    @property
+    def loaded_shards(self):
+        """First tokens of the loaded shards, least recently used first."""
+        return list(self._shards)
+
+    def shard(self, token):
+        """Returns the mapped shard of a first token, None when it has no shard."""
+        with self._lock:
+            if token in self._shards:
+                self._shards.move_to_end(token)
+                return self._shards[token]
+        try:
+            shard = MappedHistoryIndex(os.path.join(self.shard_dir, shard_file_name(token)))
+            trace_count(files=1)
+        except (FileNotFoundError, HistoryIndexError):
+            # Removed by a sync after the manifest was mapped.
+            shard = None
+        with self._lock:
+            self._shards[token] = shard
+            while len(self._shards) > self.max_loaded_shards:
+                # Not closed, a completion thread may still walk it, the map goes with the last reference.
+                self._shards.popitem(last=False)
+        return shard
+
+    def root(self):
+        """Returns the root node."""
+        return None, 0
+
+    def child(self, node, token):
+        """Returns the child node for the token or None."""
+        first_token, shard_node = node
+        if first_token is None:
+            return (token, 0) if self.manifest.child(0, token) is not None else None
+        shard = self.shard(first_token)
+        child = shard.child(shard_node, token) if shard else None
+        return None if child is None else (first_token, child)
+
+    def iter_children(self, node):
+        """Yields the (token, child_node) pairs of a node."""
+        first_token, shard_node = node
+        if first_token is None:
+            for token, _ in self.manifest.iter_children(0):
+                yield token, (token, 0)
+            return
+        shard = self.shard(first_token)
+        if shard:
+            for token, child in shard.iter_children(shard_node):
+                yield token, (first_token, child)
+
+    def node_stats(self, node):
+        """Returns the (count, last_seen) usage of a node."""
+        first_token, shard_node = node
+        if first_token is None:
+            return 0, 0
+        if shard_node == 0:
+            return self.manifest.node_stats(self.manifest.child(0, first_token))
+        shard = self.shard(first_token)
+        return shard.node_stats(shard_node) if shard else (0, 0)
+
+    def candidates(self, node, now=None, limit=None, should_stop=None):
+        """
+        Returns the completion candidates of a node, best ranked first, at most 'limit' of them.
+        'should_stop' interrupts the ranking like in 'rank_tokens'.
+        """
+        first_token, shard_node = node
+        if first_token is None:
+            return self.manifest.candidates(0, now, limit, should_stop)
+        shard = self.shard(first_token)
+        return shard.candidates(shard_node, now, limit, should_stop) if shard else []
+
+    def first_tokens(self):
+        """Returns the first tokens of all the commands."""
+        return self.manifest.first_tokens()
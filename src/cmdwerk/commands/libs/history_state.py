@@ -0,0 +1,73 @@
+"""
+Bookkeeping for incremental history syncs.
+
+For every history file the state records its inode, the byte offset processed
+by the last sync and a checksum of the bytes just before that offset. A later
+sync only reads past the offset when the file is the same one and its
+processed tail is unchanged. Otherwise the history was truncated or rotated
+and the index must be rebuilt. New files are read from the start.
+"""
+
+import os
+import json
+import hashlib
+from .gen_utils import atomic_write
+
+STATE_FORMAT_VERSION = 2
+TAIL_CHECKSUM_BYTES = 512
+
+
+def tail_checksum(file_handle, offset):
+    """Returns the checksum of the 'TAIL_CHECKSUM_BYTES' bytes before the offset."""
+    start = max(0, offset - TAIL_CHECKSUM_BYTES)
+    file_handle.seek(start)
+    return hashlib.sha1(file_handle.read(offset - start)).hexdigest()
+
+
+class HistorySyncState:
+    """Position of the last processed line of every history file, stored as json."""
+
+    def __init__(self, state_path):
+        self.state_path = state_path
+        # History path -> {'inode', 'offset', 'checksum'}.
+        self.files = {}
+
+    def load(self):
+        """Loads the stored state, returns False if there is none."""
+        try:
+            with open(self.state_path, 'r', encoding='utf-8') as state_fh:
+                payload = json.load(state_fh)
+        except (OSError, ValueError):
+            return False
+        if payload.get('version') != STATE_FORMAT_VERSION:
+            return False
+        self.files = payload['files']
+        return True
+
+    def same_files(self, history_paths):
+        """True when no history file synced before is missing from the paths."""
+        return set(self.files) <= set(history_paths)
+
+    def resume_offset(self, history_path, file_handle):
+        """
+        Returns the offset where a sync of the open history file can resume, 0 for a file
+        synced while empty, or None when there is no state for the file or it was rewritten.
+        """
+        file_state = self.files.get(history_path)
+        if file_state is None:
+            return None
+        stat_result = os.fstat(file_handle.fileno())
+        if stat_result.st_ino != file_state['inode'] or stat_result.st_size < file_state['offset']:
+            return None
+        if tail_checksum(file_handle, file_state['offset']) != file_state['checksum']:
+            return None
+        return file_state['offset']
+
+    def update(self, history_path, file_handle, offset):
+        """Records the position reached by a sync."""
+        self.files[history_path] = {'inode': os.fstat(file_handle.fileno()).st_ino, 'offset': offset,
+                                    'checksum': tail_checksum(file_handle, offset)}
+
+    def save(self):
+        """Writes the state next to the history index."""
+        atomic_write(self.state_path, json.dumps({'version': STATE_FORMAT_VERSION, 'files': self.files}))
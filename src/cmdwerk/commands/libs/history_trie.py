@@ -0,0 +1,225 @@
+"""
+Token trie with the completion candidates learned from the command history.
+
+Each command is stored once as a path of tokens, the candidates for a typed
+prefix are the children of the node at the end of that path.
+
+Nodes count how many commands went through them and when the last one was
+used, candidates are ranked by a frecency score built from both values.
+"""
+
+import time
+import heapq
+from collections import defaultdict
+
+KEY_SEPARATOR = '|_|'
+
+# Frecency ranking: the weight of a use halves every 'HALF_LIFE_DAYS'.
+HALF_LIFE_DAYS = 30
+SECONDS_PER_DAY = 24 * 60 * 60
+# Candidates kept per node by 'prune', the first tokens have their own limit.
+DEFAULT_MAX_CANDIDATES = 50
+DEFAULT_MAX_FIRST_TOKENS = 2000
+# Candidates ranked between two calls of the 'should_stop' callback of an interruptible ranking.
+STOP_CHECK_INTERVAL = 256
+
+
+def frecency_score(count, last_seen, now):
+    """
+    Returns the rank score for a candidate used 'count' times, the last one at 'last_seen'.
+    Candidates without timestamps are ranked by count alone.
+    """
+    if not last_seen:
+        return float(count)
+    age_days = max(0.0, now - last_seen) / SECONDS_PER_DAY
+    return count * 0.5 ** (age_days / HALF_LIFE_DAYS)
+
+
+def until_stopped(items, should_stop):
+    """
+    Yields the items until 'should_stop()' returns True, it is called every 'STOP_CHECK_INTERVAL'
+    items. The first items are always yielded so a late ranking still has its best candidates.
+    """
+    for idx, item in enumerate(items, 1):
+        yield item
+        if idx % STOP_CHECK_INTERVAL == 0 and should_stop():
+            return
+
+
+def rank_tokens(token_stats, now=None, limit=None, should_stop=None):
+    """
+    Sorts (token, count, last_seen) tuples by decreasing frecency, ties by token.
+    Returns the tokens, at most 'limit' of them. When 'should_stop()' returns True the
+    ranking ends with the best of the tuples seen so far.
+    """
+    now = time.time() if now is None else now
+    if should_stop is not None:
+        token_stats = until_stopped(token_stats, should_stop)
+
+    def rank_key(item):
+        return -frecency_score(item[1], item[2], now), item[0]
+
+    if limit is None:
+        ranked = sorted(token_stats, key=rank_key)
+    else:
+        # Partial selection, large candidate sets are not fully sorted.
+        ranked = heapq.nsmallest(limit, token_stats, key=rank_key)
+    return [x[0] for x in ranked]
+
+
+class TrieNode:
+    """Trie node, the children are indexed by token."""
+    __slots__ = ('children', 'count', 'last_seen')
+
+    def __init__(self, count=0, last_seen=0):
+        self.children = {}
+        self.count = count
+        self.last_seen = last_seen
+
+
+class TokenTrie:
+    """
+    Token trie that implements the completion source interface shared with
+    'MappedHistoryIndex': nodes are opaque handles and the root is 'root()'.
+    """
+
+    def __init__(self):
+        self.root_node = TrieNode()
+
+    def add(self, parts, count=1, timestamp=0):
+        """Adds the path of tokens of a command used 'count' times, the last one at 'timestamp'."""
+        node = self.root_node
+        for token in parts:
+            child = node.children.get(token)
+            if child is None:
+                child = node.children[token] = TrieNode()
+            child.count += count
+            if timestamp > child.last_seen:
+                child.last_seen = timestamp
+            node = child
+
+    def merge(self, other):
+        """
+        Merges another trie into this one adding the counts and keeping the latest use.
+        The sub-trees missing here are moved from 'other', which should not be used afterwards.
+        """
+        pending = [(self.root_node, other.root_node)]
+        while pending:
+            node, other_node = pending.pop()
+            for token, other_child in other_node.children.items():
+                child = node.children.get(token)
+                if child is None:
+                    node.children[token] = other_child
+                    continue
+                child.count += other_child.count
+                if other_child.last_seen > child.last_seen:
+                    child.last_seen = other_child.last_seen
+                pending.append((child, other_child))
+
+    def __getstate__(self):
+        """Flattens the trie in pre-order (depth, token, count, last_seen) tuples, avoids deep pickle recursion."""
+        flat = []
+        pending = [(1, token, child) for token, child in reversed(self.root_node.children.items())]
+        while pending:
+            depth, token, node = pending.pop()
+            flat.append((depth, token, node.count, node.last_seen))
+            pending.extend((depth + 1, x, y) for x, y in reversed(node.children.items()))
+        return flat
+
+    def __setstate__(self, flat):
+        """Rebuilds the trie from the pre-order tuples."""
+        self.root_node = TrieNode()
+        path = [self.root_node]
+        for depth, token, count, last_seen in flat:
+            del path[depth:]
+            node = path[-1].children[token] = TrieNode(count, last_seen)
+            path.append(node)
+
+    def prune(self, max_candidates=DEFAULT_MAX_CANDIDATES,
+              max_first_tokens=DEFAULT_MAX_FIRST_TOKENS, now=None, pruned_first_tokens=None):
+        """
+        Keeps only the best ranked children of every node, the evicted children
+        are removed with their sub-trees. Returns the number of evicted nodes.
+        'pruned_first_tokens' is a set that receives the first tokens of the commands that lost nodes.
+        """
+        now = time.time() if now is None else now
+        evicted = 0
+        pending = [(self.root_node, max_first_tokens, None)]
+        while pending:
+            node, limit, first_token = pending.pop()
+            if len(node.children) > limit:
+                kept = heapq.nlargest(
+                    limit, node.children.items(),
+                    key=lambda x: frecency_score(x[1].count, x[1].last_seen, now))
+                evicted += len(node.children) - limit
+                node.children = dict(kept)
+                if first_token is not None and pruned_first_tokens is not None:
+                    pruned_first_tokens.add(first_token)
+            pending.extend((child, max_candidates, first_token or token) for token, child in node.children.items())
+        return evicted
+
+    def root(self):
+        """Returns the root node."""
+        return self.root_node
+
+    @staticmethod
+    def child(node, token):
+        """Returns the child node for the token or None."""
+        return node.children.get(token)
+
+    @staticmethod
+    def iter_children(node):
+        """Yields the (token, child_node) pairs of a node."""
+        return iter(node.children.items())
+
+    @staticmethod
+    def node_stats(node):
+        """Returns the (count, last_seen) usage of a node."""
+        return node.count, node.last_seen
+
+    @staticmethod
+    def candidates(node, now=None, limit=None, should_stop=None):
+        """
+        Returns the completion candidates of a node, best ranked first, at most 'limit' of them.
+        'should_stop' interrupts the ranking like in 'rank_tokens'.
+        """
+        return rank_tokens(((token, child.count, child.last_seen)
+                            for token, child in node.children.items()), now, limit, should_stop)
+
+    def first_tokens(self):
+        """Returns the first tokens of all the commands."""
+        return sorted(self.root_node.children)
+
+    def to_dict(self):
+        """Returns the trie as a dictionary of candidate sets keyed by the '|_|' joined prefix."""
+        result = defaultdict(set)
+        pending = [(self.root_node, [])]
+        while pending:
+            node, parts = pending.pop()
+            if parts and node.children:
+                result[KEY_SEPARATOR.join(parts)].update(node.children)
+            for token, child in node.children.items():
+                pending.append((child, parts + [token]))
+        return result
+
+    @classmethod
+    def from_source(cls, source):
+        """Copies any completion source, like a mapped index, into a new trie."""
+        trie = cls()
+        pending = [(source.root(), trie.root_node)]
+        while pending:
+            src_node, node = pending.pop()
+            for token, src_child in source.iter_children(src_node):
+                child = node.children[token] = TrieNode(*source.node_stats(src_child))
+                pending.append((src_child, child))
+        return trie
+
+    @classmethod
+    def from_completion_dict(cls, completion_dict):
+        """Builds a trie from a dictionary of candidate sets keyed by the '|_|' joined prefix."""
+        trie = cls()
+        for key, values in completion_dict.items():
+            parts = key.split(KEY_SEPARATOR)
+            for value in values:
+                trie.add(parts + [value])
+        return trie
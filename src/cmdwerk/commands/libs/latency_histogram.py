@@ -0,0 +1,62 @@
+"""
+Histogram of latencies with power of two millisecond buckets.
+"""
+
+import threading
+
+# Upper bounds of the buckets in milliseconds, the last bucket has no bound.
+BUCKET_BOUNDS_MS = [0.25 * 2 ** x for x in range(12)]
+BAR_WIDTH = 40
+
+
+class LatencyHistogram:
+    """Counts latencies, safe to update from several threads."""
+
+    def __init__(self, name='latency'):
+        self.name = name
+        self.counts = [0] * (len(BUCKET_BOUNDS_MS) + 1)
+        self.total = 0.0
+        self.maximum = 0.0
+        self._lock = threading.Lock()
+
+    def record(self, seconds):
+        """Adds a latency measured in seconds."""
+        millis = seconds * 1000
+        bucket = next((idx for idx, bound in enumerate(BUCKET_BOUNDS_MS) if millis <= bound),
+                      len(BUCKET_BOUNDS_MS))
+        with self._lock:
+            self.counts[bucket] += 1
+            self.total += millis
+            self.maximum = max(self.maximum, millis)
+
+    @property
+    def num_samples(self):
+        """Number of recorded latencies."""
+        return sum(self.counts)
+
+    def percentile(self, fraction):
+        """Returns the upper bound in ms of the bucket holding the percentile, None without samples."""
+        target = fraction * self.num_samples
+        seen = 0
+        for idx, count in enumerate(self.counts):
+            seen += count
+            if count and seen >= target:
+                return BUCKET_BOUNDS_MS[idx] if idx < len(BUCKET_BOUNDS_MS) else self.maximum
+        return None
+
+    def format(self):
+        """Returns the histogram as text lines."""
+        num_samples = self.num_samples
+        if not num_samples:
+            return [f'{self.name}: no samples']
+        lines = [f'{self.name}: {num_samples} samples, mean {self.total / num_samples:.2f} ms, '
+                 f'p50 <= {self.percentile(0.5):g} ms, p95 <= {self.percentile(0.95):g} ms, '
+                 f'max {self.maximum:.2f} ms']
+        largest = max(self.counts)
+        for idx, count in enumerate(self.counts):
+            if not count:
+                continue
+            label = f'<= {BUCKET_BOUNDS_MS[idx]:g} ms' if idx < len(BUCKET_BOUNDS_MS) else \
+                f'>  {BUCKET_BOUNDS_MS[-1]:g} ms'
+            lines.append(f'  {label:>12} {count:6} {"#" * max(1, count * BAR_WIDTH // largest)}')
+        return lines
@@ -0,0 +1,50 @@
+"""
+Machine readable output of the reports.
+
+'json' writes one document when the command finishes, 'ndjson' and 'tsv'
+write one line per record as soon as it is available so consumers can start
+working before the command finishes. None of them use colors.
+"""
+
+import sys
+import json
+
+TEXT_FORMAT = 'text'
+OUTPUT_FORMATS = [TEXT_FORMAT, 'json', 'ndjson', 'tsv']
+TSV_ESCAPES = str.maketrans({'\\': '\\\\', '\t': '\\t', '\n': '\\n', '\r': '\\r'})
+
+
+def escape_tsv_field(value) -> str:
+    """Converts a value to a tsv field, escaping tabs, new lines and backslashes."""
+    return '' if value is None else str(value).translate(TSV_ESCAPES)
+
+
+class RecordWriter:
+    """
+    Writes dictionary records in one of the machine readable formats.
+    'columns' are the tsv columns, written as the header line.
+    """
+
+    def __init__(self, output_format, columns, stream=None):
+        self.output_format = output_format
+        self.columns = columns
+        self.stream = sys.stdout if stream is None else stream
+        self.streaming = output_format in ('ndjson', 'tsv')
+        if output_format == 'tsv':
+            self.stream.write('\t'.join(columns) + '\n')
+
+    def write(self, record):
+        """Writes a record right away, json documents are written by 'write_document'."""
+        if self.output_format == 'ndjson':
+            self.stream.write(json.dumps(record, ensure_ascii=False) + '\n')
+        elif self.output_format == 'tsv':
+            self.stream.write('\t'.join(escape_tsv_field(record.get(x)) for x in self.columns) + '\n')
+        else:
+            return
+        self.stream.flush()
+
+    def write_document(self, document):
+        """Writes the whole json document."""
+        json.dump(document, self.stream, ensure_ascii=False, indent=2)
+        self.stream.write('\n')
+        self.stream.flush()
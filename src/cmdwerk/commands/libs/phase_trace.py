@@ -0,0 +1,204 @@
+"""
+Phase instrumentation enabled with 'cmdw --trace' or 'CMDW_TRACE=1'.
+
+The commands wrap their phases (index load, directory walk, parsing, rendering,
+...) in 'trace_phase' blocks and report the files and bytes they read with
+'trace_count'. Both are no-ops until tracing starts. Each phase records its wall
+and CPU time, the counts are added to every open phase so a phase includes the
+work of the phases nested in it. Each thread has its own stack of open phases,
+the other threads (the scan workers, the completion threads) work inside the
+phases open in the thread that started tracing.
+
+At exit the phases are printed as a summary table on stderr, keeping stdout
+clean for the machine readable formats, or written as a Chrome trace-event json
+file that can be loaded in chrome://tracing or https://ui.perfetto.dev.
+"""
+
+import os
+import sys
+import time
+
+TRACE_ENV = 'CMDW_TRACE'
+TRACE_FILE_ENV = 'CMDW_TRACE_FILE'
+
+
+class TracePhase:
+    """A timed phase of a command, used as a context manager."""
+
+    def __init__(self, tracer, name, args):
+        self.tracer = tracer
+        self.name = name
+        self.args = args
+        self.depth = 0
+        self.thread = 0
+        self.start = self.cpu_start = 0.0
+        self.wall = self.cpu = 0.0
+        self.files = 0
+        self.bytes_read = 0
+
+    def __enter__(self):
+        self.tracer.push(self)
+        self.start = time.perf_counter()
+        self.cpu_start = time.process_time()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.cpu = time.process_time() - self.cpu_start
+        self.wall = time.perf_counter() - self.start
+        self.tracer.pop(self)
+
+
+class _NoPhase:
+    """Phase used when tracing is off, does nothing."""
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return None
+
+
+NO_PHASE = _NoPhase()
+
+
+class PhaseTracer:
+    """Collects the phases of a command."""
+
+    def __init__(self):
+        self.enabled = False
+        self.origin = 0.0
+        self.phases = []
+        self._main_stack = []
+        self._local = None
+        self._lock = None
+        self._get_ident = None
+
+    def start(self):
+        """Starts recording, discarding the phases recorded before."""
+        # Loaded here, the commands start faster without threading when not tracing.
+        # pylint: disable=import-outside-toplevel
+        import threading
+        # The scan parses the scripts in several threads.
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._get_ident = threading.get_ident
+        self._main_stack = self._local.stack = []
+        self.enabled = True
+        self.origin = time.perf_counter()
+        self.phases = []
+
+    def _open_phases(self):
+        """The phases open for the calling thread, outermost first. Called holding the lock."""
+        stack = getattr(self._local, 'stack', None)
+        if stack is None:
+            stack = self._local.stack = []
+        return stack if stack is self._main_stack else self._main_stack + stack
+
+    def push(self, phase):
+        """Opens a phase in the calling thread."""
+        with self._lock:
+            phase.depth = len(self._open_phases())
+            phase.thread = self._get_ident()
+            self._local.stack.append(phase)
+
+    def pop(self, phase):
+        """Closes a phase of the calling thread and records it."""
+        with self._lock:
+            self._local.stack.remove(phase)
+            self.phases.append(phase)
+
+    def stop(self):
+        """Stops recording, returns the phases in start order."""
+        self.enabled = False
+        return sorted(self.phases, key=lambda x: x.start)
+
+    def phase(self, name, **args):
+        """Returns the context manager timing a phase, 'args' are shown in the trace viewer."""
+        return TracePhase(self, name, args)
+
+    def count(self, files=0, bytes_read=0):
+        """Adds files and bytes read to the phases open for the calling thread."""
+        with self._lock:
+            for phase in self._open_phases():
+                phase.files += files
+                phase.bytes_read += bytes_read
+
+
+TRACER = PhaseTracer()
+
+
+def trace_phase(name, **args):
+    """Times the enclosed block as a phase when tracing, does nothing otherwise."""
+    return TRACER.phase(name, **args) if TRACER.enabled else NO_PHASE
+
+
+def trace_count(files=0, bytes_read=0):
+    """Adds files and bytes read to the open phases when tracing."""
+    if TRACER.enabled:
+        TRACER.count(files, bytes_read)
+
+
+def trace_requested():
+    """Returns (enabled, trace_file) from the 'CMDW_TRACE' and 'CMDW_TRACE_FILE' environment variables."""
+    trace_file = os.environ.get(TRACE_FILE_ENV) or None
+    return os.environ.get(TRACE_ENV, '') not in ('', '0') or trace_file is not None, trace_file
+
+
+def summary_rows(phases):
+    """
+    Aggregates the phases by name and depth in the order they started.
+    Returns (depth, name, calls, wall, cpu, files, bytes_read) rows.
+    """
+    rows = {}
+    for phase in phases:
+        row = rows.setdefault((phase.depth, phase.name), [phase.depth, phase.name, 0, 0.0, 0.0, 0, 0])
+        row[2] += 1
+        row[3] += phase.wall
+        row[4] += phase.cpu
+        row[5] += phase.files
+        row[6] += phase.bytes_read
+    return [tuple(x) for x in rows.values()]
+
+
+def write_summary(phases, stream=None):
+    """Prints the phases as a table, nested phases are indented under their parent."""
+    stream = sys.stderr if stream is None else stream
+    stream.write(f'{"Phase":<36} {"Calls":>6} {"Wall ms":>9} {"CPU ms":>9} {"Files":>7} {"Bytes":>11}\n')
+    for depth, name, calls, wall, cpu, files, bytes_read in summary_rows(phases):
+        label = ('  ' * depth + name)[:36]
+        stream.write(f'{label:<36} {calls:>6} {wall * 1000:>9.2f} {cpu * 1000:>9.2f} '
+                     f'{files:>7} {bytes_read:>11,}\n')
+
+
+def write_chrome_trace(phases, file_path, origin=0.0):
+    """Writes the phases as Chrome trace-event 'complete' events, times in microseconds."""
+    # pylint: disable=import-outside-toplevel
+    import json
+    pid = os.getpid()
+    # Small thread numbers in the order of their first phase.
+    threads = {}
+    for phase in phases:
+        threads.setdefault(phase.thread, len(threads) + 1)
+    events = [{'name': x.name, 'cat': 'cmdw', 'ph': 'X', 'pid': pid, 'tid': threads[x.thread],
+               'ts': round((x.start - origin) * 1e6, 1), 'dur': round(x.wall * 1e6, 1),
+               'args': dict(x.args, cpu_ms=round(x.cpu * 1000, 3), files=x.files, bytes_read=x.bytes_read)}
+              for x in phases]
+    with open(file_path, 'w', encoding='utf-8') as trace_fh:
+        json.dump({'traceEvents': events, 'displayTimeUnit': 'ms'}, trace_fh)
+
+
+def start_tracing():
+    """Turns the instrumentation on."""
+    TRACER.start()
+
+
+def finish_tracing(trace_file=None, stream=None):
+    """Turns the instrumentation off and reports the phases, to 'trace_file' when given."""
+    if not TRACER.enabled:
+        return
+    phases = TRACER.stop()
+    if trace_file:
+        write_chrome_trace(phases, trace_file, TRACER.origin)
+        (sys.stderr if stream is None else stream).write(f'Trace written to {trace_file}\n')
+    else:
+        write_summary(phases, stream)
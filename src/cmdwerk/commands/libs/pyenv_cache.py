@@ -0,0 +1,134 @@
+"""
+Cache of the versions available to 'pyenv install'.
+
+The list is stored as json with the time it was built and a key made of the
+pyenv root, the pyenv version and the python-build definitions directory.
+The key is read from the filesystem, so checking the cache runs no process.
+A cache with a different key is invalid (pyenv was upgraded or moved), a cache
+older than its time to live is stale and can still be shown while a background
+process refreshes it.
+"""
+
+import os
+import re
+import json
+import time
+import shutil
+from .gen_utils import atomic_write
+from .phase_trace import trace_count
+
+CACHE_FORMAT_VERSION = 1
+DEFAULT_CACHE_TTL = 24 * 60 * 60
+# A background refresh lock older than this is considered abandoned.
+REFRESH_LOCK_TIMEOUT = 10 * 60
+PYENV_VERSION_RE = re.compile(r'version="([^"]+)"')
+
+
+def pyenv_root():
+    """Returns the pyenv root directory, like 'pyenv root' does."""
+    return os.environ.get('PYENV_ROOT') or os.path.expanduser('~/.pyenv')
+
+
+def pyenv_install_dir():
+    """Returns the directory where pyenv itself is installed or None if it is not in the path."""
+    executable = shutil.which('pyenv')
+    if not executable:
+        return None
+    # 'bin/pyenv' links to 'libexec/pyenv' in git and homebrew installs.
+    return os.path.dirname(os.path.dirname(os.path.realpath(executable)))
+
+
+def pyenv_cache_key(root=None, install_dir=None):
+    """Returns the key of the available versions: pyenv root, pyenv version and definitions signature."""
+    root = pyenv_root() if root is None else root
+    install_dir = pyenv_install_dir() if install_dir is None else install_dir
+    key = {'root': root, 'pyenv_version': None, 'definitions': None}
+    if not install_dir:
+        return key
+    try:
+        with open(os.path.join(install_dir, 'libexec', 'pyenv---version'), 'r', encoding='utf-8') as version_fh:
+            match = PYENV_VERSION_RE.search(version_fh.read())
+        key['pyenv_version'] = match.group(1) if match else None
+    except OSError:
+        pass
+    try:
+        definitions = os.stat(os.path.join(install_dir, 'plugins', 'python-build', 'share', 'python-build'))
+        key['definitions'] = definitions.st_mtime_ns
+    except OSError:
+        pass
+    return key
+
+
+class PyEnvVersionCache:
+    """Available python versions stored as json in the configuration directory."""
+
+    def __init__(self, cache_path, ttl=DEFAULT_CACHE_TTL):
+        self.cache_path = cache_path
+        self.ttl = ttl
+        self.key = None
+        self.created = 0
+        self.versions = None
+
+    def load(self):
+        """Loads the stored list, returns False if there is none."""
+        try:
+            with open(self.cache_path, 'r', encoding='utf-8') as cache_fh:
+                payload = json.load(cache_fh)
+                trace_count(files=1, bytes_read=cache_fh.tell())
+        except (OSError, ValueError):
+            return False
+        if payload.get('version') != CACHE_FORMAT_VERSION:
+            return False
+        self.key = payload['key']
+        self.created = payload['created']
+        self.versions = payload['versions']
+        return True
+
+    def matches(self, key):
+        """True when the stored list was built for the same pyenv install."""
+        return self.versions is not None and self.key == key
+
+    def is_fresh(self, now=None):
+        """True when the stored list is younger than the time to live."""
+        now = time.time() if now is None else now
+        return 0 <= now - self.created < self.ttl
+
+    def age(self, now=None):
+        """Seconds since the stored list was built."""
+        now = time.time() if now is None else now
+        return max(0.0, now - self.created)
+
+    def save(self, key, versions, now=None):
+        """Stores the version names built for the key."""
+        self.key = key
+        self.created = time.time() if now is None else now
+        self.versions = list(versions)
+        payload = {'version': CACHE_FORMAT_VERSION, 'key': self.key,
+                   'created': self.created, 'versions': self.versions}
+        atomic_write(self.cache_path, json.dumps(payload))
+
+    @property
+    def lock_path(self):
+        """Lock file held by the background refresh."""
+        return f'{self.cache_path}.refresh'
+
+    def acquire_refresh_lock(self, now=None):
+        """Takes the background refresh lock, returns False if another refresh is running."""
+        now = time.time() if now is None else now
+        try:
+            if now - os.stat(self.lock_path).st_mtime > REFRESH_LOCK_TIMEOUT:
+                os.unlink(self.lock_path)
+        except OSError:
+            pass
+        try:
+            os.close(os.open(self.lock_path, os.O_CREAT | os.O_EXCL | os.O_WRONLY))
+        except OSError:
+            return False
+        return True
+
+    def release_refresh_lock(self):
+        """Removes the background refresh lock."""
+        try:
+            os.unlink(self.lock_path)
+        except OSError:
+            pass
@@ -0,0 +1,73 @@
+"""
+Parsing of the official CPython version names listed by 'pyenv install -l'.
+
+Versions are compared with tuple keys so sorting and grouping by series do not
+depend on the order of the listing.
+"""
+
+import re
+from typing import NamedTuple, Optional
+
+# Final releases rank after their pre-releases.
+RELEASE_LEVELS = {'a': 0, 'b': 1, 'rc': 2, '': 3}
+VERSION_RE = re.compile(r'(\d+)\.(\d+)\.(\d+)(?:(a|b|rc)(\d+))?(t)?')
+MIN_PYTHON_VERSION = (3, 7)
+
+
+class PythonVersion(NamedTuple):
+    """Official CPython version, the tuple order is the release order."""
+    major: int
+    minor: int
+    patch: int
+    release_level: int = RELEASE_LEVELS['']
+    serial: int = 0
+    free_threaded: bool = False
+    name: str = ''
+
+    @property
+    def series(self):
+        """The (major, minor) pair of the version."""
+        return self.major, self.minor
+
+    @property
+    def is_final(self):
+        """True for final releases."""
+        return self.release_level == RELEASE_LEVELS['']
+
+    @property
+    def release(self):
+        """The version without the build variant, builds of the same release compare equal."""
+        return self[:5]
+
+
+def parse_version(name: str) -> Optional[PythonVersion]:
+    """Parses an official version name like '3.12.1' or '3.13.0rc2', returns None for other names."""
+    match = VERSION_RE.fullmatch(name.strip())
+    if not match:
+        return None
+    major, minor, patch, level, serial, free_threaded = match.groups()
+    return PythonVersion(int(major), int(minor), int(patch), RELEASE_LEVELS[level or ''],
+                         int(serial or 0), bool(free_threaded), name.strip())
+
+
+def parse_version_list(lines, min_version=MIN_PYTHON_VERSION):
+    """
+    Returns the official versions from 'min_version' on, newest first.
+    Development, alternative implementations and unknown names are skipped.
+    """
+    versions = {x for x in map(parse_version, lines) if x and x.series >= min_version}
+    return sorted(versions, reverse=True)
+
+
+def newest_by_series(versions):
+    """
+    Returns the index of the newest version of each (major, minor) series.
+    Final releases win over pre-releases and the default build over the free-threaded one.
+    """
+    index = {}
+    for version in versions:
+        current = index.get(version.series)
+        if current is None or ((version.is_final, version.release, not version.free_threaded) >
+                               (current.is_final, current.release, not current.free_threaded)):
+            index[version.series] = version
+    return index
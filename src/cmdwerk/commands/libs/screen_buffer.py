@@ -0,0 +1,55 @@
+"""
+Buffered renderer for the multi-column reports.
+
+The report is collected as styled spans and written to the terminal at once.
+Adjacent spans with the same color share one escape sequence and whitespace
+only text joins the previous span, since its color is not visible. Without
+colors the plain text is collected and no spans are built.
+
+The output matches a sequence of 'write_screen_cols' calls.
+"""
+
+import sys
+from .gen_utils import WHITE, NUMBER_OF_COLS, ScreenPos
+from .gen_utils import encode_msg, format_cols_text, stdout_has_colors
+
+
+class ScreenBuffer:
+    """Collects the report text and emits it with a single write."""
+
+    def __init__(self, colors=None):
+        """'colors' forces the colored output on or off, by default it is detected on stdout."""
+        self.colors = stdout_has_colors() if colors is None else colors
+        # Plain text pieces without colors, [color, pieces] spans otherwise.
+        self._parts = []
+        self._last_color = None
+
+    def write(self, text, color=WHITE, pos=ScreenPos.PLAIN, num_cols=NUMBER_OF_COLS):
+        """Adds text to the buffer, same arguments as 'write_screen_cols'."""
+        if not self.colors:
+            self._parts.append(text)
+            return
+        msg = format_cols_text(text, pos, num_cols)
+        if color != self._last_color and not (self._parts and msg.isspace()):
+            self._parts.append((color, []))
+            self._last_color = color
+        self._parts[-1][1].append(msg)
+
+    @property
+    def num_spans(self):
+        """Number of escape sequences in the colored output."""
+        return len(self._parts) if self.colors else 0
+
+    def render(self):
+        """Returns the buffered report as a string."""
+        if not self.colors:
+            return ''.join(self._parts)
+        return ''.join(encode_msg(''.join(pieces), color) for color, pieces in self._parts)
+
+    def flush(self, stream=None):
+        """Writes the buffered report and empties the buffer."""
+        stream = sys.stdout if stream is None else stream
+        stream.write(self.render())
+        stream.flush()
+        self._parts = []
+        self._last_color = None
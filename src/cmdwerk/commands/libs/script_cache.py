@@ -0,0 +1,140 @@
+"""
+Persistent index with the parsed metadata of the scripts.
+
+Scripts are keyed by their full path and validated with a signature built from
+the file size, modification time and inode, so only new or changed files need
+to be parsed again. The entries are only valid for the header window they were
+parsed with, an index written with another '--head-bytes' starts empty.
+"""
+
+import json
+from .gen_utils import atomic_write
+from .phase_trace import trace_count
+from .script_header import DEFAULT_HEAD_BYTES
+
+INDEX_FORMAT_VERSION = 1
+
+
+def file_signature(stat_result):
+    """Builds the signature used to detect changes in a script file."""
+    return [stat_result.st_size, stat_result.st_mtime_ns, stat_result.st_ino]
+
+
+class ScriptIndexCache:
+    """
+    On-disk index of script metadata keyed by path and file signature.
+
+    Entries are (group, record) pairs as returned by the script parser; a pair
+    of 'None' values marks a misconfigured script. Entries not seen during the
+    last scan are evicted when the index is saved.
+    'watcher' records the pid and search roots of a 'cmdw bins watch' process
+    keeping the index up to date, None when there is none. It is kept by a rebuild.
+    'entries_loaded' is False when the stored entries were discarded.
+    """
+
+    def __init__(self, index_path, enabled=True, rebuild=False, head_bytes=DEFAULT_HEAD_BYTES):
+        """
+        Initializes the cache; 'rebuild' discards the stored entries.
+        'head_bytes' is the header window the scripts are parsed with.
+        """
+        self.index_path = index_path
+        self.head_bytes = head_bytes
+        self.enabled = enabled
+        self.rebuild = rebuild
+        self.entries = {}
+        self.seen = set()
+        self.watcher = None
+        self.entries_loaded = False
+        self.dirty = False
+        self.hits = 0
+        self.misses = 0
+
+    def load(self):
+        """Loads the stored index. A missing or unreadable index starts empty."""
+        self.entries = {}
+        self.seen = set()
+        self.watcher = None
+        self.entries_loaded = False
+        if not self.enabled:
+            return
+        # A rebuild writes the index even when there is none.
+        self.dirty = self.rebuild
+        try:
+            with open(self.index_path, 'r', encoding='utf-8') as index_fh:
+                payload = json.load(index_fh)
+                trace_count(files=1, bytes_read=index_fh.tell())
+        except (OSError, ValueError):
+            return
+        if payload.get('version') != INDEX_FORMAT_VERSION:
+            self.dirty = True
+            return
+        # Read even by a rebuild, a running watch process stays registered.
+        self.watcher = payload.get('watcher')
+        if self.rebuild:
+            return
+        if payload.get('head_bytes', DEFAULT_HEAD_BYTES) != self.head_bytes:
+            # Parsed with another header window, a config past it may be missing.
+            self.dirty = True
+            return
+        self.entries = payload.get('scripts', {})
+        self.entries_loaded = True
+
+    def lookup(self, path, signature):
+        """
+        Returns (True, group, record_dict) when the stored entry for the path
+        matches the signature and (False, None, None) otherwise.
+        """
+        if not self.enabled:
+            return False, None, None
+        self.seen.add(path)
+        entry = self.entries.get(path)
+        if entry is None or entry['sig'] != signature:
+            self.misses += 1
+            return False, None, None
+        self.hits += 1
+        return True, entry['group'], entry['record']
+
+    def store(self, path, signature, group, record_dict):
+        """Stores the parsed information of a script."""
+        if not self.enabled:
+            return
+        self.seen.add(path)
+        self.entries[path] = {'sig': signature, 'group': group, 'record': record_dict}
+        self.dirty = True
+
+    def remove(self, path):
+        """Removes the entry of a deleted script."""
+        self.seen.discard(path)
+        if self.entries.pop(path, None) is not None:
+            self.dirty = True
+
+    def signatures(self):
+        """Returns the {path: signature} of the stored scripts."""
+        return {path: entry['sig'] for path, entry in self.entries.items()}
+
+    def evict_unseen(self):
+        """Removes the entries of scripts that were not found in the last scan."""
+        stale = [path for path in self.entries if path not in self.seen]
+        for path in stale:
+            del self.entries[path]
+        if stale:
+            self.dirty = True
+        return len(stale)
+
+    def save(self):
+        """Evicts deleted scripts and writes the index if anything changed, returns True if it did."""
+        if not self.enabled:
+            return False
+        self.evict_unseen()
+        if not self.dirty:
+            return False
+        payload = {'version': INDEX_FORMAT_VERSION, 'head_bytes': self.head_bytes, 'scripts': self.entries}
+        if self.watcher:
+            payload['watcher'] = self.watcher
+        try:
+            atomic_write(self.index_path, json.dumps(payload, separators=(',', ':')))
+        except OSError:
+            # The index is only an optimization, failing to save it is not fatal.
+            return False
+        self.dirty = False
+        return True
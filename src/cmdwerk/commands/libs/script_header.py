@@ -0,0 +1,90 @@
+"""
+Parser of the cmdwerk config block found in the head of the scripts.
+"""
+
+import re
+from .phase_trace import trace_count
+
+# Document marker Tokens
+CMDW_GROUP_TOKEN = 'CMDW_GROUP_NAME'
+CMDW_HELP_BEGIN = 'CMDW_HELP_BEGIN'
+CMDW_HELP_END = 'CMDW_HELP_END'
+
+CMDW_MARKERS_RE = re.compile(f'{CMDW_GROUP_TOKEN}|{CMDW_HELP_BEGIN}')
+
+# Header parsing limits: the config block must be inside the first 'DEFAULT_HEAD_BYTES'.
+DEFAULT_HEAD_BYTES = 64 * 1024
+BINARY_SNIFF_BYTES = 8000
+BINARY_MAGIC_NUMBERS = (
+    b'\x7fELF',              # ELF executables
+    b'\xcf\xfa\xed\xfe',      # Mach-O 64 bits
+    b'\xce\xfa\xed\xfe',      # Mach-O 32 bits
+    b'\xca\xfe\xba\xbe',      # Mach-O universal / java class
+    b'PK\x03\x04',           # zip archives and wheels
+    b'\x1f\x8b',              # gzip
+    b'\x89PNG',              # png images
+)
+
+
+def clean_header_line(line_str: str) -> str:
+    """Removes the comment marker, quotes and line break from a header line."""
+    temp = line_str.strip('\n').replace('\'', '')
+    if temp and temp[0] == '#':
+        temp = temp[1:].strip()
+    return temp
+
+
+def parse_header_lines(lines):
+    """
+    Runs the config block state machine over the script lines.
+    Returns the group name and the list of help lines.
+    """
+    # -- State machine states --
+    st_outside_help = 'out_help'
+    st_inside_help = 'in_help'
+    state = st_outside_help
+    help_lines = []
+    group_name = 'No group'
+    for raw_line in lines:
+        line = clean_header_line(raw_line)
+        if state == st_outside_help:
+            if line.startswith(CMDW_GROUP_TOKEN):
+                parts = line.split('=')
+                if len(parts) == 2:
+                    group_name = parts[1]
+            elif line.startswith(CMDW_HELP_BEGIN):
+                state = st_inside_help
+        else:  # Case for state == st_inside_help:
+            if line.startswith(CMDW_HELP_END):
+                break
+            help_lines.append(line)
+    return group_name, help_lines
+
+
+def is_binary_content(data: bytes) -> bool:
+    """Sniffs the first bytes of a file looking for NUL bytes or executable/archive magic numbers."""
+    return data.startswith(BINARY_MAGIC_NUMBERS) or b'\0' in data[:BINARY_SNIFF_BYTES]
+
+
+def read_script_head(file_path, head_bytes=DEFAULT_HEAD_BYTES):
+    """
+    Reads the head window of a script with a single read.
+    Returns the lines starting at the first config marker, an empty list
+    when there are no markers or None for binary files.
+    """
+    with open(file_path, 'rb') as in_file:
+        data = in_file.read(head_bytes)
+    trace_count(files=1, bytes_read=len(data))
+    if is_binary_content(data):
+        return None
+    if len(data) == head_bytes:
+        # Drops the last line since it may be truncated.
+        last_break = data.rfind(b'\n')
+        if last_break >= 0:
+            data = data[:last_break + 1]
+    text = data.decode('utf-8', errors='replace')
+    match = CMDW_MARKERS_RE.search(text)
+    if not match:
+        return []
+    line_start = text.rfind('\n', 0, match.start()) + 1
+    return text[line_start:].splitlines()
@@ -0,0 +1,174 @@
+"""
+Script search path resolution and discovery.
+
+The search path works like '$PATH': it is a list of directories separated by
+':' read from the 'CMDW_PATH' environment variable or, when it is not set, from
+the 'bins_path' file in the configuration directory (one directory per line).
+Directories ending with '/**' are searched recursively. When the same script
+name is found more than once the first one wins and the others are shadowed.
+"""
+
+import os
+from dataclasses import dataclass
+from .script_cache import file_signature
+
+SEARCH_PATH_ENV = 'CMDW_PATH'
+SEARCH_PATH_FILE = 'bins_path'
+DEFAULT_SEARCH_PATH = ['~/bin']
+RECURSIVE_SUFFIX = '/**'
+
+
+@dataclass
+class SearchRoot:
+    """Directory where scripts are searched."""
+    path: str
+    recursive: bool = False
+
+
+@dataclass
+class ScriptFile:
+    """Script found while walking the search path."""
+    name: str
+    path: str
+    signature: list | None = None
+
+
+def parse_search_root(entry: str) -> SearchRoot:
+    """Parses one search path entry."""
+    recursive = entry.endswith(RECURSIVE_SUFFIX)
+    if recursive:
+        entry = entry[:-len(RECURSIVE_SUFFIX)] or '/'
+    return SearchRoot(os.path.expanduser(entry), recursive)
+
+
+def read_search_path_file(file_path):
+    """Reads the search path entries from the config file, ignoring comments."""
+    try:
+        with open(file_path, 'r', encoding='utf-8') as path_fh:
+            lines = [line.strip() for line in path_fh]
+    except OSError:
+        return []
+    return [line for line in lines if line and not line.startswith('#')]
+
+
+def resolve_search_path(cfg_dir, entries=None):
+    """
+    Returns the list of search roots using, in order of precedence, the given
+    entries, the 'CMDW_PATH' variable, the config file or the default '~/bin'.
+    """
+    if entries is None:
+        env_value = os.environ.get(SEARCH_PATH_ENV)
+        if env_value:
+            entries = env_value.split(os.pathsep)
+        else:
+            entries = read_search_path_file(os.path.join(cfg_dir, SEARCH_PATH_FILE))
+    entries = [x for x in entries if x] or DEFAULT_SEARCH_PATH
+    roots = []
+    for entry in entries:
+        root = parse_search_root(entry)
+        if root not in roots:
+            roots.append(root)
+    return roots
+
+
+def walk_root(root: SearchRoot, with_stat=True):
+    """
+    Yields the regular, non-hidden files of a search root using 'os.scandir'.
+    The files of a directory come in name order, before its sub-directories.
+    The 'DirEntry' type information avoids a stat call per entry, the stat
+    signature is only collected when 'with_stat' is set.
+    """
+    pending_dirs = [root.path]
+    while pending_dirs:
+        dir_path = pending_dirs.pop()
+        sub_dirs = []
+        try:
+            with os.scandir(dir_path) as dir_entries:
+                # 'os.scandir' order depends on the file system, sorted the shadowing does not.
+                for entry in sorted(dir_entries, key=lambda x: x.name):
+                    if entry.name.startswith('.'):
+                        continue
+                    try:
+                        if entry.is_file():
+                            signature = file_signature(entry.stat()) if with_stat else None
+                            yield ScriptFile(entry.name, entry.path, signature)
+                        elif root.recursive and entry.is_dir(follow_symlinks=False):
+                            sub_dirs.append(entry.path)
+                    except OSError:
+                        # Broken links or files removed while scanning.
+                        continue
+        except OSError:
+            # Missing or unreadable directories are skipped like in '$PATH'.
+            continue
+        pending_dirs.extend(sorted(sub_dirs, reverse=True))
+
+
+def resolve_shadowing(script_files):
+    """
+    Splits the script files in search order into the scripts that win and
+    the shadowed ones as a list of (shadowed_file, winner_file) pairs.
+    """
+    found = {}
+    scripts = []
+    shadowed = []
+    for script_file in script_files:
+        winner = found.get(script_file.name)
+        if winner is not None:
+            shadowed.append((script_file, winner))
+            continue
+        found[script_file.name] = script_file
+        scripts.append(script_file)
+    return scripts, shadowed
+
+
+def find_scripts(roots, with_stat=True):
+    """
+    Walks all the search roots and returns the scripts found and
+    the shadowed ones as a list of (shadowed_file, winner_file) pairs.
+    """
+    return resolve_shadowing(script_file for root in roots for script_file in walk_root(root, with_stat))
+
+
+def relative_dir_parts(root: SearchRoot, dir_path: str):
+    """
+    Returns the directories between the search root and a directory as a tuple,
+    or None when the root does not search that directory (hidden ones included).
+    """
+    dir_path = os.path.normpath(dir_path)
+    root_path = os.path.normpath(root.path)
+    if dir_path == root_path:
+        return ()
+    prefix = root_path.rstrip(os.sep) + os.sep
+    if not root.recursive or not dir_path.startswith(prefix):
+        return None
+    parts = tuple(dir_path[len(prefix):].split(os.sep))
+    return None if any(x.startswith('.') for x in parts) else parts
+
+
+def root_relative_dir(root: SearchRoot, path: str):
+    """Returns the directories between the search root and a script, None when the root does not search it."""
+    dir_path, name = os.path.split(path)
+    return None if name.startswith('.') else relative_dir_parts(root, dir_path)
+
+
+def index_scripts(roots, signatures):
+    """
+    Returns the same scripts and shadowed pairs as 'find_scripts' from the {path: signature}
+    of an index kept up to date, without walking the directories. The walk visits the files
+    of a directory before its sub-directories, in name order.
+    """
+    dir_keys = {}
+    ordered = []
+    for path, signature in signatures.items():
+        dir_path, name = os.path.split(path)
+        if name.startswith('.'):
+            continue
+        keys = dir_keys.get(dir_path)
+        if keys is None:
+            keys = dir_keys[dir_path] = [(idx, parts) for idx, parts in
+                                         ((idx, relative_dir_parts(x, dir_path)) for idx, x in enumerate(roots))
+                                         if parts is not None]
+        script_file = ScriptFile(name, path, signature)
+        ordered.extend(((idx, parts, name), script_file) for idx, parts in keys)
+    ordered.sort(key=lambda x: x[0])
+    return resolve_shadowing(x[1] for x in ordered)
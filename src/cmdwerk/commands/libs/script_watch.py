@@ -0,0 +1,256 @@
+"""
+Change notifications for the script search path used by 'cmdw bins watch'.
+
+On Linux the directories are watched with inotify, called through ctypes so
+there is no extra dependency. Elsewhere, or when inotify cannot be used, the
+search path is polled comparing the file signatures. Both watchers report the
+paths that were created, modified, moved or deleted, or ask for a full rescan
+when the events cannot be trusted (queue overflow, a watched directory moved).
+
+The watch process holds a 'WatchLock' while it runs, the listings only trust
+the index it keeps when the lock is held.
+"""
+
+import os
+import stat
+import time
+import errno
+import fcntl
+import struct
+import select
+from .script_cache import file_signature
+from .script_path import walk_root
+
+DEFAULT_POLL_SECONDS = 2.0
+# Events arriving within this window are reported together.
+DEBOUNCE_SECONDS = 0.1
+
+IN_MODIFY = 0x00000002
+IN_ATTRIB = 0x00000004
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_DELETE_SELF = 0x00000400
+IN_MOVE_SELF = 0x00000800
+IN_Q_OVERFLOW = 0x00004000
+IN_IGNORED = 0x00008000
+IN_ISDIR = 0x40000000
+WATCH_MASK = (IN_MODIFY | IN_ATTRIB | IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO | IN_CREATE | IN_DELETE
+              | IN_DELETE_SELF | IN_MOVE_SELF)
+# struct inotify_event: wd, mask, cookie and name length, followed by the name.
+EVENT_HEADER = struct.Struct('iIII')
+READ_SIZE = 64 * 1024
+
+
+class WatchLock:
+    """
+    Lock file held by the watch process for its lifetime. The system releases the lock when the
+    process exits, even killed, so unlike its pid it cannot point to an unrelated process.
+    """
+
+    def __init__(self, lock_path):
+        self.lock_path = lock_path
+        self._lock_fh = None
+
+    def acquire(self):
+        """Takes the lock, returns False when another process holds it."""
+        if self._lock_fh is not None:
+            return True
+        os.makedirs(os.path.dirname(self.lock_path), exist_ok=True)
+        # pylint: disable=consider-using-with
+        lock_fh = open(self.lock_path, 'ab')
+        try:
+            fcntl.flock(lock_fh.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            lock_fh.close()
+            return False
+        self._lock_fh = lock_fh
+        return True
+
+    def release(self):
+        """Releases the lock taken by 'acquire'."""
+        if self._lock_fh is not None:
+            self._lock_fh.close()
+            self._lock_fh = None
+
+    def is_held(self):
+        """True when a process, this one included, holds the lock."""
+        if self._lock_fh is not None:
+            return True
+        try:
+            lock_fh = open(self.lock_path, 'rb')  # pylint: disable=consider-using-with
+        except FileNotFoundError:
+            return False
+        with lock_fh:
+            try:
+                fcntl.flock(lock_fh.fileno(), fcntl.LOCK_SH | fcntl.LOCK_NB)
+            except BlockingIOError:
+                return True
+        return False
+
+
+def is_under(parent_path, path):
+    """True when the path is the parent directory or inside it."""
+    parent_path = os.path.normpath(parent_path)
+    path = os.path.normpath(path)
+    return path == parent_path or path.startswith(parent_path.rstrip(os.sep) + os.sep)
+
+
+def script_dirs(root):
+    """Yields the directories of a search root where scripts are searched."""
+    yield root.path
+    if not root.recursive:
+        return
+    pending_dirs = [root.path]
+    while pending_dirs:
+        try:
+            with os.scandir(pending_dirs.pop()) as dir_entries:
+                sub_dirs = [x.path for x in dir_entries
+                            if not x.name.startswith('.') and x.is_dir(follow_symlinks=False)]
+        except OSError:
+            continue
+        yield from sub_dirs
+        pending_dirs.extend(sub_dirs)
+
+
+class InotifyWatcher:
+    """Watches the search path directories with Linux inotify."""
+    name = 'inotify'
+
+    def __init__(self, roots):
+        # Loaded here, ctypes.util is slow to import and only the watch mode needs it.
+        # pylint: disable=import-outside-toplevel
+        import ctypes
+        import ctypes.util
+        self._get_errno = ctypes.get_errno
+        libc = ctypes.CDLL(ctypes.util.find_library('c') or 'libc.so.6', use_errno=True)
+        # Missing on systems without inotify, raises AttributeError.
+        self._add_watch = libc.inotify_add_watch
+        self._add_watch.argtypes = [ctypes.c_int, ctypes.c_char_p, ctypes.c_uint32]
+        self.fd = libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+        if self.fd < 0:
+            raise OSError(self._get_errno(), 'inotify_init1 failed')
+        self.roots = roots
+        self.watched_dirs = {}
+        for root in roots:
+            self.watch_root_dirs(root)
+
+    def add_watch(self, dir_path):
+        """Watches a directory, missing directories are ignored."""
+        wd = self._add_watch(self.fd, os.fsencode(dir_path), WATCH_MASK)
+        if wd < 0:
+            error = self._get_errno()
+            if error in (errno.ENOENT, errno.ENOTDIR, errno.EACCES):
+                return
+            raise OSError(error, f'inotify_add_watch failed for {dir_path}')
+        self.watched_dirs[wd] = dir_path
+
+    def watch_root_dirs(self, root, start_dir=None):
+        """Watches the directories of a search root, or only those under 'start_dir'."""
+        if start_dir is None:
+            dir_paths = script_dirs(root)
+        else:
+            dir_paths = script_dirs(type(root)(start_dir, root.recursive))
+        for dir_path in dir_paths:
+            self.add_watch(dir_path)
+
+    def close(self):
+        """Stops watching."""
+        os.close(self.fd)
+
+    def read_events(self):
+        """Returns the (directory, mask, name) events ready to be read."""
+        try:
+            data = os.read(self.fd, READ_SIZE)
+        except BlockingIOError:
+            return []
+        events = []
+        offset = 0
+        while offset < len(data):
+            wd, mask, _, name_len = EVENT_HEADER.unpack_from(data, offset)
+            offset += EVENT_HEADER.size
+            name = os.fsdecode(data[offset:offset + name_len].rstrip(b'\0'))
+            offset += name_len
+            events.append((self.watched_dirs.get(wd), mask, name))
+            if mask & IN_IGNORED:
+                self.watched_dirs.pop(wd, None)
+        return events
+
+    def read_changes(self, timeout):
+        """
+        Waits up to 'timeout' seconds for changes.
+        Returns the set of changed paths and True when a full rescan is needed.
+        """
+        changed = set()
+        rescan = False
+        wait = timeout
+        while select.select([self.fd], [], [], wait)[0]:
+            for dir_path, mask, name in self.read_events():
+                if mask & IN_Q_OVERFLOW or mask & (IN_DELETE_SELF | IN_MOVE_SELF):
+                    rescan = True
+                elif dir_path is None or not name or name.startswith('.'):
+                    continue
+                elif mask & IN_ISDIR:
+                    # The files of a new directory may predate its watch.
+                    rescan = rescan or bool(mask & (IN_CREATE | IN_MOVED_TO | IN_MOVED_FROM | IN_DELETE))
+                    if mask & (IN_CREATE | IN_MOVED_TO):
+                        for root in self.roots:
+                            if root.recursive and is_under(root.path, dir_path):
+                                self.watch_root_dirs(root, os.path.join(dir_path, name))
+                else:
+                    changed.add(os.path.join(dir_path, name))
+            wait = DEBOUNCE_SECONDS
+        return changed, rescan
+
+
+class PollingWatcher:
+    """Finds the changes comparing the signatures of the script files every 'poll_seconds'."""
+    name = 'polling'
+
+    def __init__(self, roots, poll_seconds=DEFAULT_POLL_SECONDS):
+        self.roots = roots
+        self.poll_seconds = poll_seconds
+        self.signatures = self.snapshot()
+        self.next_poll = time.monotonic() + poll_seconds
+
+    def snapshot(self):
+        """Returns the signatures of all the script files, shadowed ones included."""
+        return {x.path: x.signature for root in self.roots for x in walk_root(root)}
+
+    def close(self):
+        """Nothing to release."""
+
+    def read_changes(self, timeout):
+        """Waits up to 'timeout' seconds for the next poll, returns the changed paths and False."""
+        wait = self.next_poll - time.monotonic()
+        if wait > timeout:
+            time.sleep(timeout)
+            return set(), False
+        time.sleep(max(0.0, wait))
+        self.next_poll = time.monotonic() + self.poll_seconds
+        signatures = self.snapshot()
+        changed = {x for x in signatures.keys() | self.signatures.keys()
+                   if signatures.get(x) != self.signatures.get(x)}
+        self.signatures = signatures
+        return changed, False
+
+
+def create_watcher(roots, poll_seconds=DEFAULT_POLL_SECONDS, use_inotify=True):
+    """Returns an inotify watcher when available, a polling one otherwise."""
+    if use_inotify:
+        try:
+            return InotifyWatcher(roots)
+        except (OSError, AttributeError):
+            pass
+    return PollingWatcher(roots, poll_seconds)
+
+
+def stat_signature(path):
+    """Returns the signature of a regular file, None when it is missing or not a file."""
+    try:
+        stat_result = os.stat(path)
+    except OSError:
+        return None
+    return file_signature(stat_result) if stat.S_ISREG(stat_result.st_mode) else None
@@ -0,0 +1,129 @@
+"""
+Inverted full-text index over the script help used by 'cmdw bins search'.
+
+The index is built from the records of the directory scan and stored as json
+next to the script index. Each term maps to its postings, the scripts using it
+with a term frequency weighted by field (a match in the name counts more than
+one in the long help). Queries are ranked with BM25 reading only the index,
+a query term also matches the longer terms it starts ('edit' finds 'edits')
+with a lower weight.
+"""
+
+import re
+import json
+import math
+import bisect
+from .gen_utils import atomic_write
+from .phase_trace import trace_count
+
+SEARCH_FORMAT_VERSION = 1
+SEARCH_TERM_RE = re.compile(r'[^\W_]+')
+# Weight of a term occurrence in each field of a script.
+FIELD_WEIGHTS = {'name': 3, 'group': 2, 'short_help': 2, 'long_help': 1}
+# BM25 term frequency saturation and document length normalization.
+BM25_K1 = 1.2
+BM25_B = 0.75
+# Score factor of the terms matched by prefix and the shortest query term matching by prefix.
+PREFIX_MATCH_WEIGHT = 0.5
+MIN_PREFIX_LENGTH = 3
+DEFAULT_SEARCH_LIMIT = 20
+
+
+def search_terms(text):
+    """Splits a text into lower case terms, the words of names like 'aws_list-hosts' are separate terms."""
+    return SEARCH_TERM_RE.findall(text.lower()) if text else []
+
+
+class ScriptSearchIndex:
+    """
+    Inverted index of the scripts. 'documents' holds the name, group, short help
+    and path of each script, the postings reference them by position.
+    """
+
+    def __init__(self, index_path):
+        self.index_path = index_path
+        self.documents = []
+        self.lengths = []
+        self.postings = {}
+        self._sorted_terms = None
+
+    def build(self, documents):
+        """Indexes the documents, dictionaries with the FIELD_WEIGHTS fields and the path."""
+        self.documents = []
+        self.lengths = []
+        self.postings = {}
+        self._sorted_terms = None
+        for doc_id, document in enumerate(documents):
+            frequencies = {}
+            for field, weight in FIELD_WEIGHTS.items():
+                for term in search_terms(document.get(field)):
+                    frequencies[term] = frequencies.get(term, 0) + weight
+            for term, frequency in frequencies.items():
+                self.postings.setdefault(term, []).append([doc_id, frequency])
+            self.lengths.append(sum(frequencies.values()))
+            self.documents.append({x: document.get(x) for x in ('name', 'group', 'short_help', 'path')})
+
+    def load(self):
+        """Loads the stored index, returns False if there is none."""
+        try:
+            with open(self.index_path, 'r', encoding='utf-8') as index_fh:
+                payload = json.load(index_fh)
+                trace_count(files=1, bytes_read=index_fh.tell())
+        except (OSError, ValueError):
+            return False
+        if payload.get('version') != SEARCH_FORMAT_VERSION:
+            return False
+        self.documents = payload['documents']
+        self.lengths = payload['lengths']
+        self.postings = payload['postings']
+        self._sorted_terms = None
+        return True
+
+    def save(self):
+        """Writes the index."""
+        payload = {'version': SEARCH_FORMAT_VERSION, 'documents': self.documents,
+                   'lengths': self.lengths, 'postings': self.postings}
+        try:
+            atomic_write(self.index_path, json.dumps(payload, separators=(',', ':')))
+        except OSError:
+            # Searching falls back to a scan, failing to save the index is not fatal.
+            pass
+
+    def matching_terms(self, query_term):
+        """Yields the (term, weight) pairs matched by a query term: itself and the terms it starts."""
+        if query_term in self.postings:
+            yield query_term, 1.0
+        if len(query_term) < MIN_PREFIX_LENGTH:
+            return
+        if self._sorted_terms is None:
+            self._sorted_terms = sorted(self.postings)
+        idx = bisect.bisect_right(self._sorted_terms, query_term)
+        while idx < len(self._sorted_terms) and self._sorted_terms[idx].startswith(query_term):
+            yield self._sorted_terms[idx], PREFIX_MATCH_WEIGHT
+            idx += 1
+
+    def search(self, query, limit=DEFAULT_SEARCH_LIMIT):
+        """
+        Returns up to 'limit' (score, document) pairs of the scripts matching any query term,
+        best BM25 score first and by name for equal scores.
+        """
+        num_docs = len(self.documents)
+        if not num_docs:
+            return []
+        avg_length = sum(self.lengths) / num_docs or 1
+        scores = {}
+        for query_term in set(search_terms(query)):
+            # Best match of the query term in each script, prefix matches do not add up.
+            term_scores = {}
+            for term, weight in self.matching_terms(query_term):
+                postings = self.postings[term]
+                idf = math.log(1 + (num_docs - len(postings) + 0.5) / (len(postings) + 0.5))
+                for doc_id, frequency in postings:
+                    norm = BM25_K1 * (1 - BM25_B + BM25_B * self.lengths[doc_id] / avg_length)
+                    score = weight * idf * frequency * (BM25_K1 + 1) / (frequency + norm)
+                    if score > term_scores.get(doc_id, 0.0):
+                        term_scores[doc_id] = score
+            for doc_id, score in term_scores.items():
+                scores[doc_id] = scores.get(doc_id, 0.0) + score
+        ranked = sorted(scores.items(), key=lambda x: (-x[1], self.documents[x[0]]['name']))
+        return [(score, self.documents[doc_id]) for doc_id, score in ranked[:limit]]
@@ -0,0 +1,196 @@
+"""
+Static zsh and bash completion scripts for 'cmdw' built from the script catalog.
+
+The scripts hold the 'cmdw' commands, their sub-commands and options, the
+script groups offered for '--group' and the script names (with their short
+help in zsh) offered for 'bins search'. Completing a word never runs Python.
+
+The second line of a generated file carries a digest of its contents. A file
+is only written again when the digest changes, so shells caching the loaded
+completions (zsh 'compinit') do not reload them for nothing.
+"""
+
+import re
+import shlex
+import hashlib
+import click
+from .gen_utils import atomic_write
+
+COMPLETION_FILES = {'zsh': '_cmdw', 'bash': 'cmdw.bash'}
+COMPLETION_SHELLS = list(COMPLETION_FILES)
+HEADER_TEMPLATE = "# Generated by 'cmdw bins completions --shell {shell}', catalog {digest}\n"
+HEADER_RE = re.compile(r"# Generated by 'cmdw bins completions --shell \w+', catalog (\w+)")
+# The option completed with the groups and the sub-command completed with the scripts.
+GROUP_OPTION = ('bins', '--group')
+SCRIPT_SUB_COMMAND = ('bins', 'search')
+
+
+def completion_spec(cli_group, info_name='cmdw'):
+    """
+    Returns the commands of the click group for the completion files: for each command
+    its short help, the choices of its sub-command argument, its options and the option choices.
+    """
+    ctx = click.Context(cli_group, info_name=info_name)
+    spec = {}
+    for name in cli_group.list_commands(ctx):
+        command = cli_group.get_command(ctx, name)
+        sub_commands, options, option_choices = [], ['--help'], {}
+        for param in command.params:
+            choices = list(param.type.choices) if isinstance(param.type, click.Choice) else []
+            if isinstance(param, click.Argument):
+                sub_commands.extend(choices)
+                continue
+            names = param.opts + param.secondary_opts
+            options.extend(x for x in names if x not in options)
+            for option in names if choices else []:
+                option_choices[option] = choices
+        spec[name] = {'help': command.get_short_help_str(limit=60), 'sub_commands': sub_commands,
+                      'options': options, 'option_choices': option_choices}
+    return spec
+
+
+def quote_words(words):
+    """Quotes the words for a shell array or word list."""
+    return ' '.join(shlex.quote(x) for x in words)
+
+
+def zsh_described(name, description):
+    """Returns a 'name:description' item for the zsh '_describe' function."""
+    return shlex.quote(name.replace('\\', '\\\\').replace(':', '\\:') + ':' + description)
+
+
+def if_chain(branches, default, indent):
+    """Returns the lines of an if/elif/else chain of (condition, action) branches, or of the default alone."""
+    if not branches:
+        return [indent + default]
+    lines = []
+    for idx, (condition, action) in enumerate(branches):
+        lines.append(f'{indent}{"elif" if idx else "if"} {condition}; then')
+        lines.append(f'{indent}    {action}')
+    lines.extend([f'{indent}else', f'{indent}    {default}', f'{indent}fi'])
+    return lines
+
+
+def zsh_command_case(name, spec, lines):
+    """Appends the completion of the words after a command to the zsh script lines."""
+    lines.append(f'    {name})')
+    lines.append('      case $prev in')
+    if name == GROUP_OPTION[0]:
+        lines.append(f'        {GROUP_OPTION[1]}) compadd -a _cmdw_groups; return;;')
+    for option, choices in spec['option_choices'].items():
+        lines.append(f'        {option}) compadd -- {quote_words(choices)}; return;;')
+    lines.append('      esac')
+    branches = []
+    if name == SCRIPT_SUB_COMMAND[0]:
+        branches.append((f'[[ ${{words[3]}} == {SCRIPT_SUB_COMMAND[1]} ]] && (( CURRENT > 3 ))',
+                         "_describe -t scripts 'script' _cmdw_scripts"))
+    if spec['sub_commands']:
+        branches.append(('(( CURRENT == 3 )) && [[ ${words[CURRENT]} != -* ]]',
+                         f'compadd -- {quote_words(spec["sub_commands"])}'))
+    lines.extend(if_chain(branches, f'compadd -- {quote_words(spec["options"])}', '      '))
+    lines.append('      ;;')
+
+
+def zsh_script(cli_spec, groups, scripts):
+    """Returns the body of the zsh completion function file."""
+    lines = ['_cmdw_groups=(']
+    lines.extend(f'  {shlex.quote(x)}' for x in groups)
+    lines.append(')')
+    lines.append('_cmdw_scripts=(')
+    lines.extend(f'  {zsh_described(x, y)}' for x, y in scripts)
+    lines.append(')')
+    lines.append('')
+    lines.append('_cmdw() {')
+    lines.append('  local -a commands')
+    lines.append('  commands=(')
+    lines.extend(f'    {zsh_described(x, y["help"])}' for x, y in cli_spec.items())
+    lines.append('  )')
+    lines.append('  if (( CURRENT == 2 )); then')
+    lines.append("    _describe -t commands 'cmdw command' commands")
+    lines.append('    return')
+    lines.append('  fi')
+    lines.append('  local prev=${words[CURRENT-1]}')
+    lines.append('  case ${words[2]} in')
+    for name, spec in cli_spec.items():
+        zsh_command_case(name, spec, lines)
+    lines.append('  esac')
+    lines.append('}')
+    lines.append('')
+    lines.append('_cmdw "$@"')
+    return '\n'.join(lines) + '\n'
+
+
+def bash_command_case(name, spec, lines):
+    """Appends the completion of the words after a command to the bash script lines."""
+    lines.append(f'        {name})')
+    lines.append('            case $prev in')
+    if name == GROUP_OPTION[0]:
+        lines.append(f'                {GROUP_OPTION[1]}) _cmdw_add_words "$cur" "${{_cmdw_groups[@]}}"; return;;')
+    for option, choices in spec['option_choices'].items():
+        lines.append(f'                {option}) _cmdw_add_words "$cur" {quote_words(choices)}; return;;')
+    lines.append('            esac')
+    branches = []
+    if name == SCRIPT_SUB_COMMAND[0]:
+        branches.append((f'[[ ${{COMP_WORDS[2]}} == {SCRIPT_SUB_COMMAND[1]} ]] && (( COMP_CWORD > 2 ))',
+                         '_cmdw_add_words "$cur" "${_cmdw_scripts[@]}"'))
+    if spec['sub_commands']:
+        branches.append(('(( COMP_CWORD == 2 )) && [[ $cur != -* ]]',
+                         f'_cmdw_add_words "$cur" {quote_words(spec["sub_commands"])}'))
+    lines.extend(if_chain(branches, f'_cmdw_add_words "$cur" {quote_words(spec["options"])}', '            '))
+    lines.append('            ;;')
+
+
+def bash_script(cli_spec, groups, scripts):
+    """Returns the bash completion script, bash has no descriptions so only the script names are offered."""
+    lines = [f'_cmdw_groups=({quote_words(groups)})',
+             f'_cmdw_scripts=({quote_words(x for x, _ in scripts)})',
+             '',
+             '_cmdw_add_words() {',
+             '    local cur=$1 word',
+             '    shift',
+             '    for word in "$@"; do',
+             '        [[ $word == "$cur"* ]] && COMPREPLY+=("$(printf %q "$word")")',
+             '    done',
+             '}',
+             '',
+             '_cmdw() {',
+             '    local cur=${COMP_WORDS[COMP_CWORD]} prev=${COMP_WORDS[COMP_CWORD-1]}',
+             '    COMPREPLY=()',
+             '    if (( COMP_CWORD == 1 )); then',
+             f'        _cmdw_add_words "$cur" {quote_words(cli_spec)}',
+             '        return',
+             '    fi',
+             '    case ${COMP_WORDS[1]} in']
+    for name, spec in cli_spec.items():
+        bash_command_case(name, spec, lines)
+    lines.extend(['    esac', '}', '', 'complete -F _cmdw cmdw'])
+    return '\n'.join(lines) + '\n'
+
+
+def completion_script(shell, cli_spec, groups, scripts):
+    """
+    Returns the completion script for the shell.
+    'cli_spec' maps each command to its 'help', 'sub_commands', 'options' and 'option_choices',
+    'groups' are the group names and 'scripts' the (name, short_help) pairs.
+    """
+    body = (zsh_script if shell == 'zsh' else bash_script)(cli_spec, sorted(groups), sorted(scripts))
+    header = HEADER_TEMPLATE.format(shell=shell, digest=hashlib.sha1(body.encode('utf-8')).hexdigest()[:16])
+    return ('#compdef cmdw\n' if shell == 'zsh' else '') + header + body
+
+
+def script_digest(content):
+    """Returns the digest in the header of a generated script, None if there is none."""
+    match = HEADER_RE.search(content[:512])
+    return match.group(1) if match else None
+
+
+def write_completion_file(file_path, content):
+    """Writes the completion script unless the file holds the same one. Returns True if it was written."""
+    try:
+        with open(file_path, 'r', encoding='utf-8') as current_fh:
+            if script_digest(current_fh.read(512)) == script_digest(content):
+                return False
+    except OSError:
+        pass
+    atomic_write(file_path, content)
+    return True
@@ -0,0 +1,59 @@
+"""
+Shell word tokenizer built on a compiled regular expression.
+
+It produces the same tokens as 'shlex.split' (posix mode, no comments) on well
+formed input. Instead of raising 'ValueError' on unterminated quotes or a
+trailing escape it returns the partial tokens, so a line being typed or a
+truncated history entry still produces tokens.
+"""
+
+import re
+
+# Same whitespace characters used by 'shlex'.
+WHITESPACE = ' \t\r\n'
+
+_WORD_PARTS_RE = re.compile(r"""
+      (?P<space>[ \t\r\n]+)
+    | (?P<plain>[^ \t\r\n'"\\]+)
+    | '(?P<single>[^']*)'
+    | "(?P<double>(?:[^"\\]|\\.)*)"
+    | \\(?P<escaped>.)
+    | '(?P<open_single>[^']*)\Z
+    | "(?P<open_double>(?:[^"\\]|\\.)*)\\?\Z
+    | \\\Z
+""", re.VERBOSE | re.DOTALL)
+
+# Inside double quotes only the quote and the backslash itself can be escaped.
+_DOUBLE_QUOTE_ESCAPE_RE = re.compile(r'\\(["\\])')
+_SPECIAL_CHARS_RE = re.compile(r"""['"\\]""")
+_WHITESPACE_RE = re.compile(r'[ \t\r\n]+')
+
+
+def split_words(text: str) -> list:
+    """Splits the text in shell words, unterminated quotes produce partial words."""
+    if not _SPECIAL_CHARS_RE.search(text):
+        # Fast path, no quoting or escaping.
+        stripped = text.strip(WHITESPACE)
+        return _WHITESPACE_RE.split(stripped) if stripped else []
+    words = []
+    current = []
+    in_word = False
+    for match in _WORD_PARTS_RE.finditer(text):
+        kind = match.lastgroup
+        if kind is None:
+            # A lone trailing escape is dropped.
+            continue
+        if kind == 'space':
+            if in_word:
+                words.append(''.join(current))
+                current = []
+                in_word = False
+            continue
+        in_word = True
+        if kind in ('double', 'open_double'):
+            current.append(_DOUBLE_QUOTE_ESCAPE_RE.sub(r'\1', match.group(kind)))
+        else:
+            current.append(match.group(kind))
+    if in_word:
+        words.append(''.join(current))
+    return words
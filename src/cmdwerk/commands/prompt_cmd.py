@@ -3,25 +3,40 @@ This module contains implementations for guided prompt from your history.
 """
 
 import os
-import shlex
+import time
 import itertools
-import unicodedata
-import string
-from collections import defaultdict
-from typing import List, Tuple
-import pickle
-from prompt_toolkit import PromptSession
-from prompt_toolkit.auto_suggest import AutoSuggestFromHistory
-from prompt_toolkit.styles import Style
-from prompt_toolkit.completion import Completer, Completion
-import pyperclip as paper
+from contextlib import ExitStack
 from .. import PROGRAM_CFG_DIR
 from ..commands.libs.gen_utils import safe_make_dir
+from ..commands.libs.phase_trace import trace_phase, trace_count
+from ..commands.libs.history_index import MappedHistoryIndex, HistoryIndexError
+from ..commands.libs.history_shards import ShardedHistoryIndex, write_history_shards, load_history_shards
+from ..commands.libs.history_shards import MANIFEST_FILE
+from ..commands.libs.history_trie import TokenTrie, KEY_SEPARATOR
+from ..commands.libs.history_trie import DEFAULT_MAX_CANDIDATES, DEFAULT_MAX_FIRST_TOKENS
+from ..commands.libs.history_state import HistorySyncState
+from ..commands.libs.history_daemon import HistoryDaemon, HistoryDaemonClient, HistoryDaemonError
+from ..commands.libs.history_daemon import DAEMON_SOCKET_FILE, DEFAULT_POLL_SECONDS, SYNC_TIMEOUT_SECONDS
+from ..commands.libs.history_data import build_history_data_streaming, expand_history_paths
+from ..commands.libs.history_data import history_reader, dedup_history_records, chunk_records
+# The history readers and builder are also exported from this module (explicit re-export form).
+# pylint: disable=useless-import-alias
+from ..commands.libs.history_data import HistoryRecord as HistoryRecord
+from ..commands.libs.history_data import HistoryReader as HistoryReader
+from ..commands.libs.history_data import read_history_lines as read_history_lines
+from ..commands.libs.history_data import load_history_files_data as load_history_files_data
+from ..commands.libs.history_data import build_history_data as build_history_data
+# pylint: enable=useless-import-alias
 
 
+# Legacy pickle store and single file index, only read as a fallback when there are no shards.
 HISTORY_DATA_FILE = 'history.bin'
-KEY_SEPARATOR = '|_|'
-DEBUG = False
+HISTORY_INDEX_FILE = 'history.idx'
+# Completion index split in a manifest and one shard per first token.
+HISTORY_SHARDS_DIR = 'history.shards'
+HISTORY_STATE_FILE = 'history.state.json'
+# Debug mode dumps the prompt data and prints the completion latency histogram.
+DEBUG = os.environ.get('CMDW_DEBUG') == '1'
 
 
 def build_cmd_key(parts):
@@ -29,170 +44,264 @@ def build_cmd_key(parts):
     return KEY_SEPARATOR.join(parts)
 
 
-def load_history_files_data(file_name: str) -> Tuple[List[str], int]:
-    """
-    Reads the history file, extracts the command line and returns them as a string list.
-    :return: List of commands in history files.
-    """
-    def extract_command(a_line: str) -> str:
-        parts = a_line.split(';')
-        return ';'.join(parts[1:])
-
-    lines = []
-    loading_errors = 0
-    with open(file_name, 'rb') as f:
-        it = iter(f)
-        for line in it:
-            try:
-                full_line = line.decode()
-                while full_line.strip()[-1] == '\\':
-                    next_chunk = next(it).decode(errors="ignore")
-                    full_line += next_chunk
-                lines.append(extract_command(full_line.strip()))
-            except UnicodeDecodeError:
-                # Error parsing one line skipping
-                loading_errors += 1
-    return lines, loading_errors
-
-
-def build_history_data(cmd_list):
-    """
-    Builds dictionary with candidate completion at each stage from command list.
-    """
+# The interactive prompt lives in 'prompt_ui' so the sync does not import prompt_toolkit.
+LAZY_UI_NAMES = ('bottom_toolbar', 'CustomHistoryCompleter', 'prompt_history_from_data',
+                 'prompt_history_from_engine', 'prompt_history')
 
-    def remove_control_chars(a_string: str) -> str:
 
-        # return filter(string.printable.__contains__, a_string)
-        return "".join(ch for ch in a_string if unicodedata.category(ch)[0] != "C")
-
-    results = defaultdict(set)
-    for cmd in cmd_list:
-        try:
-            raw_parts = shlex.split(cmd)
-        except ValueError:
-            raw_parts = None
-        if not raw_parts:
-            continue
-        # Ignore commands after a pipe
-        parts = [remove_control_chars(x) for x in (itertools.takewhile(lambda x: x != '|', raw_parts))]
-        parts = [x for x in parts if x]
-        done_keys = [parts[0]]
-        for idx1 in range(1, len(parts)):
-            new_key = build_cmd_key(done_keys)
-            results[new_key].add(parts[idx1])
-            done_keys.append(parts[idx1])
-    return results
-
-
-def bottom_toolbar():
-    """Python prompt toolkit bottom toolbar definition."""
-    return [("class:bottom-toolbar", "Type 'q' to exit")]
-
-
-# pylint: disable=too-few-public-methods
-class CustomHistoryCompleter(Completer):
-    """Custom completion class that completes from history data"""
-    def __init__(self, completion_dict):
-        self.completion_dict = completion_dict
-        self.first_completion_dict = self._build_first_completion_dict()
-        super().__init__()
-
-    def _build_first_completion_dict(self):
-        """Build first completion using substrings ."""
-        first_cmds = {x.split(KEY_SEPARATOR)[0] for x in self.completion_dict}
-        result = defaultdict(set)
-        for cmd in first_cmds:
-            for idx in range(len(cmd)):
-                token = cmd[:idx+1]
-                if token not in first_cmds:
-                    result[token].add(cmd)
-        return result
-
-    def get_completions(self, document, _):
-        """Yield the possible completions for the current text."""
-        word = document.get_word_before_cursor()
-        text_so_far = document.text
-        parts = shlex.split(text_so_far)
-        curr_key = build_cmd_key(parts)
-        # If there is only one token string and the current token does not have
-        # candidates then treat as simple word completion case.
-        if len(parts) == 1 and curr_key not in self.completion_dict:
-            # Single token command case.
-            if curr_key in self.first_completion_dict:
-                candidates = self.first_completion_dict[curr_key]
-                for candidate in candidates:
-                    yield Completion(candidate, start_position=-len(word))
-        else:
-            # Multiple token commands case.
-            if curr_key in self.completion_dict:
-                candidates = self.completion_dict[curr_key]
-                for candidate in candidates:
-                    yield Completion(candidate, start_position=-len(word))
-
-
-def prompt_history_from_data(history_data):
-    """
-    Create the completion prompt interaction based on the history data.
-    """
-    history_completer = CustomHistoryCompleter(history_data)
-    session = PromptSession(
-        auto_suggest=AutoSuggestFromHistory(),
-        completer=history_completer,
-        bottom_toolbar=bottom_toolbar,
-        style=Style.from_dict({"bottom-toolbar": "#333333 bg:#3333AA"})
-    )
-    user_input = session.prompt(">")
-    # Moves command to paperclip so users can do a Ctrl-V to paste into shell terminal.
-    if not user_input:
-        return
-    paper.copy(user_input)
-    print('\n(Ctrl-V) to paste the command in the shell')
-
-
-def prompt_history(cmd_list: List[str]):
-    """
-    Create the completion prompt interaction from a list of commands.
-    """
-    history_data = build_history_data(cmd_list)
-    prompt_history_from_data(history_data)
+def __getattr__(name):
+    """Resolves the interactive prompt names on first access."""
+    if name in LAZY_UI_NAMES:
+        # pylint: disable=import-outside-toplevel
+        from . import prompt_ui
+        return getattr(prompt_ui, name)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
 
 class PromptCommand:
     """Command line prompt command class."""
 
     @classmethod
-    def sync_with_history(cls, history: str):
+    # pylint: disable=too-many-arguments, too-many-locals
+    def update_history_data(cls, history_paths, history_data=None, full: bool = False,
+                            max_candidates: int = DEFAULT_MAX_CANDIDATES, workers: int = 1,
+                            history_format: str = 'auto'):
         """
-        Reads the history file, creates dictionary with the command completion candidates and
-        stores them into a history_data pickle file.
+        Merges the history lines appended since the last sync into the history data and
+        stores the sharded history index and the sync state.
+
+        'history_paths' are the history files, all in 'history_format' (detected per file
+        with 'auto'). Files not synced before are read from the start.
+        'history_data' is a 'TokenTrie' with the contents of the stored index, like the one
+        kept in memory by the daemon. When not given an incremental sync loads from the index
+        the first tokens and the shards of the first tokens with new lines only.
+        Everything is rebuilt when 'full' is set, a history file was truncated or rotated
+        or a file synced before is not in the paths any more.
+        Repeated commands are counted by a hash table so each one is tokenized once.
+        Each node keeps its 'max_candidates' best ranked candidates, the others are evicted.
+        The commands are tokenized in chunks by 'workers' processes.
+        An incremental sync only rewrites the shards of the first tokens with new lines.
+        Returns the updated trie, None when it was partially loaded from the index or is
+        up to date and not given, and a dictionary with the sync statistics.
         """
-        history_file_path = os.path.expanduser(history)
         safe_make_dir(PROGRAM_CFG_DIR)
-        output_file = os.path.join(PROGRAM_CFG_DIR, HISTORY_DATA_FILE)
-        history_lines, loading_errors = load_history_files_data(history_file_path)
-        history_data = build_history_data(history_lines)
-        with open(output_file, 'wb') as history_fh:
-            pickle.dump(history_data, history_fh)
-        print(f'Saved history data to {output_file}')
-        print(f'History lines : {len(history_lines)}')
-        print(f'Loading errors: {loading_errors}')
+        output_file = os.path.join(PROGRAM_CFG_DIR, HISTORY_SHARDS_DIR)
+        sync_state = HistorySyncState(os.path.join(PROGRAM_CFG_DIR, HISTORY_STATE_FILE))
+        resumable = (not full and sync_state.load() and os.path.exists(os.path.join(output_file, MANIFEST_FILE))
+                     and sync_state.same_files(history_paths))
+        with ExitStack() as stack:
+            handles = [stack.enter_context(open(x, 'rb')) for x in history_paths]
+            offsets = [sync_state.resume_offset(x, y) if resumable else None
+                       for x, y in zip(history_paths, handles)]
+            # A known file that must be read again invalidates the whole index.
+            incremental = resumable and all(
+                offset is not None or path not in sync_state.files for path, offset in zip(history_paths, offsets))
+            # The new files are read from the start.
+            offsets = [x or 0 for x in offsets]
+            if incremental and all(x == os.fstat(y.fileno()).st_size for x, y in zip(offsets, handles)):
+                return history_data, {'mode': 'up-to-date', 'lines': 0, 'output_file': output_file}
+            base_index = None
+            if incremental and history_data is None:
+                try:
+                    base_index = stack.enter_context(ShardedHistoryIndex(output_file))
+                except (FileNotFoundError, HistoryIndexError):
+                    incremental = False
+            if not incremental:
+                history_data = None
+                offsets = [0] * len(handles)
+                sync_state.files = {}
+            readers = [history_reader(history_format, x, y, z)
+                       for x, y, z in zip(history_paths, handles, offsets)]
+            # The history is read lazily, reading and deduplicating are timed with the tokenizing.
+            with trace_phase('ppt.read_tokenize', workers=workers):
+                records = dedup_history_records(itertools.chain.from_iterable(readers))
+                new_data = build_history_data_streaming(chunk_records(records), None, workers)
+                trace_count(files=len(readers), bytes_read=sum(x.end_offset - y for x, y in zip(readers, offsets)))
+            # The shards to write: the first tokens with new lines and those losing nodes to the pruning.
+            touched = set(new_data.root_node.children)
+            if base_index is not None:
+                with trace_phase('ppt.base_index_load', shards=len(touched)):
+                    history_data = load_history_shards(base_index, touched)
+            if history_data is None:
+                history_data = new_data
+            else:
+                history_data.merge(new_data)
+            with trace_phase('ppt.prune'):
+                evicted = history_data.prune(max_candidates, max(max_candidates, DEFAULT_MAX_FIRST_TOKENS),
+                                             pruned_first_tokens=touched)
+            with trace_phase('ppt.write_index'):
+                shards = write_history_shards(output_file, history_data, touched if incremental else None)
+                for path, handle, reader in zip(history_paths, handles, readers):
+                    sync_state.update(path, handle, reader.end_offset)
+                sync_state.save()
+        stats = {'mode': 'incremental' if incremental else 'full',
+                 'files': len(history_paths), 'lines': sum(x.num_lines for x in readers),
+                 'distinct': len(records), 'errors': sum(x.loading_errors for x in readers),
+                 'evicted': evicted, 'shards': shards,
+                 'total_shards': len(history_data.root_node.children), 'output_file': output_file}
+        # A trie with the touched shards alone is not the whole history.
+        return (None if base_index is not None else history_data), stats
 
     @classmethod
-    def run(cls):
+    # pylint: disable=too-many-arguments
+    def sync_with_history(cls, history, full: bool = False, quiet: bool = False,
+                          max_candidates: int = DEFAULT_MAX_CANDIDATES, workers: int = 1,
+                          history_format: str = 'auto'):
         """
-        Reads history candidates from the history_data pickle file and
-        creates the completion prompt interaction.
+        Reads the history files, creates dictionary with the command completion candidates and
+        stores them into the binary history index, see 'update_history_data'.
+        'history' is a path or glob pattern, or a list of them.
+        When a daemon is running it applies the update to its warm index, it is the only writer
+        of the index while it runs: a sync it refuses or that fails is reported, not done here.
         """
+        start_time = time.perf_counter()
+        history_paths = expand_history_paths(history)
+        stats = None
+        with trace_phase('ppt.daemon_sync'):
+            client = HistoryDaemonClient.connect(os.path.join(PROGRAM_CFG_DIR, DAEMON_SOCKET_FILE))
+            if client:
+                try:
+                    stats = client.request('sync', timeout=SYNC_TIMEOUT_SECONDS, history=history_paths, full=full,
+                                           workers=workers, max_candidates=max_candidates,
+                                           history_format=history_format)
+                except HistoryDaemonError as exc:
+                    print(f'ERROR: {exc}, stop it with "cmdw ppt stop" to sync here.')
+                    return
+                finally:
+                    client.close()
+        if stats is None:
+            with trace_phase('ppt.sync'):
+                _, stats = cls.update_history_data(history_paths, full=full, max_candidates=max_candidates,
+                                                   workers=workers, history_format=history_format)
+        if quiet:
+            return
+        if stats['mode'] == 'up-to-date':
+            print(f'History data is up to date: {stats["output_file"]}')
+            return
+        elapsed = time.perf_counter() - start_time
+        print(f'Saved history data to {stats["output_file"]}')
+        print(f'Sync mode     : {stats["mode"]}{" (daemon)" if client else ""}')
+        print(f'History files : {stats["files"]}')
+        print(f'History lines : {stats["lines"]} ({stats["distinct"]} distinct)')
+        print(f'Loading errors: {stats["errors"]}')
+        print(f'Evicted nodes : {stats["evicted"]}')
+        if 'shards' in stats:
+            print(f'Shards written: {stats["shards"]} of {stats["total_shards"]}')
+        print(f'Throughput    : {stats["lines"] / max(elapsed, 1e-9):,.0f} lines/s ({elapsed:.2f}s)')
+
+    @classmethod
+    # pylint: disable=too-many-arguments
+    def serve(cls, history, max_candidates: int = DEFAULT_MAX_CANDIDATES, workers: int = 1,
+              history_format: str = 'auto', poll_seconds: float = DEFAULT_POLL_SECONDS):
+        """
+        Runs the daemon that keeps the completion index in memory and serves it on a
+        Unix socket, the history files are polled and merged into the index as they grow.
+        Glob patterns are expanded when the daemon starts.
+        """
+        history_paths = expand_history_paths(history)
+        history_data, _ = cls.update_history_data(history_paths, max_candidates=max_candidates,
+                                                  workers=workers, history_format=history_format)
+        if history_data is None:
+            history_source = cls.load_history_source()
+            history_data = TokenTrie.from_source(history_source)
+            if isinstance(history_source, (ShardedHistoryIndex, MappedHistoryIndex)):
+                history_source.close()
+
+        def sync_func(data, full, sync_workers):
+            return cls.update_history_data(history_paths, data, full, max_candidates, sync_workers or workers,
+                                           history_format)
+
+        socket_path = os.path.join(PROGRAM_CFG_DIR, DAEMON_SOCKET_FILE)
+        daemon = HistoryDaemon(socket_path, history_data, history_paths, sync_func, poll_seconds,
+                               {'max_candidates': max_candidates, 'history_format': history_format})
+        print(f'Serving completions for {", ".join(history_paths)} on {socket_path}')
+        try:
+            daemon.serve_forever()
+        except HistoryDaemonError as exc:
+            print(f'ERROR: {exc}')
+        except KeyboardInterrupt:
+            pass
+
+    @classmethod
+    def stop_daemon(cls):
+        """Asks the daemon to exit."""
+        client = HistoryDaemonClient.connect(os.path.join(PROGRAM_CFG_DIR, DAEMON_SOCKET_FILE))
+        if client is None:
+            print('No ppt daemon is running.')
+            return
+        try:
+            client.request('stop')
+        finally:
+            client.close()
+        print('Stopped the ppt daemon.')
+
+    @classmethod
+    def load_history_source(cls):
+        """
+        Maps the manifest of the sharded history index, the shards are mapped as the completions
+        reach them. Falls back to the single file index and the legacy history_data pickle file
+        of earlier versions when the shards were not created yet. Returns None if none exists.
+        """
+        try:
+            return ShardedHistoryIndex(os.path.join(PROGRAM_CFG_DIR, HISTORY_SHARDS_DIR))
+        except (FileNotFoundError, HistoryIndexError):
+            pass
+        history_index_file = os.path.join(PROGRAM_CFG_DIR, HISTORY_INDEX_FILE)
+        try:
+            # Mapped, the pages are read as the completions walk the index.
+            history_index = MappedHistoryIndex(history_index_file)
+            trace_count(files=1)
+            return history_index
+        except (FileNotFoundError, HistoryIndexError):
+            pass
         history_data_file = os.path.join(PROGRAM_CFG_DIR, HISTORY_DATA_FILE)
+        # pylint: disable=import-outside-toplevel
+        import pickle
         try:
             with open(history_data_file, 'rb') as history_fh:
-                history_data = pickle.load(history_fh)
-        except FileNotFoundError as _:
+                with trace_phase('ppt.unpickle'):
+                    completion_dict = pickle.load(history_fh)
+                    trace_count(files=1, bytes_read=history_fh.tell())
+                return TokenTrie.from_completion_dict(completion_dict)
+        except FileNotFoundError:
+            return None
+
+    @classmethod
+    def run(cls, max_candidates: int = DEFAULT_MAX_CANDIDATES, fuzzy: bool = False):
+        """
+        Reads history candidates from the history index and
+        creates the completion prompt interaction.
+        """
+        with trace_phase('ppt.daemon_connect'):
+            client = HistoryDaemonClient.connect(os.path.join(PROGRAM_CFG_DIR, DAEMON_SOCKET_FILE))
+        if client:
+            client.fuzzy = fuzzy
+            # The daemon has the index loaded, no need to map it here.
+            # pylint: disable=import-outside-toplevel
+            with trace_phase('import.prompt_ui'):
+                from .prompt_ui import prompt_history_from_engine
+            try:
+                with trace_phase('ppt.prompt', source='daemon'):
+                    prompt_history_from_engine(client, max_candidates, DEBUG)
+            finally:
+                client.close()
+            return
+        with trace_phase('ppt.index_load'):
+            history_source = cls.load_history_source()
+        if history_source is None:
             print('ERROR: History file not found.')
             print(' - To create it, use the command: cmdw ppt sync ')
             return
         if DEBUG:
-            for key in sorted(history_data.keys()):
-                value = history_data[key]
-                print(key, value)
-        prompt_history_from_data(history_data)
+            pending = [(history_source.root(), [])]
+            while pending:
+                node, parts = pending.pop()
+                children = sorted(history_source.iter_children(node), reverse=True)
+                if parts and children:
+                    print(build_cmd_key(parts), {x for x, _ in children})
+                pending.extend((child, parts + [token]) for token, child in children)
+        # pylint: disable=import-outside-toplevel
+        with trace_phase('import.prompt_ui'):
+            from .prompt_ui import prompt_history_from_data
+        with trace_phase('ppt.prompt', source='index'):
+            prompt_history_from_data(history_source, max_candidates, fuzzy, DEBUG)
@@ -0,0 +1,111 @@
+"""
+This module contains the interactive prompt that completes commands from your history.
+"""
+
+import time
+import itertools
+from typing import List
+from prompt_toolkit import PromptSession
+from prompt_toolkit.auto_suggest import AutoSuggestFromHistory
+from prompt_toolkit.styles import Style
+from prompt_toolkit.completion import Completer, Completion, ThreadedCompleter
+import pyperclip as paper
+from ..commands.libs.history_trie import DEFAULT_MAX_CANDIDATES
+from ..commands.libs.history_data import build_history_data
+from ..commands.libs.history_completion import HistoryCompletionEngine
+from ..commands.libs.latency_histogram import LatencyHistogram
+
+# Time allowed to produce the completions of a keystroke.
+DEFAULT_TIME_BUDGET = 0.05
+
+
+def bottom_toolbar():
+    """Python prompt toolkit bottom toolbar definition."""
+    return [("class:bottom-toolbar", "Type 'q' to exit")]
+
+
+# pylint: disable=too-few-public-methods
+class CustomHistoryCompleter(Completer):
+    """
+    Custom completion class that completes from history data.
+    The lookups are done by a 'HistoryCompletionEngine' over a 'TokenTrie' or a mapped index,
+    which maps the shard of a first word once it is typed, or by the 'ppt' daemon client,
+    both provide 'complete(text, limit, should_stop=...)'.
+    """
+    def __init__(self, completion_engine, max_candidates=DEFAULT_MAX_CANDIDATES,
+                 time_budget=DEFAULT_TIME_BUDGET):
+        self.completion_engine = completion_engine
+        self.max_candidates = max_candidates
+        self.time_budget = time_budget
+        self.latency = LatencyHistogram('completion latency')
+        # Each query takes a number, a query stops when a newer keystroke started another one.
+        self._queries = itertools.count(1)
+        self._current_query = 0
+        super().__init__()
+
+    def get_completions(self, document, _):
+        """
+        Yield the possible completions for the current text.
+        Runs in a background thread with 'ThreadedCompleter'. The ranking ends early with the
+        best candidates found so far once the time budget is spent or a newer query started,
+        a query superseded by a newer one stops yielding.
+        """
+        query = self._current_query = next(self._queries)
+        start_time = time.perf_counter()
+        deadline = start_time + self.time_budget
+        word = document.get_word_before_cursor()
+
+        def should_stop():
+            return query != self._current_query or time.perf_counter() > deadline
+
+        try:
+            candidates = self.completion_engine.complete(document.text, self.max_candidates,
+                                                         should_stop=should_stop)
+            for candidate in candidates:
+                if query != self._current_query:
+                    return
+                yield Completion(candidate, start_position=-len(word))
+        finally:
+            self.latency.record(time.perf_counter() - start_time)
+
+
+def prompt_history_from_data(history_data, max_candidates=DEFAULT_MAX_CANDIDATES, fuzzy=False,
+                             debug=False):
+    """
+    Create the completion prompt interaction based on the history data.
+    'fuzzy' completes the first word by subsequence when no command starts with it.
+    """
+    prompt_history_from_engine(HistoryCompletionEngine(history_data, fuzzy), max_candidates, debug)
+
+
+def prompt_history_from_engine(completion_engine, max_candidates=DEFAULT_MAX_CANDIDATES, debug=False):
+    """
+    Create the completion prompt interaction using a completion engine.
+    The completions are computed off the UI thread, 'debug' prints their latency histogram.
+    """
+    history_completer = CustomHistoryCompleter(completion_engine, max_candidates)
+    session = PromptSession(
+        auto_suggest=AutoSuggestFromHistory(),
+        completer=ThreadedCompleter(history_completer),
+        complete_while_typing=True,
+        bottom_toolbar=bottom_toolbar,
+        style=Style.from_dict({"bottom-toolbar": "#333333 bg:#3333AA"})
+    )
+    try:
+        user_input = session.prompt(">")
+    finally:
+        if debug:
+            print('\n'.join(history_completer.latency.format()))
+    # Moves command to paperclip so users can do a Ctrl-V to paste into shell terminal.
+    if not user_input:
+        return
+    paper.copy(user_input)
+    print('\n(Ctrl-V) to paste the command in the shell')
+
+
+def prompt_history(cmd_list: List[str]):
+    """
+    Create the completion prompt interaction from a list of commands.
+    """
+    history_data = build_history_data(cmd_list)
+    prompt_history_from_data(history_data)
@@ -2,9 +2,25 @@
 This module contains implementations for listing available python versions in PyEnv.
 """
 
+import os
+import sys
 import subprocess
-from .libs.gen_utils import YELLOW
+from .. import PROGRAM_CFG_DIR
+from .libs.gen_utils import YELLOW, BLUE, GREEN, RED
 from .libs.gen_utils import write_screen_cols as write_screen
+from .libs.output_format import RecordWriter, TEXT_FORMAT
+from .libs.phase_trace import trace_phase, trace_count
+from .libs.python_versions import parse_version_list, newest_by_series
+from .libs.pyenv_cache import PyEnvVersionCache, pyenv_cache_key, pyenv_root, DEFAULT_CACHE_TTL
+
+# Fields of the machine readable version list, in tsv column order.
+VERSION_COLUMNS = ['series', 'version']
+INSTALLED_COLUMNS = ['series', 'version', 'newest', 'status']
+# Cache of the versions listed by 'pyenv install -l'.
+PYENV_CACHE_FILE = 'pyenv_versions.json'
+# Code run by the background refresh process.
+REFRESH_CODE = ('from cmdwerk.commands.pyenv_cmd import PyEnvHelperCommands; '
+                'PyEnvHelperCommands.refresh_cache(release_lock=True)')
 
 
 class PyEnvHelperCommands:
@@ -13,47 +29,178 @@ class PyEnvHelperCommands:
 
     @classmethod
     def get_list_python_versions(cls):
-        """Collects the official python versions available."""
+        """Collects the official python versions available, newest first."""
         cmd = ["pyenv", "install", "-l"]
-        res = subprocess.run(cmd, stdout=subprocess.PIPE, text=True, check=False)
+        try:
+            with trace_phase('pyenv.install_list'):
+                res = subprocess.run(cmd, stdout=subprocess.PIPE, text=True, check=False)
+                trace_count(bytes_read=len(res.stdout))
+        except OSError:
+            print('Failed to run pyenv')
+            return None
         payload = res.stdout
         if res.returncode != 0:
             print('Failed to get pyenv versions')
             return None
-        temp = []
-        for line in payload.split('\n'):
-            line = line.strip()
-            if 'Available versions:' in line:
-                continue
-            temp.append(line)
-        result = []
-        min_python_minor_version = 7
-        for line in reversed(temp):
-            if not line.startswith('3.'):
-                continue
-            sub_version_str = line.split('.')[1]
-            sub_version = int(sub_version_str) if sub_version_str.isdigit() else 0
-            if min_python_minor_version <= sub_version and '-dev' not in line:
-                result.append(line)
-        return result
-
-    @classmethod
-    def list_python_versions(cls):
+        return [x.name for x in parse_version_list(payload.split('\n'))]
+
+    @classmethod
+    def version_cache(cls, ttl=DEFAULT_CACHE_TTL):
+        """Returns the cache of available versions in the configuration directory."""
+        return PyEnvVersionCache(os.path.join(PROGRAM_CFG_DIR, PYENV_CACHE_FILE), ttl)
+
+    @classmethod
+    def refresh_cache(cls, cache=None, key=None, release_lock=False):
+        """
+        Runs 'pyenv install -l' and stores the result, returns the versions or None on failure.
+        'release_lock' is set by the background refresh that holds the refresh lock.
+        """
+        cache = cls.version_cache() if cache is None else cache
+        key = pyenv_cache_key() if key is None else key
+        try:
+            version_list = cls.get_list_python_versions()
+            if version_list is not None:
+                cache.save(key, version_list)
+        finally:
+            if release_lock:
+                cache.release_refresh_lock()
+        return version_list
+
+    @classmethod
+    def start_background_refresh(cls, cache):
+        """Refreshes the cache in a detached process, unless a refresh is already running."""
+        if not cache.acquire_refresh_lock():
+            return False
+        package_parent = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+        env = dict(os.environ)
+        env['PYTHONPATH'] = os.pathsep.join(x for x in (package_parent, env.get('PYTHONPATH')) if x)
+        # pylint: disable=consider-using-with
+        try:
+            subprocess.Popen([sys.executable, '-c', REFRESH_CODE], env=env,
+                             stdin=subprocess.DEVNULL, stdout=subprocess.DEVNULL,
+                             stderr=subprocess.DEVNULL, start_new_session=True)
+        except OSError:
+            cache.release_refresh_lock()
+            return False
+        return True
+
+    @classmethod
+    def load_python_versions(cls, refresh=False, stale_ok=True, ttl=DEFAULT_CACHE_TTL):
+        """
+        Returns the available versions and how they were obtained: 'fresh', 'cached' or 'stale'.
+        A stale list is returned right away when 'stale_ok' is set and refreshed in the background.
+        """
+        cache = cls.version_cache(ttl)
+        with trace_phase('pyenv.cache_load'):
+            key = pyenv_cache_key()
+            loaded = not refresh and cache.load()
+        if loaded and cache.matches(key):
+            if cache.is_fresh():
+                return cache.versions, 'cached'
+            if stale_ok:
+                cls.start_background_refresh(cache)
+                return cache.versions, 'stale'
+        return cls.refresh_cache(cache, key), 'fresh'
+
+    @classmethod
+    def list_python_versions(cls, output_format=TEXT_FORMAT, refresh=False, stale_ok=True):
         """List the python versions available."""
-        cmd = cls()
-        version_list = cmd.get_list_python_versions()
-        last_major = None
-        last_minor = None
-        print(' ')
-        write_screen('-- Pyenv python versions --', YELLOW)
-        print(' ')
-        for version in version_list:
-            (major, minor, _) = version.split('.')
-            version_fmt = f'{version:<9}'
-            if major is not None and (major == last_major and minor == last_minor):
-                print(version_fmt, end='')
+        version_list, status = cls.load_python_versions(refresh, stale_ok)
+        if version_list is None:
+            return
+        if output_format != TEXT_FORMAT:
+            cls.export_python_versions(version_list, output_format)
+            return
+        with trace_phase('pyenv.render'):
+            last_series = None
+            print(' ')
+            write_screen('-- Pyenv python versions --', YELLOW)
+            print(' ')
+            if status == 'stale':
+                write_screen('(cached list, refreshing in the background)\n', BLUE)
+            for version in parse_version_list(version_list):
+                version_fmt = f'{version.name:<8} '
+                if version.series == last_series:
+                    print(version_fmt, end='')
+                else:
+                    print(f'\n[{version.major}.{version.minor:<2}] ➜ {version_fmt}', end='')
+                last_series = version.series
+            print('\n\n')
+
+    @classmethod
+    def export_python_versions(cls, version_list, output_format, stream=None):
+        """Writes the python versions in a machine readable format."""
+        writer = RecordWriter(output_format, VERSION_COLUMNS, stream)
+        records = [{'series': '.'.join(x.split('.')[:2]), 'version': x} for x in version_list]
+        if not writer.streaming:
+            writer.write_document({'versions': records})
+            return
+        for record in records:
+            writer.write(record)
+
+    @classmethod
+    def get_installed_versions(cls, root=None):
+        """
+        Returns the official versions installed by pyenv, newest first.
+        Reads '$(pyenv root)/versions' with one directory scan instead of running 'pyenv versions'.
+        """
+        versions_dir = os.path.join(pyenv_root() if root is None else root, 'versions')
+        try:
+            with trace_phase('pyenv.scan_installed'), os.scandir(versions_dir) as entries:
+                names = [x.name for x in entries if x.is_dir()]
+                trace_count(files=len(names))
+        except OSError:
+            return []
+        return parse_version_list(names, min_version=(0, 0))
+
+    @classmethod
+    def build_installed_report(cls, installed, version_list):
+        """
+        Joins the installed versions with the available ones through the (major, minor) index.
+        Returns one record per installed version with the newest release of its series and the
+        status 'latest', 'outdated' or 'unlisted' (series not available any more).
+        """
+        newest = newest_by_series(parse_version_list(version_list, min_version=(0, 0)))
+        records = []
+        for version in installed:
+            series_newest = newest.get(version.series)
+            if series_newest is None:
+                status = 'unlisted'
+            elif version.release >= series_newest.release:
+                status = 'latest'
             else:
-                print(f'\n[{major}.{minor:<2}] ➜ {version_fmt}', end='')
-            last_major = major
-            last_minor = minor
-        print('\n\n')
+                status = 'outdated'
+            records.append({'series': f'{version.major}.{version.minor}', 'version': version.name,
+                            'newest': series_newest.name if series_newest else None, 'status': status})
+        return records
+
+    @classmethod
+    def list_installed_versions(cls, output_format=TEXT_FORMAT, refresh=False, stale_ok=True):
+        """Reports the installed python versions against the newest patch of their series."""
+        version_list, _ = cls.load_python_versions(refresh, stale_ok)
+        installed = cls.get_installed_versions()
+        with trace_phase('pyenv.report'):
+            records = cls.build_installed_report(installed, version_list or [])
+        if output_format != TEXT_FORMAT:
+            writer = RecordWriter(output_format, INSTALLED_COLUMNS)
+            if not writer.streaming:
+                writer.write_document({'installed': records})
+                return
+            for record in records:
+                writer.write(record)
+            return
+        with trace_phase('pyenv.render'):
+            print(' ')
+            write_screen('-- Pyenv installed python versions --', YELLOW)
+            print(' ')
+            if not records:
+                print(f'\nNo versions installed in {pyenv_root()}')
+            status_colors = {'latest': GREEN, 'outdated': RED, 'unlisted': YELLOW}
+            last_series = None
+            for record in records:
+                if record['series'] != last_series:
+                    newest = record['newest'] or '-'
+                    print(f'\n[{record["series"]:<4}] newest {newest:<8} ➜ ', end='')
+                    last_series = record['series']
+                write_screen(f'{record["version"]:<8} ', status_colors[record['status']])
+            print('\n\n')
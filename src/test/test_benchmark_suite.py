@@ -0,0 +1,39 @@
+"""
+Tests the benchmark suite runner and the baseline comparison
+"""
+import pytest
+from benchmarks.suite import Scale, run_suite, compare_results, save_results, load_results, main
+
+TINY_SCALE = Scale(20, 3, 200, 5)
+
+
+def test_suite_runs_and_saves_baseline(tmp_path):
+    """Tests a filtered run at a tiny scale and the round trip of the saved results"""
+    document = run_suite(TINY_SCALE, name_filter='ppt.', max_time=0.0, min_rounds=2)
+    assert 'ppt.get_completions' in document['benchmarks']
+    assert not any(x.startswith('bins.') for x in document['benchmarks'])
+    stats = document['benchmarks']['ppt.sync_with_history[incremental]']
+    assert stats['rounds'] == 2 and 0 < stats['min'] <= stats['median'] <= stats['max']
+    saved_path = save_results(document, str(tmp_path / 'baseline.json'))
+    assert load_results(saved_path) == document
+
+
+def test_compare_flags_regressions():
+    """Tests the status of the benchmarks compared with a baseline"""
+    scale = TINY_SCALE._asdict()
+    baseline = {'scale': scale, 'benchmarks': {'a': {'median': 1.0}, 'b': {'median': 1.0}, 'c': {'median': 1.0}}}
+    current = {'scale': scale, 'benchmarks': {'a': {'median': 1.5}, 'b': {'median': 1.1},
+                                              'c': {'median': 0.5}, 'd': {'median': 1.0}}}
+    rows = compare_results(current, baseline, tolerance=0.2)
+    assert [(x[0], x[4]) for x in rows] == [('a', 'regression'), ('b', 'ok'), ('c', 'faster'), ('d', 'new')]
+    with pytest.raises(ValueError):
+        compare_results(dict(current, scale={}), baseline)
+
+
+def test_compare_with_missing_baseline_is_refused(tmp_path, capsys):
+    """Tests a comparison with a baseline never recorded exits before running the suite"""
+    with pytest.raises(SystemExit) as exc_info:
+        main(['--compare', str(tmp_path / 'missing.json')])
+    assert exc_info.value.code == 2
+    captured = capsys.readouterr()
+    assert 'record one first with --save' in captured.err and 'Benchmarks at scale' not in captured.out
@@ -0,0 +1,70 @@
+"""
+Tests the script config block parser
+"""
+import os
+import click
+import pytest
+from cmdwerk.cli import main
+from cmdwerk.commands.bins_cmd import ScriptManager, read_script_head
+
+SCRIPT_TEXT = """#!/bin/bash
+echo start
+
+# -- Cmd Werk Config --
+# CMDW_GROUP_NAME='git'
+# CMDW_HELP_BEGIN
+# Shows users that changed a subdir.
+# Usage: git_who <dir>
+# CMDW_HELP_END
+
+git log --format='%an' "$1" | sort -u
+"""
+
+
+def _write(dir_path, name, payload):
+    """Writes a file into the directory"""
+    mode = 'wb' if isinstance(payload, bytes) else 'w'
+    with open(os.path.join(dir_path, name), mode) as out_fh:
+        out_fh.write(payload)
+
+
+def _manager(dir_path, head_bytes):
+    """Creates a script manager reading from the directory"""
+    return ScriptManager(use_cache=False, head_bytes=head_bytes, search_path=[str(dir_path)])
+
+
+def test_head_and_full_modes_match(tmp_path):
+    """Tests the bounded reader produces the same results as the full scan"""
+    _write(tmp_path, 'git_who', SCRIPT_TEXT)
+    _write(tmp_path, 'plain', '#!/bin/bash\nls\n')
+    for name in ('git_who', 'plain'):
+        head = _manager(tmp_path, 4096).load_script_info(name)
+        full = _manager(tmp_path, 0).load_script_info(name)
+        assert head == full
+    group, entry = _manager(tmp_path, 4096).load_script_info('git_who')
+    assert group == 'git'
+    assert entry.short_help == 'Shows users that changed a subdir.'
+    assert entry.long_help == 'Usage: git_who <dir>'
+
+
+def test_binary_files_are_skipped(tmp_path):
+    """Tests the NUL and magic number sniffing"""
+    _write(tmp_path, 'elf', b'\x7fELF' + SCRIPT_TEXT.encode())
+    _write(tmp_path, 'nul', SCRIPT_TEXT.encode() + b'\x00\x00')
+    assert read_script_head(os.path.join(tmp_path, 'elf')) is None
+    assert read_script_head(os.path.join(tmp_path, 'nul')) is None
+    assert _manager(tmp_path, 4096).load_script_info('elf') == (None, None)
+
+
+def test_config_block_outside_window(tmp_path):
+    """Tests that only the head window is inspected"""
+    _write(tmp_path, 'late', ('# filler line\n' * 100) + SCRIPT_TEXT)
+    assert _manager(tmp_path, 256).load_script_info('late') == (None, None)
+    group, _ = _manager(tmp_path, 0).load_script_info('late')
+    assert group == 'git'
+
+
+def test_negative_head_bytes_is_refused():
+    """Tests a negative header window is a usage error instead of reading whole files"""
+    with pytest.raises(click.BadParameter):
+        main(['bins', '--head-bytes', '-1'], standalone_mode=False)
@@ -0,0 +1,65 @@
+"""
+Tests the machine readable output of the script catalog and pyenv versions
+"""
+import io
+import json
+from benchmarks.generators import make_bin_tree
+from cmdwerk.commands.bins_cmd import ScriptManager
+from cmdwerk.commands.pyenv_cmd import PyEnvHelperCommands
+
+
+class ScanProbeStream(io.StringIO):
+    """Stream recording if the scan had finished when each line was written"""
+
+    def __init__(self, manager):
+        super().__init__()
+        self.manager = manager
+        self.written_during_scan = []
+
+    def write(self, text):
+        self.written_during_scan.append(not self.manager.script_groups)
+        return super().write(text)
+
+
+def _manager(tmp_path):
+    """Returns a manager over a generated script directory"""
+    make_bin_tree(tmp_path, 30, num_groups=3, marker_ratio=0.7)
+    return ScriptManager(use_cache=False, search_path=[str(tmp_path)])
+
+
+def test_ndjson_streams_during_scan(tmp_path):
+    """Tests the ndjson records are written before the scan finishes and match the json document"""
+    manager = _manager(tmp_path)
+    stream = ScanProbeStream(manager)
+    manager.export_catalog('ndjson', stream=stream)
+    records = [json.loads(x) for x in stream.getvalue().splitlines()]
+    assert len(records) == 30
+    assert all(stream.written_during_scan)
+    assert '\x1b' not in stream.getvalue()
+
+    document = io.StringIO()
+    manager.export_catalog('json', stream=document)
+    document = json.loads(document.getvalue())
+    scripts = [x for group in document['groups'].values() for x in group]
+    assert sorted(x['name'] for x in scripts) == sorted(x['name'] for x in records if x['type'] == 'script')
+    assert len(document['misconfigured']) == len(manager.misconfigured_scripts) > 0
+
+
+def test_tsv_group_filter(tmp_path):
+    """Tests the tsv header, escaping and the group filter"""
+    manager = _manager(tmp_path)
+    stream = io.StringIO()
+    manager.export_catalog('tsv', group_name='group_1', stream=stream)
+    header, *rows = stream.getvalue().splitlines()
+    assert header.split('\t')[:3] == ['type', 'group', 'name']
+    assert rows and all(x.split('\t')[:2] == ['script', 'group_1'] for x in rows)
+    assert all(len(x.split('\t')) == len(header.split('\t')) for x in rows)
+
+
+def test_pyenv_versions_export():
+    """Tests the python versions are written with their series"""
+    stream = io.StringIO()
+    PyEnvHelperCommands.export_python_versions(['3.12.1', '3.12.0', '3.11.7'], 'ndjson', stream)
+    records = [json.loads(x) for x in stream.getvalue().splitlines()]
+    assert records[0] == {'series': '3.12', 'version': '3.12.1'}
+    assert [x['series'] for x in records] == ['3.12', '3.12', '3.11']
@@ -0,0 +1,47 @@
+"""
+Tests the script directory scanning
+"""
+from benchmarks.generators import make_bin_tree
+from cmdwerk.commands.bins_cmd import ScriptManager
+
+
+def _scan(script_dir, **kwargs):
+    """Scans the directory without using the stored index"""
+    kwargs.setdefault('search_path', [str(script_dir)])
+    manager = ScriptManager(use_cache=False, **kwargs)
+    manager.load_scripts_groups()
+    return manager
+
+
+def test_parallel_scan_matches_serial(tmp_path):
+    """Tests the thread pool keeps ordering and the misconfigured accounting"""
+    make_bin_tree(tmp_path, 200, num_groups=7, marker_ratio=0.7)
+    serial = _scan(tmp_path)
+    parallel = _scan(tmp_path, jobs=8)
+    assert serial.script_groups == parallel.script_groups
+    assert serial.misconfigured_scripts == parallel.misconfigured_scripts
+    assert len(serial.misconfigured_scripts) > 0
+
+
+def test_search_path_shadowing_and_recursion(tmp_path):
+    """Tests that the first root wins and recursive roots include sub directories"""
+    team_dir = tmp_path / 'team'
+    make_bin_tree(team_dir / 'nested', 5, marker_ratio=1.0)
+    names = make_bin_tree(tmp_path / 'personal', 5, marker_ratio=1.0)
+    (tmp_path / 'personal' / '.hidden').write_text('#!/bin/bash\n')
+    flat = _scan(tmp_path, search_path=[str(tmp_path / 'personal'), str(team_dir)])
+    assert len(flat.script_files) == 5
+    recursive = _scan(tmp_path, search_path=[str(tmp_path / 'personal'), f'{team_dir}/**'])
+    assert len(recursive.script_files) == 5
+    assert sorted(x.name for x, _ in recursive.shadowed_scripts) == sorted(names)
+    assert all('personal' in winner.path for _, winner in recursive.shadowed_scripts)
+
+
+def test_search_path_from_environment(tmp_path, monkeypatch):
+    """Tests the search path is read from CMDW_PATH"""
+    make_bin_tree(tmp_path / 'a', 3, seed=1)
+    make_bin_tree(tmp_path / 'b', 2, seed=2)
+    monkeypatch.setenv('CMDW_PATH', f"{tmp_path / 'a'}:{tmp_path / 'b'}:{tmp_path / 'missing'}")
+    manager = ScriptManager(use_cache=False)
+    manager.load_scripts_groups()
+    assert len(manager.script_files) == 5
@@ -0,0 +1,131 @@
+"""
+Tests the watch mode that keeps the script index up to date
+"""
+import os
+import sys
+import pytest
+from benchmarks.generators import make_bin_tree
+from cmdwerk.commands import bins_cmd
+from cmdwerk.commands.bins_cmd import ScriptManager
+from cmdwerk.commands.libs.script_path import resolve_search_path, find_scripts, index_scripts
+from cmdwerk.commands.libs.script_watch import InotifyWatcher, PollingWatcher, WatchLock
+
+SCRIPT = "#!/bin/bash\n# -- Cmd Werk Config --\n# CMDW_GROUP_NAME='{}'\n# CMDW_HELP_BEGIN\n# {}\n# CMDW_HELP_END\n"
+
+
+@pytest.fixture(name='search_path')
+def fixture_search_path(tmp_path, monkeypatch):
+    """Two script directories, the second one recursive, with the program data in a temporary directory"""
+    monkeypatch.setattr(bins_cmd, 'PROGRAM_CFG_DIR', str(tmp_path / 'cfg'))
+    make_bin_tree(tmp_path / 'personal', 8, num_groups=2, marker_ratio=0.7, seed=1)
+    make_bin_tree(tmp_path / 'team' / 'a', 6, num_groups=2, seed=2)
+    make_bin_tree(tmp_path / 'team' / 'b', 6, num_groups=2, seed=2)
+    return [str(tmp_path / 'personal'), f"{tmp_path / 'team'}/**"]
+
+
+def _listing(manager):
+    """Returns what the listings show"""
+    return (sorted((x, sorted(y.name for y in z)) for x, z in manager.script_groups.items()),
+            sorted(manager.misconfigured_scripts),
+            sorted((x.path, y.path) for x, y in manager.shadowed_scripts))
+
+
+def test_index_scripts_matches_the_walk(search_path):
+    """Tests the scripts and shadowing rebuilt from the index paths match a walk"""
+    roots = resolve_search_path('', search_path)
+    scripts, shadowed = find_scripts(roots)
+    indexed_scripts, indexed_shadowed = index_scripts(roots, {x.path: x.signature for x in scripts}
+                                                      | {x.path: x.signature for x, _ in shadowed})
+    assert indexed_scripts == scripts
+    assert indexed_shadowed == shadowed
+    assert shadowed
+
+
+def test_watched_index_is_read_without_walking(search_path, tmp_path, monkeypatch):
+    """Tests the changes applied by the watcher are listed from the index alone"""
+    watcher = ScriptManager(search_path=search_path)
+    watcher.watching = True
+    watcher.load_scripts_groups()
+    watcher.mark_watched()
+    new_path = tmp_path / 'personal' / 'dk_ps'
+    new_path.write_text(SCRIPT.format('docker', 'Lists the docker containers.'))
+    removed = watcher.shadowed_scripts[0][1].path
+    os.remove(removed)
+    assert watcher.apply_script_changes({str(new_path), removed, str(tmp_path / 'elsewhere')}) == 2
+
+    walked = ScriptManager(use_cache=False, search_path=search_path)
+    walked.load_scripts_groups()
+    monkeypatch.setattr(bins_cmd, 'find_scripts', pytest.fail)
+    reader = ScriptManager(search_path=search_path)
+    reader.load_scripts_groups()
+    assert _listing(reader) == _listing(walked)
+    assert reader.search_index.load()
+    assert [x['name'] for _, x in reader.search_index.search('containers')] == ['dk_ps']
+
+    watcher.mark_watched(False)
+    monkeypatch.undo()
+    monkeypatch.setattr(bins_cmd, 'PROGRAM_CFG_DIR', str(tmp_path / 'cfg'))
+    monkeypatch.setattr(WatchLock, 'is_held', lambda _: pytest.fail('index not watched'))
+    ScriptManager(search_path=search_path).load_scripts_groups()
+
+
+def test_killed_watcher_is_not_trusted(search_path, tmp_path, monkeypatch):
+    """Tests a registered watcher whose lock is free, like a killed one with its pid reused, is ignored"""
+    watcher = ScriptManager(search_path=search_path)
+    watcher.load_scripts_groups()
+    watcher.mark_watched()
+    assert WatchLock(watcher.watch_lock.lock_path).is_held()
+    watcher.watch_lock.release()
+    new_path = tmp_path / 'personal' / 'dk_ps'
+    new_path.write_text(SCRIPT.format('docker', 'Lists the docker containers.'))
+    reader = ScriptManager(search_path=search_path)
+    reader.load_scripts_groups()
+    assert reader.index_cache.watcher['pid'] == os.getpid()
+    assert 'docker' in reader.script_groups
+
+
+def test_rebuild_keeps_the_watcher(search_path, monkeypatch):
+    """Tests '--rebuild-index' walks the directories and keeps the registration of a live watcher"""
+    watcher = ScriptManager(search_path=search_path)
+    watcher.load_scripts_groups()
+    watcher.mark_watched()
+    calls = []
+    monkeypatch.setattr(bins_cmd, 'find_scripts', lambda *args, **kwargs: calls.append(args) or find_scripts(
+        *args, **kwargs))
+    rebuilt = ScriptManager(rebuild_index=True, search_path=search_path)
+    rebuilt.load_scripts_groups()
+    assert calls and _listing(rebuilt) == _listing(watcher)
+    reader = ScriptManager(search_path=search_path)
+    reader.load_scripts_groups()
+    assert len(calls) == 1 and reader.index_cache.watcher == watcher.index_cache.watcher
+    watcher.mark_watched(False)
+
+
+@pytest.mark.skipif(not sys.platform.startswith('linux'), reason='inotify is only available on Linux')
+def test_inotify_reports_changes(search_path, tmp_path):
+    """Tests the created, moved and deleted scripts and the new directories of recursive roots"""
+    watcher = InotifyWatcher(resolve_search_path('', search_path))
+    try:
+        (tmp_path / 'personal' / 'new_script').write_text('#!/bin/bash\n')
+        (tmp_path / 'personal' / '.swap').write_text('')
+        os.rename(tmp_path / 'personal' / '.swap', tmp_path / 'personal' / 'saved')
+        os.remove(next(x for x in (tmp_path / 'team' / 'a').iterdir()))
+        paths, rescan = watcher.read_changes(1.0)
+        assert {os.path.basename(x) for x in paths} >= {'new_script', 'saved'} and len(paths) == 3
+        assert not rescan
+        (tmp_path / 'team' / 'c').mkdir()
+        assert watcher.read_changes(1.0)[1]
+        (tmp_path / 'team' / 'c' / 'deep').write_text('')
+        assert watcher.read_changes(1.0)[0] == {str(tmp_path / 'team' / 'c' / 'deep')}
+    finally:
+        watcher.close()
+
+
+def test_polling_reports_changes(search_path, tmp_path):
+    """Tests the polling fallback finds the modified and deleted scripts"""
+    watcher = PollingWatcher(resolve_search_path('', search_path), poll_seconds=0.01)
+    (tmp_path / 'personal' / 'new_script').write_text('#!/bin/bash\n')
+    removed = next(x for x in (tmp_path / 'team' / 'b').iterdir())
+    os.remove(removed)
+    assert watcher.read_changes(1.0) == ({str(tmp_path / 'personal' / 'new_script'), str(removed)}, False)
+    assert watcher.read_changes(1.0) == (set(), False)
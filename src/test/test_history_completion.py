@@ -0,0 +1,45 @@
+"""
+Tests the completion engine lookups
+"""
+from collections import defaultdict
+from benchmarks.generators import make_history_commands
+from cmdwerk.commands.libs.history_data import build_history_data
+from cmdwerk.commands.libs.history_completion import HistoryCompletionEngine
+
+
+def _prefix_table(engine):
+    """Previous first token table: every proper prefix of every first token, in rank order"""
+    ranked = engine.history_source.candidates(engine.history_source.root())
+    result = defaultdict(list)
+    for cmd in ranked:
+        for idx in range(len(cmd)):
+            if cmd[:idx + 1] not in ranked:
+                result[cmd[:idx + 1]].append(cmd)
+    return result
+
+
+def test_first_token_ranges_match_prefix_table():
+    """Tests the binary search ranges give the same ranked candidates as the prefix table"""
+    commands = make_history_commands(3000) + ['gitk --all', 'gi x', 'zz top', 'été ok']
+    engine = HistoryCompletionEngine(build_history_data(commands))
+    table = _prefix_table(engine)
+    for prefix, expected in table.items():
+        assert engine.complete(prefix, limit=1000) == expected
+    assert engine.complete('qqq') == []
+
+
+def test_fuzzy_first_token():
+    """Tests the subsequence match is only used when no token starts with the word"""
+    engine = HistoryCompletionEngine(build_history_data(['kubectl get pods', 'docker ps', 'kubectx prod']))
+    assert engine.complete('kbc') == []
+    assert engine.complete('kbc', fuzzy=True) == ['kubectl', 'kubectx']
+    assert HistoryCompletionEngine(engine.history_source, fuzzy=True).complete('dkr') == ['docker']
+    assert engine.complete('ku', fuzzy=True) == ['kubectl', 'kubectx']
+
+
+def test_empty_quoted_first_word():
+    """Tests an empty quoted first word completes from all the first tokens"""
+    engine = HistoryCompletionEngine(build_history_data(['git status', 'git log', 'ls -la']))
+    assert engine.prefix_range('') == (0, 2)
+    assert engine.complete("''") == ['git', 'ls']
+    assert engine.complete('""', limit=1) == ['git']
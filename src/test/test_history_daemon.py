@@ -0,0 +1,89 @@
+"""
+Tests the ppt daemon serving completions from its in memory index
+"""
+import os
+import json
+import time
+import threading
+import pytest
+from cmdwerk.commands import prompt_cmd
+from cmdwerk.commands.prompt_cmd import PromptCommand
+from cmdwerk.commands.libs.history_data import build_history_data
+from cmdwerk.commands.libs.history_completion import HistoryCompletionEngine
+from cmdwerk.commands.libs.history_daemon import HistoryDaemon, HistoryDaemonClient, HistoryDaemonError
+
+COMMANDS = ['git status', 'git checkout main', 'git checkout dev', 'docker ps -a']
+
+
+def test_daemon_completes_and_syncs(tmp_path):
+    """Tests the client gets the local engine completions and a sync updates the warm index"""
+    history_data = build_history_data(COMMANDS)
+    synced = []
+
+    def sync_func(data, full, workers):
+        build_history_data(['git checkout release'], data)
+        synced.append((full, workers))
+        return data, {'mode': 'incremental', 'lines': 1}
+
+    socket_path = str(tmp_path / 'ppt.sock')
+    daemon = HistoryDaemon(socket_path, history_data, [str(tmp_path / 'history')], sync_func, poll_seconds=60,
+                           sync_options={'max_candidates': 50})
+    server_thread = threading.Thread(target=daemon.serve_forever, daemon=True)
+    server_thread.start()
+    client = None
+    while client is None:
+        client = HistoryDaemonClient.connect(socket_path)
+    try:
+        local = HistoryCompletionEngine(build_history_data(COMMANDS))
+        for text in ('g', 'git ', 'git checkout ', 'docker '):
+            assert client.complete(text) == local.complete(text)
+        assert client.request('sync', full=False, workers=3, max_candidates=50)['lines'] == 1
+        assert 'release' in client.complete('git checkout ')
+        assert synced == [(False, 3)]
+        with pytest.raises(HistoryDaemonError, match='--max-candidates 50'):
+            client.request('sync', timeout=None, max_candidates=10)
+        assert len(synced) == 1
+        client.request('stop')
+    finally:
+        client.close()
+    server_thread.join(5)
+    assert not server_thread.is_alive()
+    assert HistoryDaemonClient.connect(socket_path) is None
+
+
+def test_daemon_survives_a_removed_history(tmp_path, monkeypatch, capsys):
+    """Tests a failed sync is logged and the daemon keeps answering from its last good index"""
+    monkeypatch.setattr(prompt_cmd, 'PROGRAM_CFG_DIR', str(tmp_path / 'cfg'))
+    history_path = tmp_path / 'history'
+    history_path.write_text(''.join(f': 1700000000:0;{x}\n' for x in COMMANDS))
+    history_paths = [str(history_path)]
+    history_data, _ = PromptCommand.update_history_data(history_paths)
+
+    def sync_func(data, full, workers):
+        return PromptCommand.update_history_data(history_paths, data, full, workers=workers or 1)
+
+    socket_path = str(tmp_path / 'ppt.sock')
+    daemon = HistoryDaemon(socket_path, history_data, history_paths, sync_func, poll_seconds=0.05)
+    server_thread = threading.Thread(target=daemon.serve_forever, daemon=True)
+    server_thread.start()
+    client = None
+    while client is None:
+        client = HistoryDaemonClient.connect(socket_path)
+    try:
+        os.remove(history_path)
+        deadline = time.monotonic() + 5
+        errors = ''
+        while 'history sync failed' not in errors and time.monotonic() < deadline:
+            time.sleep(0.05)
+            errors += capsys.readouterr().err
+        assert 'history sync failed' in errors and server_thread.is_alive()
+        assert set(client.complete('git checkout ')) == {'dev', 'main'}
+        with pytest.raises(HistoryDaemonError, match='History sync failed'):
+            client.request('sync', timeout=None)
+        client.sock.sendall(b'[1, 2]\n')
+        assert not json.loads(client._reader.readline())['ok']  # pylint: disable=protected-access
+        assert client.request('ping')['ok']
+        client.request('stop')
+    finally:
+        client.close()
+    server_thread.join(5)
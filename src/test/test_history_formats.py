@@ -0,0 +1,71 @@
+"""
+Tests the bash and fish history readers and the multi file sync
+"""
+import io
+from cmdwerk.commands import prompt_cmd
+from cmdwerk.commands.prompt_cmd import PromptCommand
+from cmdwerk.commands.libs.history_data import (HistoryRecord, BashHistoryReader, FishHistoryReader,
+                                                detect_history_format, dedup_history_records,
+                                                expand_history_paths)
+
+FISH_HISTORY = (b'- cmd: git status\n  when: 1700000000\n'
+                b'- cmd: echo a\\\\nb\n  when: 1700000005\n  paths:\n    - b\n'
+                b'- cmd: ls -la\n  when: 1700000009\n')
+
+
+def test_bash_reader_uses_timestamp_comments():
+    """Tests the HISTTIMEFORMAT timestamps and the deferred partial line"""
+    history_fh = io.BytesIO(b'#1700000000\ngit status\nls -la\n#1700000009\nmake\nmake te')
+    reader = BashHistoryReader(history_fh)
+    assert list(reader) == [HistoryRecord('git status', 1700000000), HistoryRecord('ls -la'),
+                            HistoryRecord('make', 1700000009)]
+    assert reader.end_offset == len(b'#1700000000\ngit status\nls -la\n#1700000009\nmake\n')
+
+
+def test_fish_reader_parses_entries():
+    """Tests the fish entries, escapes and the resume offset"""
+    reader = FishHistoryReader(io.BytesIO(FISH_HISTORY))
+    assert list(reader) == [HistoryRecord('git status', 1700000000), HistoryRecord('echo a\\nb', 1700000005),
+                            HistoryRecord('ls -la', 1700000009)]
+    assert reader.end_offset == len(FISH_HISTORY)
+    # An entry still being written is left for the next read.
+    reader = FishHistoryReader(io.BytesIO(FISH_HISTORY + b'- cmd: mak'), reader.end_offset)
+    assert not list(reader)
+    assert reader.end_offset == len(FISH_HISTORY)
+
+
+def test_detect_history_format():
+    """Tests the detection by file name and by contents"""
+    assert detect_history_format('/home/me/.local/share/fish/fish_history') == 'fish'
+    assert detect_history_format('/home/me/.bash_history') == 'bash'
+    assert detect_history_format('/tmp/history', io.BytesIO(FISH_HISTORY)) == 'fish'
+    assert detect_history_format('/tmp/history', io.BytesIO(b'#1700000000\nls\n')) == 'bash'
+    assert detect_history_format('/tmp/history', io.BytesIO(b': 1700000000:0;ls\n')) == 'zsh'
+
+
+def test_dedup_keeps_counts_and_last_use():
+    """Tests that repeated commands become one record with the number of uses"""
+    records = [HistoryRecord('ls', 5), HistoryRecord('git status', 3), HistoryRecord('ls', 9),
+               HistoryRecord('ls', 7)]
+    assert dedup_history_records(records) == [HistoryRecord('ls', 9, 3), HistoryRecord('git status', 3, 1)]
+
+
+def test_sync_merges_several_history_files(tmp_path, monkeypatch, capsys):
+    """Tests a sync of a glob pattern with zsh and bash files and a fish file"""
+    monkeypatch.setattr(prompt_cmd, 'PROGRAM_CFG_DIR', str(tmp_path / 'cfg'))
+    (tmp_path / 'hosts').mkdir()
+    (tmp_path / 'hosts' / 'a.zsh_history').write_bytes(b': 1700000000:0;git status\n: 1700000001:0;ls\n')
+    (tmp_path / 'hosts' / 'b.bash_history').write_bytes(b'git log\nls\ngit log\n')
+    fish_path = tmp_path / 'fish_history'
+    fish_path.write_bytes(FISH_HISTORY)
+    patterns = [str(tmp_path / 'hosts' / '*_history'), str(fish_path)]
+    assert len(expand_history_paths(patterns)) == 3
+    history_data, stats = PromptCommand.update_history_data(expand_history_paths(patterns))
+    assert (stats['mode'], stats['files'], stats['lines'], stats['distinct']) == ('full', 3, 8, 5)
+    # The shell tokenizer reads the backslash of 'a\\nb' as an escape.
+    assert history_data.to_dict() == {'git': {'status', 'log'}, 'ls': {'-la'}, 'echo': {'anb'}}
+    git_node = history_data.child(history_data.root(), 'git')
+    assert history_data.node_stats(git_node)[0] == 4
+    assert history_data.node_stats(history_data.child(git_node, 'log'))[0] == 2
+    PromptCommand.sync_with_history(patterns)
+    assert 'up to date' in capsys.readouterr().out
@@ -0,0 +1,50 @@
+"""
+Tests the memory mapped history index
+"""
+import os
+from cmdwerk.commands.prompt_cmd import build_history_data
+from cmdwerk.commands.libs.history_index import MappedHistoryIndex, write_history_index, find_node
+from cmdwerk.commands.libs.history_trie import TokenTrie
+
+COMMANDS = ['git status', 'git log', 'git checkout master', 'git checkout dev',
+            "git commit src -m 'This is a commit'", 'docker ps -a', 'ls -la', 'echo ünïcødé ✓']
+
+
+def _write_index(tmp_path, commands):
+    """Builds the history data and writes it as a mapped index"""
+    source = build_history_data(commands)
+    index_path = os.path.join(tmp_path, 'history.idx')
+    write_history_index(index_path, source)
+    return source, MappedHistoryIndex(index_path)
+
+
+def test_index_matches_dictionary(tmp_path):
+    """Tests every path of the dictionary is found with the same candidates"""
+    source, index = _write_index(tmp_path, COMMANDS)
+    assert index.first_tokens() == source.first_tokens()
+    for key, values in source.to_dict().items():
+        node = find_node(index, key.split('|_|'))
+        assert node is not None
+        assert sorted(index.candidates(node)) == sorted(values)
+
+
+def test_index_missing_paths(tmp_path):
+    """Tests the lookups of tokens that are not in the index"""
+    _, index = _write_index(tmp_path, COMMANDS)
+    assert find_node(index, ['git', 'push']) is None
+    assert find_node(index, ['svn']) is None
+    assert index.candidates(find_node(index, ['git', 'status'])) == []
+
+
+def test_empty_index(tmp_path):
+    """Tests an index built from an empty history"""
+    _, index = _write_index(tmp_path, [])
+    assert index.first_tokens() == []
+    assert find_node(index, ['git']) is None
+
+
+def test_trie_copies(tmp_path):
+    """Tests the trie rebuilt from the index and from the legacy dictionary"""
+    trie, index = _write_index(tmp_path, COMMANDS)
+    assert TokenTrie.from_source(index).to_dict() == trie.to_dict()
+    assert TokenTrie.from_completion_dict(trie.to_dict()).to_dict() == trie.to_dict()
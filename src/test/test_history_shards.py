@@ -0,0 +1,112 @@
+"""
+Tests the history index split in one shard per first token
+"""
+import os
+import pytest
+from prompt_toolkit.document import Document
+from cmdwerk.commands import prompt_cmd
+from cmdwerk.commands.prompt_cmd import PromptCommand
+from cmdwerk.commands.prompt_ui import CustomHistoryCompleter
+from cmdwerk.commands.libs.history_data import build_history_data
+from cmdwerk.commands.libs.history_trie import TokenTrie
+from cmdwerk.commands.libs.history_completion import HistoryCompletionEngine
+from cmdwerk.commands.libs.history_shards import ShardedHistoryIndex, write_history_shards, shard_file_name
+
+COMMANDS = ['git status', 'git log -p', 'git checkout dev', 'docker ps -a', 'kubectl get pods', 'ls -la']
+
+
+@pytest.fixture(name='cfg_dir')
+def fixture_cfg_dir(tmp_path, monkeypatch):
+    """Redirects the program data to a temporary directory"""
+    cfg_dir = tmp_path / 'cfg'
+    monkeypatch.setattr(prompt_cmd, 'PROGRAM_CFG_DIR', str(cfg_dir))
+    return cfg_dir
+
+
+def _append(history_path, commands):
+    """Appends commands in zsh extended history format"""
+    with open(history_path, 'a', encoding='utf-8') as out_fh:
+        for command in commands:
+            out_fh.write(f': 1700000000:0;{command}\n')
+
+
+def test_shards_hold_the_whole_tree(tmp_path):
+    """Tests the manifest and shards read back as the trie they were written from"""
+    trie = build_history_data(COMMANDS)
+    assert write_history_shards(str(tmp_path), trie) == 4
+    assert len(os.listdir(tmp_path)) == 5
+    index = ShardedHistoryIndex(str(tmp_path))
+    assert TokenTrie.from_source(index).to_dict() == trie.to_dict()
+    assert index.first_tokens() == trie.first_tokens()
+    git = index.child(index.root(), 'git')
+    assert index.node_stats(git) == trie.node_stats(trie.child(trie.root(), 'git'))
+    index.close()
+
+
+def test_completer_loads_the_shard_of_the_first_word(tmp_path):
+    """Tests no shard is mapped until a first word is complete and the loaded shards are bounded"""
+    write_history_shards(str(tmp_path), build_history_data(COMMANDS))
+    index = ShardedHistoryIndex(str(tmp_path), max_loaded_shards=2)
+    completer = CustomHistoryCompleter(HistoryCompletionEngine(index))
+
+    def complete(text):
+        return [x.text for x in completer.get_completions(Document(text), None)]
+
+    assert complete('ku') == ['kubectl']
+    assert complete('g') == ['git']
+    assert not index.loaded_shards
+    assert sorted(complete('git ')) == ['checkout', 'log', 'status']
+    assert complete('git log ') == ['-p']
+    assert index.loaded_shards == ['git']
+    assert complete('docker ps ') == ['-a']
+    assert complete('kubectl get ') == ['pods']
+    assert index.loaded_shards == ['docker', 'kubectl']
+    assert complete('git checkout ') == ['dev']
+
+
+def test_incremental_sync_rewrites_touched_shards(cfg_dir, tmp_path, monkeypatch):
+    """Tests a sync only reads and replaces the shards of the first tokens with new lines"""
+    history_path = tmp_path / 'history'
+    _append(history_path, COMMANDS)
+    PromptCommand.sync_with_history(str(history_path), quiet=True)
+    shard_dir = cfg_dir / prompt_cmd.HISTORY_SHARDS_DIR
+
+    def inodes():
+        return {x: os.stat(shard_dir / shard_file_name(x)).st_ino for x in ('git', 'docker', 'kubectl', 'ls')}
+
+    before = inodes()
+    _append(history_path, ['git push origin', 'git status -s'])
+    loaded = []
+    load_shard = ShardedHistoryIndex.shard
+    with monkeypatch.context() as patch:
+        patch.setattr(ShardedHistoryIndex, 'shard', lambda self, token: loaded.append(token) or load_shard(self, token))
+        history_data, stats = PromptCommand.update_history_data([str(history_path)])
+    assert stats['mode'] == 'incremental' and stats['shards'] == 1 and stats['total_shards'] == 4
+    assert set(loaded) == {'git'} and history_data is None
+    after = inodes()
+    assert after['git'] != before['git']
+    assert {x: y for x, y in after.items() if x != 'git'} == {x: y for x, y in before.items() if x != 'git'}
+    index = ShardedHistoryIndex(str(shard_dir))
+    assert TokenTrie.from_source(index).to_dict() == build_history_data(
+        COMMANDS + ['git push origin', 'git status -s']).to_dict()
+    index.close()
+
+
+def test_full_sync_removes_stale_shards(cfg_dir, tmp_path):
+    """Tests the shards of first tokens gone from the history are removed"""
+    history_path = tmp_path / 'history'
+    _append(history_path, COMMANDS)
+    PromptCommand.sync_with_history(str(history_path), quiet=True)
+    os.remove(history_path)
+    _append(history_path, ['git status', 'ls -l'])
+    PromptCommand.sync_with_history(str(history_path), quiet=True)
+    shard_dir = cfg_dir / prompt_cmd.HISTORY_SHARDS_DIR
+    assert sorted(os.listdir(shard_dir)) == sorted(['manifest.idx', shard_file_name('git'), shard_file_name('ls')])
+
+
+def test_prune_reports_the_pruned_first_tokens():
+    """Tests the pruning names the first tokens whose sub-trees lost nodes"""
+    trie = build_history_data(['git a', 'git b', 'git c', 'ls -a', 'ls -b', 'cd x'])
+    pruned = set()
+    assert trie.prune(max_candidates=2, max_first_tokens=10, pruned_first_tokens=pruned) == 1
+    assert pruned == {'git'}
@@ -0,0 +1,83 @@
+"""
+Tests the incremental history sync
+"""
+import os
+import pytest
+from cmdwerk.commands import prompt_cmd
+from cmdwerk.commands.prompt_cmd import PromptCommand, build_history_data
+from cmdwerk.commands.libs.history_shards import ShardedHistoryIndex
+from cmdwerk.commands.libs.history_trie import TokenTrie
+
+
+@pytest.fixture(name='cfg_dir')
+def fixture_cfg_dir(tmp_path, monkeypatch):
+    """Redirects the program data to a temporary directory"""
+    cfg_dir = tmp_path / 'cfg'
+    monkeypatch.setattr(prompt_cmd, 'PROGRAM_CFG_DIR', str(cfg_dir))
+    return cfg_dir
+
+
+def _append(history_path, commands):
+    """Appends commands in zsh extended history format"""
+    with open(history_path, 'a', encoding='utf-8') as out_fh:
+        for command in commands:
+            out_fh.write(f': 1700000000:0;{command}\n')
+
+
+def _stored_dict(cfg_dir):
+    """Reads the stored index back as a completion dictionary"""
+    index = ShardedHistoryIndex(os.path.join(cfg_dir, prompt_cmd.HISTORY_SHARDS_DIR))
+    return TokenTrie.from_source(index).to_dict()
+
+
+def test_incremental_sync_merges_new_lines(cfg_dir, tmp_path, capsys):
+    """Tests that appended commands are merged into the existing index"""
+    history_path = tmp_path / 'history'
+    _append(history_path, ['git status', 'git log'])
+    PromptCommand.sync_with_history(str(history_path))
+    _append(history_path, ['git checkout dev', 'docker ps'])
+    PromptCommand.sync_with_history(str(history_path))
+    assert 'incremental' in capsys.readouterr().out
+    expected = build_history_data(['git status', 'git log', 'git checkout dev', 'docker ps'])
+    assert _stored_dict(cfg_dir) == expected.to_dict()
+    PromptCommand.sync_with_history(str(history_path))
+    assert 'up to date' in capsys.readouterr().out
+
+
+def test_rewritten_history_triggers_full_sync(cfg_dir, tmp_path, capsys):
+    """Tests the fallback to a full rebuild when the history was truncated"""
+    history_path = tmp_path / 'history'
+    _append(history_path, ['git status', 'git log', 'svn update now'])
+    PromptCommand.sync_with_history(str(history_path))
+    os.remove(history_path)
+    _append(history_path, ['git push origin', 'ls -la'])
+    PromptCommand.sync_with_history(str(history_path))
+    assert 'full' in capsys.readouterr().out.split('Sync mode')[-1]
+    expected = build_history_data(['git push origin', 'ls -la'])
+    assert _stored_dict(cfg_dir) == expected.to_dict()
+
+
+def test_history_synced_while_empty_is_resumed(cfg_dir, tmp_path, capsys):
+    """Tests a history file synced while empty is read incrementally once it grows"""
+    history_path, empty_path = tmp_path / 'history', tmp_path / 'empty_history'
+    _append(history_path, ['git status', 'git log'])
+    empty_path.write_text('')
+    PromptCommand.sync_with_history([str(history_path), str(empty_path)])
+    _append(empty_path, ['docker ps'])
+    PromptCommand.sync_with_history([str(history_path), str(empty_path)])
+    assert 'incremental' in capsys.readouterr().out.split('Sync mode')[-1]
+    assert _stored_dict(cfg_dir) == build_history_data(['git status', 'git log', 'docker ps']).to_dict()
+
+
+def test_partial_last_line_is_deferred(cfg_dir, tmp_path):
+    """Tests that a line still being written is processed by the next sync"""
+    history_path = tmp_path / 'history'
+    _append(history_path, ['git status'])
+    with open(history_path, 'a', encoding='utf-8') as out_fh:
+        out_fh.write(': 1700000000:0;git lo')
+    PromptCommand.sync_with_history(str(history_path), quiet=True)
+    assert _stored_dict(cfg_dir) == {'git': {'status'}}
+    with open(history_path, 'a', encoding='utf-8') as out_fh:
+        out_fh.write('g\n')
+    PromptCommand.sync_with_history(str(history_path), quiet=True)
+    assert _stored_dict(cfg_dir) == {'git': {'status', 'log'}}
@@ -0,0 +1,92 @@
+"""
+Tests the phase instrumentation of '--trace'
+"""
+import io
+import json
+import threading
+import pytest
+from benchmarks.generators import make_bin_tree
+from cmdwerk.cli import main
+from cmdwerk.commands import bins_cmd
+from cmdwerk.commands.libs import phase_trace
+from cmdwerk.commands.libs.phase_trace import trace_phase, trace_count, start_tracing, finish_tracing
+
+
+@pytest.fixture(name='tracer', autouse=True)
+def fixture_tracer():
+    """Leaves the tracing off after each test"""
+    yield phase_trace.TRACER
+    phase_trace.TRACER.stop()
+
+
+def test_tracing_off_records_nothing(tracer):
+    """Tests the phases and counts are ignored until tracing starts"""
+    with trace_phase('off'):
+        trace_count(files=1, bytes_read=10)
+    assert not tracer.phases
+
+
+def test_summary_nests_phases_and_counts():
+    """Tests the counts of a nested phase are added to its parent and the table is indented"""
+    start_tracing()
+    with trace_phase('load'):
+        trace_count(files=1, bytes_read=100)
+        for _ in range(2):
+            with trace_phase('parse'):
+                trace_count(files=1, bytes_read=10)
+    stream = io.StringIO()
+    finish_tracing(stream=stream)
+    lines = stream.getvalue().splitlines()
+    assert lines[0].startswith('Phase')
+    assert lines[1].split() == ['load', '1', *lines[1].split()[2:4], '3', '120']
+    assert lines[2].startswith('  parse')
+    assert lines[2].split()[1] == '2' and lines[2].split()[-2:] == ['2', '20']
+
+
+def test_chrome_trace_of_bins(tmp_path, monkeypatch):
+    """Tests 'cmdw --trace-file' writes the bins phases as trace events"""
+    monkeypatch.setattr(bins_cmd, 'PROGRAM_CFG_DIR', str(tmp_path / 'cfg'))
+    make_bin_tree(tmp_path / 'bin', 12, num_groups=2, seed=5)
+    monkeypatch.setenv('CMDW_PATH', str(tmp_path / 'bin'))
+    trace_file = tmp_path / 'trace.json'
+    main(['--trace-file', str(trace_file), 'bins', '--rebuild-index'], standalone_mode=False)
+    events = {x['name']: x for x in json.loads(trace_file.read_text())['traceEvents']}
+    assert {'import.bins_cmd', 'bins.walk', 'bins.parse', 'bins.render'} <= set(events)
+    assert all(x['ph'] == 'X' and x['dur'] >= 0 for x in events.values())
+    assert events['bins.walk']['args']['files'] == 12
+    assert events['bins.parse']['args']['files'] == 12
+    assert events['bins.parse']['args']['bytes_read'] > 0
+    assert not phase_trace.TRACER.enabled
+
+
+def test_threads_trace_inside_the_open_phases(tracer):
+    """Tests the phases and counts of other threads are nested in the phases open where tracing started"""
+    start_tracing()
+
+    def work():
+        trace_count(files=1, bytes_read=10)
+        with trace_phase('task'):
+            trace_count(files=1, bytes_read=1)
+
+    with trace_phase('scan'):
+        workers = [threading.Thread(target=work) for _ in range(4)]
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+    phases = tracer.stop()
+    assert [(x.name, x.depth, x.files, x.bytes_read) for x in phases if x.name == 'scan'] == [('scan', 0, 8, 44)]
+    assert [(x.depth, x.files) for x in phases if x.name == 'task'] == [(1, 1)] * 4
+
+
+def test_whole_file_parse_counts_the_bytes_read(tmp_path, monkeypatch):
+    """Tests '--head-bytes 0' counts the bytes read up to the help block, not the file sizes"""
+    monkeypatch.setattr(bins_cmd, 'PROGRAM_CFG_DIR', str(tmp_path / 'cfg'))
+    (tmp_path / 'bin').mkdir()
+    (tmp_path / 'bin' / 'big').write_text("#!/bin/bash\n# -- Cmd Werk Config --\n# CMDW_GROUP_NAME='x'\n"
+                                          "# CMDW_HELP_BEGIN\n# Big one.\n# CMDW_HELP_END\n" + 'ls\n' * 100000)
+    monkeypatch.setenv('CMDW_PATH', str(tmp_path / 'bin'))
+    trace_file = tmp_path / 'trace.json'
+    main(['--trace-file', str(trace_file), 'bins', '--no-cache', '--head-bytes', '0'], standalone_mode=False)
+    events = {x['name']: x for x in json.loads(trace_file.read_text())['traceEvents']}
+    assert 0 < events['bins.parse']['args']['bytes_read'] < 100000
@@ -0,0 +1,62 @@
+"""
+Tests the threaded prompt completer cancellation, time budget and latency histogram
+"""
+from prompt_toolkit.document import Document
+from cmdwerk.commands.prompt_ui import CustomHistoryCompleter
+from cmdwerk.commands.libs.history_data import build_history_data
+from cmdwerk.commands.libs.history_trie import STOP_CHECK_INTERVAL
+from cmdwerk.commands.libs.history_completion import HistoryCompletionEngine
+from cmdwerk.commands.libs.latency_histogram import LatencyHistogram
+
+COMMANDS = ['git status', 'git log', 'git diff', 'git push', 'docker ps']
+
+
+def _completer(**kwargs):
+    """Returns a completer over a small history"""
+    return CustomHistoryCompleter(HistoryCompletionEngine(build_history_data(COMMANDS)), **kwargs)
+
+
+def test_stale_query_is_cancelled():
+    """Tests a query stops yielding once a newer keystroke started another query"""
+    completer = _completer()
+    stale = completer.get_completions(Document('git '), None)
+    assert next(stale).text
+    fresh = list(completer.get_completions(Document('docker '), None))
+    assert [x.text for x in fresh] == ['ps']
+    assert not list(stale)
+    assert completer.latency.num_samples == 2
+
+
+def test_time_budget_keeps_the_best_candidates_so_far():
+    """Tests a query past its time budget yields the best of the candidates ranked before the deadline"""
+    commands = [f'git cmd{idx:04d}' for idx in range(4 * STOP_CHECK_INTERVAL)]
+    engine = HistoryCompletionEngine(build_history_data(commands))
+    late = CustomHistoryCompleter(engine, max_candidates=5, time_budget=-1)
+    first_chunk = {f'cmd{idx:04d}' for idx in range(STOP_CHECK_INTERVAL)}
+    candidates = [x.text for x in late.get_completions(Document('git '), None)]
+    assert len(candidates) == 5 and set(candidates) <= first_chunk
+    assert candidates == engine.complete('git ', 5, should_stop=lambda: True)
+    assert len(list(_completer(time_budget=-1).get_completions(Document('git '), None))) == 4
+    assert len(list(CustomHistoryCompleter(engine).get_completions(Document('git '), None))) == 50
+
+
+def test_first_word_ranking_stops():
+    """Tests the first word ranking is interrupted like the candidates of a node"""
+    commands = [f'cmd{idx:04d} x' for idx in range(4 * STOP_CHECK_INTERVAL)] + ['cmd1023 y'] * 3
+    engine = HistoryCompletionEngine(build_history_data(commands))
+    assert engine.complete('cmd', 5)[0] == 'cmd1023'
+    stopped = engine.complete('cmd', 5, should_stop=lambda: True)
+    assert len(stopped) == 5 and 'cmd1023' not in stopped
+
+
+def test_latency_histogram():
+    """Tests the buckets, percentiles and the text report"""
+    histogram = LatencyHistogram('test')
+    for millis in (0.1, 0.2, 0.9, 3, 3, 3, 5000):
+        histogram.record(millis / 1000)
+    assert histogram.num_samples == 7
+    assert histogram.percentile(0.5) == 4
+    assert histogram.percentile(1.0) == 5000
+    lines = histogram.format()
+    assert lines[0].startswith('test: 7 samples')
+    assert len(lines) == 5
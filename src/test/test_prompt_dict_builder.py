@@ -1,8 +1,11 @@
 """
 Tests the history dictionary builder
 """
+import io
+import pickle
 from collections import defaultdict
-from cmdwerk.commands.prompt_cmd import build_history_data
+from cmdwerk.commands.prompt_cmd import build_history_data, read_history_lines, HistoryRecord
+from cmdwerk.commands.prompt_cmd import build_history_data_streaming
 
 
 def _stringify_recur(indent, so_far, a_dict):
@@ -39,7 +42,7 @@ def test_prompt_2_levels():
                                  'git|_|checkout': {'dev', 'master'}})
     data = build_history_data(['git status', 'git log', 'git checkout master', 'git checkout dev'])
     expected_str = _stringify(expected)
-    data_str = _stringify(data)
+    data_str = _stringify(data.to_dict())
     report_comp_details(expected_str, data_str)
     assert expected_str == data_str
 
@@ -58,6 +61,46 @@ def test_prompt_3_levels():
                                "git commit src -m 'This is another commit'",
                                ])
     expected_str = _stringify(expected)
-    data_str = _stringify(data)
+    data_str = _stringify(data.to_dict())
     report_comp_details(expected_str, data_str)
     assert expected_str == data_str
+
+
+def test_candidates_ranked_by_frecency():
+    """Tests candidates are ranked by use count and decay with age"""
+    day = 24 * 60 * 60
+    now = 1700000000
+    data = build_history_data([HistoryRecord('git status', now - 200 * day),
+                               HistoryRecord('git status', now - 200 * day),
+                               HistoryRecord('git status', now - 200 * day),
+                               HistoryRecord('git log', now - day),
+                               HistoryRecord('git log', now - day),
+                               HistoryRecord('git diff', now - 2 * day)])
+    assert data.candidates(data.child(data.root(), 'git'), now) == ['log', 'diff', 'status']
+
+
+def test_prune_keeps_top_candidates():
+    """Tests the eviction of the worst ranked candidates"""
+    commands = [f'ssh host{idx}' for idx in range(10)] + ['ssh host3'] * 5 + ['ssh host7'] * 3
+    data = build_history_data(commands)
+    assert data.prune(max_candidates=2) == 8
+    assert data.to_dict() == {'ssh': {'host3', 'host7'}}
+
+
+def test_zsh_extended_history_timestamps():
+    """Tests the timestamps are kept from extended history lines"""
+    history = io.BytesIO(b': 1700000000:0;git status; ls\ngit log\n')
+    records, errors, offset = read_history_lines(history)
+    assert records == [HistoryRecord('git status; ls', 1700000000), HistoryRecord('git log', 0)]
+    assert (errors, offset) == (0, len(history.getvalue()))
+
+
+def test_streaming_workers_match_serial_build():
+    """Tests the merge of partial tries built by worker processes"""
+    commands = [HistoryRecord(f'git checkout branch{idx % 7} --force', idx) for idx in range(50)]
+    commands += ['docker ps -a', "git commit -m 'a message'"]
+    chunks = [commands[idx:idx + 8] for idx in range(0, len(commands), 8)]
+    serial = build_history_data(commands)
+    parallel = build_history_data_streaming(chunks, workers=2)
+    assert pickle.dumps(parallel) == pickle.dumps(serial)
+    assert pickle.loads(pickle.dumps(serial)).to_dict() == serial.to_dict()
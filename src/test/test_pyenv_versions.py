@@ -0,0 +1,66 @@
+"""
+Tests the python version parsing and the cache of available versions
+"""
+from cmdwerk.commands import pyenv_cmd
+from cmdwerk.commands.pyenv_cmd import PyEnvHelperCommands
+from cmdwerk.commands.libs.python_versions import parse_version, parse_version_list
+from cmdwerk.commands.libs.pyenv_cache import pyenv_cache_key
+
+LISTING = ['Available versions:', '  2.7.18', '  3.6.15', '  3.7.17', '  3.10.13', '  3.9.18',
+           '  3.12.0rc1', '  3.12.0', '  3.12.1t', '  3.13-dev', '  pypy3.10-7.3.13']
+
+
+def test_versions_sorted_by_tuple_key():
+    """Tests the numeric ordering and the filtering of unofficial names"""
+    names = [x.name for x in parse_version_list(LISTING)]
+    assert names == ['3.12.1t', '3.12.0', '3.12.0rc1', '3.10.13', '3.9.18', '3.7.17']
+    assert parse_version('3.12.0rc1') < parse_version('3.12.0') < parse_version('3.12.1')
+    assert parse_version('3.13-dev') is None
+
+
+def test_cache_fresh_stale_and_invalid(tmp_path, monkeypatch):
+    """Tests the cache is used while fresh, refreshed in background when stale and rebuilt on a new key"""
+    calls = {'pyenv': 0, 'background': 0}
+
+    def fake_listing(_cls):
+        calls['pyenv'] += 1
+        return [x.name for x in parse_version_list(LISTING)]
+
+    monkeypatch.setattr(pyenv_cmd, 'PROGRAM_CFG_DIR', str(tmp_path))
+    monkeypatch.setattr(pyenv_cmd, 'pyenv_cache_key', lambda: {'root': 'a'})
+    monkeypatch.setattr(PyEnvHelperCommands, 'get_list_python_versions', classmethod(fake_listing))
+    monkeypatch.setattr(PyEnvHelperCommands, 'start_background_refresh',
+                        classmethod(lambda _cls, _cache: calls.update(background=calls['background'] + 1)))
+
+    assert PyEnvHelperCommands.load_python_versions()[1] == 'fresh'
+    versions, status = PyEnvHelperCommands.load_python_versions()
+    assert status == 'cached' and versions[0] == '3.12.1t' and calls['pyenv'] == 1
+    assert PyEnvHelperCommands.load_python_versions(ttl=0)[1] == 'stale'
+    assert calls == {'pyenv': 1, 'background': 1}
+    assert PyEnvHelperCommands.load_python_versions(ttl=0, stale_ok=False)[1] == 'fresh'
+    assert PyEnvHelperCommands.load_python_versions(refresh=True)[1] == 'fresh'
+    monkeypatch.setattr(pyenv_cmd, 'pyenv_cache_key', lambda: {'root': 'b'})
+    assert PyEnvHelperCommands.load_python_versions()[1] == 'fresh'
+    assert calls['pyenv'] == 4
+
+
+def test_cache_key_reads_pyenv_install(tmp_path):
+    """Tests the key uses the pyenv version file and the definitions directory"""
+    (tmp_path / 'libexec').mkdir()
+    (tmp_path / 'libexec' / 'pyenv---version').write_text('  version="2.3.35"\n')
+    (tmp_path / 'plugins' / 'python-build' / 'share' / 'python-build').mkdir(parents=True)
+    key = pyenv_cache_key(root='/x', install_dir=str(tmp_path))
+    assert key['root'] == '/x' and key['pyenv_version'] == '2.3.35' and key['definitions']
+
+
+def test_installed_report_from_versions_dir(tmp_path):
+    """Tests the installed versions are read from the versions directory and joined by series"""
+    for name in ('3.12.0', '3.12.1t', '3.10.13', '3.8.1', 'my-venv'):
+        (tmp_path / 'versions' / name).mkdir(parents=True)
+    installed = PyEnvHelperCommands.get_installed_versions(str(tmp_path))
+    assert [x.name for x in installed] == ['3.12.1t', '3.12.0', '3.10.13', '3.8.1']
+    available = ['3.12.1t', '3.12.1', '3.12.0', '3.12.0rc1', '3.10.13']
+    records = PyEnvHelperCommands.build_installed_report(installed, available)
+    assert [(x['version'], x['newest'], x['status']) for x in records] == [
+        ('3.12.1t', '3.12.1', 'latest'), ('3.12.0', '3.12.1', 'outdated'),
+        ('3.10.13', '3.10.13', 'latest'), ('3.8.1', None, 'unlisted')]
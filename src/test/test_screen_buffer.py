@@ -0,0 +1,40 @@
+"""
+Tests the buffered report renderer
+"""
+import io
+import re
+from cmdwerk.commands.libs.gen_utils import BLUE, CYAN, RED, ScreenPos, encode_msg, format_cols_text
+from cmdwerk.commands.libs.screen_buffer import ScreenBuffer
+
+ESCAPE_RE = re.compile(r'\x1b\[1;(\d+)m(.*?)\x1b\[0m', re.DOTALL)
+WRITES = [('group', RED, ScreenPos.CENTERED), ('  name', BLUE, ScreenPos.PLAIN),
+          ('  help', CYAN, ScreenPos.PLAIN), ('\n', CYAN, ScreenPos.PLAIN),
+          ('more help\n', CYAN, ScreenPos.PLAIN), ('\n', BLUE, ScreenPos.PLAIN),
+          ('other', RED, ScreenPos.SEPARATOR)]
+
+
+def _visible_colors(colored):
+    """Returns the (char, color) pairs of the non blank characters"""
+    return [(char, color) for color, text in ESCAPE_RE.findall(colored) for char in text if not char.isspace()]
+
+
+def test_colored_spans_are_merged():
+    """Tests the merged output shows the same text with the same colors"""
+    screen = ScreenBuffer(colors=True)
+    for text, color, pos in WRITES:
+        screen.write(text, color, pos)
+    unbuffered = ''.join(encode_msg(format_cols_text(text, pos), color) for text, color, pos in WRITES)
+    assert screen.num_spans == 4
+    assert ESCAPE_RE.sub(r'\2', screen.render()) == ESCAPE_RE.sub(r'\2', unbuffered)
+    assert _visible_colors(screen.render()) == _visible_colors(unbuffered)
+
+
+def test_plain_output_single_write():
+    """Tests the no-color path keeps the plain text and writes it once"""
+    screen = ScreenBuffer(colors=False)
+    for text, color, pos in WRITES:
+        screen.write(text, color, pos)
+    stream = io.StringIO()
+    screen.flush(stream)
+    assert stream.getvalue() == ''.join(text for text, _, _ in WRITES)
+    assert screen.render() == ''
@@ -0,0 +1,71 @@
+"""
+Tests the persistent index of script metadata
+"""
+import os
+from cmdwerk.commands.libs.script_cache import ScriptIndexCache, file_signature
+
+RECORD = {'name': 'git_who', 'short_help': 'Shows users.', 'long_help': ''}
+
+
+def _make_cache(tmp_path, **kwargs):
+    """Creates a loaded cache stored in the temporary directory"""
+    cache = ScriptIndexCache(os.path.join(tmp_path, 'index.json'), **kwargs)
+    cache.load()
+    return cache
+
+
+def test_cache_roundtrip_and_change_detection(tmp_path):
+    """Tests that stored entries are returned until the signature changes"""
+    cache = _make_cache(tmp_path)
+    cache.store('/bin/git_who', [10, 100, 1], 'git', RECORD)
+    cache.save()
+    cache = _make_cache(tmp_path)
+    assert cache.lookup('/bin/git_who', [10, 100, 1]) == (True, 'git', RECORD)
+    assert cache.lookup('/bin/git_who', [11, 200, 1]) == (False, None, None)
+
+
+def test_cache_evicts_deleted_scripts(tmp_path):
+    """Tests that entries not seen in the last scan are removed"""
+    cache = _make_cache(tmp_path)
+    cache.store('/bin/a', [1, 1, 1], None, None)
+    cache.store('/bin/b', [1, 1, 2], 'git', RECORD)
+    cache.save()
+    cache = _make_cache(tmp_path)
+    cache.lookup('/bin/b', [1, 1, 2])
+    cache.save()
+    cache = _make_cache(tmp_path)
+    assert list(cache.entries) == ['/bin/b']
+
+
+def test_cache_disabled_and_rebuild(tmp_path):
+    """Tests the no-cache and rebuild escape hatches"""
+    cache = _make_cache(tmp_path)
+    cache.store('/bin/a', [1, 1, 1], 'git', RECORD)
+    cache.save()
+    assert _make_cache(tmp_path, rebuild=True).entries == {}
+    disabled = _make_cache(tmp_path, enabled=False)
+    assert disabled.lookup('/bin/a', [1, 1, 1]) == (False, None, None)
+
+
+def test_cache_invalidated_by_another_head_window(tmp_path):
+    """Tests entries parsed with another header window are not returned"""
+    cache = _make_cache(tmp_path)
+    cache.store('/bin/a', [1, 1, 1], None, None)
+    cache.save()
+    cache = _make_cache(tmp_path, head_bytes=0)
+    assert cache.lookup('/bin/a', [1, 1, 1]) == (False, None, None)
+    cache.store('/bin/a', [1, 1, 1], 'git', RECORD)
+    cache.save()
+    assert _make_cache(tmp_path, head_bytes=0).lookup('/bin/a', [1, 1, 1]) == (True, 'git', RECORD)
+    assert _make_cache(tmp_path).entries == {}
+
+
+def test_file_signature(tmp_path):
+    """Tests the signature changes when the file grows"""
+    file_path = os.path.join(tmp_path, 'script')
+    with open(file_path, 'w', encoding='utf-8') as out_fh:
+        out_fh.write('#!/bin/bash\n')
+    before = file_signature(os.stat(file_path))
+    with open(file_path, 'a', encoding='utf-8') as out_fh:
+        out_fh.write('ls\n')
+    assert before != file_signature(os.stat(file_path))
@@ -0,0 +1,82 @@
+"""
+Tests the inverted index behind 'cmdw bins search'
+"""
+import os
+import json
+import click
+import pytest
+from cmdwerk.cli import main
+from cmdwerk.commands import bins_cmd
+from cmdwerk.commands.bins_cmd import ScriptManager
+from cmdwerk.commands.libs.search_index import ScriptSearchIndex, search_terms
+
+SCRIPTS = {
+    'ssh_hosts': ('aws & ssh', 'Lists ssh hosts defined in the config.', 'Reads ~/.ssh/config.'),
+    'ed_ssh': ('aws & ssh', 'Edits ssh config file.', ''),
+    'git_who': ('git', 'Shows the authors of a repository.', 'Counts commits by author over ssh remotes.'),
+    'jup_on': ('python', 'Starts the jupyter server.', ''),
+}
+
+
+def _write_scripts(dir_path, scripts):
+    """Writes scripts with the cmdwerk config block"""
+    os.makedirs(dir_path, exist_ok=True)
+    for name, (group, short_help, long_help) in scripts.items():
+        with open(os.path.join(dir_path, name), 'w', encoding='utf-8') as out_fh:
+            out_fh.write(f"#!/bin/bash\n# -- Cmd Werk Config --\n# CMDW_GROUP_NAME='{group}'\n"
+                         f"# CMDW_HELP_BEGIN\n# {short_help}\n# {long_help}\n# CMDW_HELP_END\n")
+
+
+@pytest.fixture(name='bin_dir')
+def fixture_bin_dir(tmp_path, monkeypatch):
+    """Script directory with the program data redirected to a temporary directory"""
+    monkeypatch.setattr(bins_cmd, 'PROGRAM_CFG_DIR', str(tmp_path / 'cfg'))
+    _write_scripts(tmp_path / 'bin', SCRIPTS)
+    return str(tmp_path / 'bin')
+
+
+def test_search_terms():
+    """Tests the splitting of names and help into terms"""
+    assert search_terms('aws_list-hosts Lists EC2') == ['aws', 'list', 'hosts', 'lists', 'ec2']
+
+
+def test_bm25_ranks_names_and_prefixes(tmp_path):
+    """Tests the field weights, the multi term scores and the prefix matches"""
+    index = ScriptSearchIndex(str(tmp_path / 'search.json'))
+    index.build({'name': x, 'group': y[0], 'short_help': y[1], 'long_help': y[2], 'path': x}
+                for x, y in SCRIPTS.items())
+    names = [x['name'] for _, x in index.search('ssh')]
+    assert names[-1] == 'git_who' and set(names[:2]) == {'ssh_hosts', 'ed_ssh'}
+    assert [x['name'] for _, x in index.search('ssh hosts')][0] == 'ssh_hosts'
+    assert [x['name'] for _, x in index.search('jupyt')] == ['jup_on']
+    assert not index.search('ju') and not index.search('unknown')
+
+
+@pytest.mark.parametrize('sub_cmd', ['docs', 'status', 'watch', 'completions'])
+def test_terms_only_for_search(sub_cmd):
+    """Tests the search terms are refused by the other sub-commands"""
+    with pytest.raises(click.UsageError, match='Unexpected arguments'):
+        main(['bins', sub_cmd, 'aws', 'hosts'], standalone_mode=False)
+
+
+def test_search_reads_only_the_index(bin_dir, monkeypatch, capsys):
+    """Tests the index is built by the scan and answers later searches without a scan"""
+    ScriptManager(search_path=[bin_dir]).load_scripts_groups()
+
+    def fail_scan(*_):
+        raise AssertionError('search scanned the scripts')
+    monkeypatch.setattr(bins_cmd, 'find_scripts', fail_scan)
+    ScriptManager(search_path=[bin_dir]).search_scripts('jupyter server', 'json')
+    document = json.loads(capsys.readouterr().out)
+    assert [x['name'] for x in document['results']] == ['jup_on']
+    assert document['results'][0]['path'] == os.path.join(bin_dir, 'jup_on')
+
+
+def test_search_index_follows_changes(bin_dir, capsys):
+    """Tests a scan that finds new scripts updates the stored search index"""
+    ScriptManager(search_path=[bin_dir]).search_scripts('docker', 'ndjson')
+    assert not capsys.readouterr().out
+    _write_scripts(bin_dir, {'dk_ps': ('docker', 'Lists the docker containers.', '')})
+    ScriptManager(search_path=[bin_dir]).load_scripts_groups()
+    ScriptManager(search_path=[bin_dir]).search_scripts('docker', 'tsv')
+    assert capsys.readouterr().out.splitlines()[1].split('\t')[1:3] == ['docker', 'dk_ps']
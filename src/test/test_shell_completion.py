@@ -0,0 +1,83 @@
+"""
+Tests the static shell completion files written by 'cmdw bins completions'
+"""
+import os
+import shutil
+import subprocess
+import pytest
+from benchmarks.generators import make_bin_tree
+from cmdwerk.cli import main
+from cmdwerk.commands import bins_cmd
+from cmdwerk.commands.bins_cmd import ScriptManager
+from cmdwerk.commands.libs.shell_completion import (
+    completion_spec, completion_script, script_digest, write_completion_file)
+
+SCRIPT = "#!/bin/bash\n# -- Cmd Werk Config --\n# CMDW_GROUP_NAME='{}'\n# CMDW_HELP_BEGIN\n# {}\n# CMDW_HELP_END\n"
+
+
+@pytest.fixture(name='bin_dir')
+def fixture_bin_dir(tmp_path, monkeypatch):
+    """A script directory with the program data in a temporary directory"""
+    monkeypatch.setattr(bins_cmd, 'PROGRAM_CFG_DIR', str(tmp_path / 'cfg'))
+    bin_dir = tmp_path / 'bin'
+    make_bin_tree(bin_dir, 10, num_groups=2, seed=3)
+    (bin_dir / 'ssh_hosts').write_text(SCRIPT.format('aws & ssh', 'Lists the hosts: prod and dev.'))
+    return bin_dir
+
+
+def test_completion_spec_follows_the_cli():
+    """Tests the spec lists the commands, sub-commands and option choices"""
+    spec = completion_spec(main)
+    assert {'bins', 'ppt', 'pyenv-list', 'pyenv-installed'} <= set(spec)
+    assert 'completions' in spec['bins']['sub_commands']
+    assert spec['bins']['option_choices']['--shell'] == ['zsh', 'bash']
+    assert '--group' in spec['bins']['options']
+
+
+@pytest.mark.parametrize('shell', ['zsh', 'bash'])
+def test_completion_script_lists_groups_and_scripts(shell):
+    """Tests the groups and scripts are in the script and it is valid shell syntax"""
+    content = completion_script(shell, completion_spec(main), ['aws & ssh', 'git'],
+                                [('git_who', 'Shows users.'), ('ssh:x', 'Odd name.')])
+    assert "'aws & ssh'" in content
+    if shell == 'zsh':
+        assert content.startswith('#compdef cmdw\n')
+        assert "'git_who:Shows users.'" in content
+        assert "'ssh\\:x:Odd name.'" in content
+    else:
+        assert 'complete -F _cmdw cmdw' in content
+        assert 'Shows users.' not in content
+    assert script_digest(content)
+    if shutil.which(shell):
+        assert subprocess.run([shell, '-n'], input=content, text=True, check=False).returncode == 0
+
+
+def test_completion_file_follows_the_catalog(bin_dir, tmp_path):
+    """Tests the file is written once and regenerated by a scan finding changes"""
+    manager = ScriptManager(search_path=[str(bin_dir)], cli_group=main)
+    manager.write_completions('zsh')
+    file_path = tmp_path / 'cfg' / 'completions' / '_cmdw'
+    content = file_path.read_text()
+    assert "'ssh_hosts:Lists the hosts: prod and dev.'" in content
+    mtime = os.stat(file_path).st_mtime_ns
+    os.utime(file_path, ns=(mtime - 10**9, mtime - 10**9))
+
+    ScriptManager(search_path=[str(bin_dir)], cli_group=main).write_completions('zsh')
+    assert os.stat(file_path).st_mtime_ns == mtime - 10**9
+
+    (bin_dir / 'dk_ps').write_text(SCRIPT.format('docker', 'Lists the docker containers.'))
+    ScriptManager(search_path=[str(bin_dir)], cli_group=main).load_scripts_groups()
+    content = file_path.read_text()
+    assert "'dk_ps:Lists the docker containers.'" in content
+    assert 'docker' in content.split('_cmdw_scripts')[0]
+    assert not (tmp_path / 'cfg' / 'completions' / 'cmdw.bash').exists()
+
+
+def test_completion_file_in_the_current_directory(bin_dir, tmp_path, monkeypatch):
+    """Tests 'cmdw bins completions -o' with a bare file name writes it in the current directory"""
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setenv('CMDW_PATH', str(bin_dir))
+    main(['bins', 'completions', '--shell', 'bash', '-o', 'cmdw.bash'], standalone_mode=False)
+    content = (tmp_path / 'cmdw.bash').read_text()
+    assert 'ssh_hosts' in content
+    assert not write_completion_file('cmdw.bash', content)
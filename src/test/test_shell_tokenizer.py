@@ -0,0 +1,71 @@
+"""
+Differential tests of the shell tokenizer against shlex
+"""
+import random
+import shlex
+import pytest
+from cmdwerk.commands.libs.shell_tokenizer import split_words
+
+CORPUS = [
+    '',
+    '   ',
+    'git status',
+    '  git   log  --oneline\t-n 5 ',
+    "git commit -m 'This is a commit'",
+    'git commit -m "Fix \\"quoted\\" words"',
+    'echo "a\\\\b" "c\\$d" "e\\nf"',
+    "echo 'single \\ backslash' \"\"",
+    "a '' b",
+    "a''b",
+    'a""b"c"d',
+    'echo foo\\ bar baz\\\\',
+    'find . -name "*.py" -exec grep -l "TODO" {} \\;',
+    "ssh user@host 'cd /srv && ls -la | grep \"log\"'",
+    'docker run -it --rm -e "A=1" -v "$PWD:/src" image:tag bash -c "echo \'x\'"',
+    'kubectl get pods -n prod -o jsonpath=\'{.items[*].metadata.name}\'',
+    'echo ünïcødé ✓ "ça va" \'日本語\'',
+    'cat <<EOF > file.txt',
+    'a\\\nb "c\\\nd"',
+    '#comment is a word',
+    'x\x0by a\xa0b',
+    'ls | grep "x y" | wc -l',
+]
+
+PARTIAL_CASES = [
+    ('echo "hello wor', ['echo', 'hello wor']),
+    ("git commit -m 'fix the", ['git', 'commit', '-m', 'fix the']),
+    ('echo "a\\"b', ['echo', 'a"b']),
+    ('echo "abc\\', ['echo', 'abc']),
+    ('ls \\', ['ls']),
+    ("echo x'", ['echo', 'x']),
+]
+
+
+@pytest.mark.parametrize('text', CORPUS)
+def test_matches_shlex_on_corpus(text):
+    """Tests the tokenizer produces the shlex tokens on well formed input"""
+    assert split_words(text) == shlex.split(text)
+
+
+@pytest.mark.parametrize('text,expected', PARTIAL_CASES)
+def test_partial_tokens_on_unterminated_input(text, expected):
+    """Tests unterminated quotes and escapes return the partial tokens"""
+    with pytest.raises(ValueError):
+        shlex.split(text)
+    assert split_words(text) == expected
+
+
+def test_matches_shlex_on_random_input():
+    """Fuzzes the tokenizer with random strings built from the special characters"""
+    rnd = random.Random(7)
+    alphabet = ['a', 'b', ' ', '\t', '\n', "'", '"', '\\', '$', '|', 'é', '\x0b']
+    checked = 0
+    for _ in range(5000):
+        text = ''.join(rnd.choice(alphabet) for _ in range(rnd.randint(0, 12)))
+        try:
+            expected = shlex.split(text)
+        except ValueError:
+            continue
+        assert split_words(text) == expected, repr(text)
+        checked += 1
+    assert checked > 1000
@@ -0,0 +1,13 @@
+"""
+Tests the start up of the command line stays free of heavy imports
+"""
+from benchmarks.bench_startup import FORBIDDEN_MODULES, measure_startup
+
+
+def test_bins_does_not_import_prompt_modules(tmp_path):
+    """Tests 'cmdw bins' does not import the prompt and history sync dependencies"""
+    (tmp_path / 'bin').mkdir()
+    modules = measure_startup(str(tmp_path))
+    assert 'cmdwerk.commands.bins_cmd' in modules
+    assert not [x for x in modules if x.split('.')[0] in FORBIDDEN_MODULES]
+    assert 'cmdwerk.commands.prompt_cmd' not in modules